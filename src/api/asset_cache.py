@@ -0,0 +1,153 @@
+"""
+Uploaded-asset cache (opt-in: WORKBENCH_ASSET_CACHE=1)
+
+Each distinct image is uploaded once through the provider's file API; requests then reference
+it by file ID (OpenAI, Anthropic) or URI (Gemini) instead of carrying the base64 data inline.
+References are keyed by (provider, SHA-256 of the image data) and persisted in SQLite, so they
+survive restarts. Expiring references (Gemini files last 48 hours) are replaced by a new upload
+once they get close to their expiry.
+
+Note: This module must not import Qt
+Known Issue: A file deleted on the provider's side fails the request; the references used by a failed
+    request are forgotten (see forget), so the retry uploads the images again
+"""
+import os
+import time
+import base64
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("WORKBENCH_ASSET_CACHE", "0") == "1"
+EXPIRY_MARGIN = 3600  # Seconds; references expiring sooner are uploaded again
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS assets (
+    provider TEXT NOT NULL, digest TEXT NOT NULL, ref TEXT NOT NULL, expires_at REAL,
+    PRIMARY KEY (provider, digest)
+);
+"""
+
+
+class AssetCache:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Note: Shared by worker threads; every access holds self.lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.upload_locks = {}  # (provider, digest) -> lock held while uploading
+
+    def reference(self, provider, media_type, data, upload):
+        """
+        Return the reference of a base64 image, uploading it first if needed.
+        upload(image_bytes, media_type) -> (reference, expiry timestamp or None)
+        """
+        key = (provider, digest_of(data))
+        ref = self._lookup(*key)
+        if ref is not None:
+            return ref
+        # Note: Concurrent requests with the same image wait for a single upload
+        with self.lock:
+            upload_lock = self.upload_locks.setdefault(key, threading.Lock())
+        with upload_lock:
+            ref = self._lookup(*key)
+            if ref is None:
+                started = time.perf_counter()
+                ref, expires_at = upload(base64.b64decode(data), media_type)
+                logger.info(f"Uploaded an image to {provider} ({len(data) * 3 // 4} bytes, "
+                            f"{(time.perf_counter() - started) * 1000:.0f} ms)")
+                with self.lock:
+                    self.connection.execute("INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?)", (*key, ref, expires_at))
+                    self.connection.commit()
+        with self.lock:
+            self.upload_locks.pop(key, None)
+        return ref
+
+    def forget(self, provider, refs):
+        with self.lock:
+            self.connection.executemany("DELETE FROM assets WHERE provider = ? AND ref = ?",
+                                        [(provider, ref) for ref in refs])
+            self.connection.commit()
+
+    def _lookup(self, provider, digest):
+        with self.lock:
+            row = self.connection.execute("SELECT ref, expires_at FROM assets WHERE provider = ? AND digest = ?",
+                                          (provider, digest)).fetchone()
+        if row is None:
+            return None
+        ref, expires_at = row
+        if expires_at is not None and expires_at - time.time() < EXPIRY_MARGIN:
+            return None
+        return ref
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def digest_of(data):
+    return hashlib.sha256(data.encode("ascii")).hexdigest()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure(path):
+    """Set where references are persisted (inherited by worker processes through the environment)"""
+    os.environ["WORKBENCH_ASSET_CACHE_PATH"] = path
+
+
+def get_cache():
+    """The process-wide cache, or None if it is disabled or not configured (e.g. headless runs)"""
+    global _cache
+    path = os.environ.get("WORKBENCH_ASSET_CACHE_PATH")
+    if not ENABLED or path is None:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AssetCache(path)
+        return _cache
+
+
+@contextmanager
+def request_assets(provider, upload):
+    """
+    Context of one request: yields resolve(media_type, data) -> reference, or None to send the image
+    inline (cache disabled, or the upload failed). If the request fails, its references are forgotten
+    """
+    cache = get_cache()
+    if cache is None:
+        yield None
+        return
+    used = []
+    def resolve(media_type, data):
+        try:
+            ref = cache.reference(provider, media_type, data, upload)
+        except Exception as e:
+            logger.warning(f"Image upload to {provider} failed; sending the image inline: {e}")
+            return None
+        used.append(ref)
+        return ref
+    try:
+        yield resolve
+    except Exception:
+        if used:
+            logger.warning(f"Request with {len(used)} uploaded images failed; their references are forgotten")
+            cache.forget(provider, used)
+        raise
+
+
+def shutdown():
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
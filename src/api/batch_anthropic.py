@@ -0,0 +1,52 @@
+"""
+Anthropic Message Batches support
+Note: Requests are built by utils_anthropic.get_request_params, so batch and streaming calls stay identical
+"""
+import os
+import logging
+import anthropic
+from api import utils_anthropic
+
+logger = logging.getLogger(__name__)
+
+
+def make_client(base_url=None):
+    """Return the shared client, or a dedicated one for a different endpoint (e.g. a local stand-in)"""
+    if base_url is None:
+        return utils_anthropic.client
+    return anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY", "stand-in"), base_url=base_url)
+
+
+def submit_batch(requests, client):
+    """Submit a list of (custom_id, messages, response_mode) and return the provider batch ID"""
+    # Note: custom_id must match ^[a-zA-Z0-9_-]{1,64}$
+    batch = client.messages.batches.create(requests=[
+        {"custom_id": custom_id, "params": utils_anthropic.get_request_params(messages, response_mode)}
+        for custom_id, messages, response_mode in requests
+    ])
+    logger.info(f"Submitted Anthropic batch {batch.id} with {len(requests)} requests")
+    return batch.id
+
+
+def get_batch_status(batch_id, client):
+    """Return ("running" | "ended", human-readable progress)"""
+    batch = client.messages.batches.retrieve(batch_id)
+    counts = batch.request_counts
+    done = counts.succeeded + counts.errored + counts.canceled + counts.expired
+    progress = f"{batch.processing_status} {done}/{done + counts.processing}"
+    if batch.processing_status == "ended":
+        return "ended", progress
+    return "running", progress
+
+
+def get_batch_results(batch_id, client):
+    """Return {custom_id: {"status": "ok" | "error", "text": ..., "error": ...}}"""
+    results = {}
+    for entry in client.messages.batches.results(batch_id):
+        if entry.result.type == "succeeded":
+            text = "".join(block.text for block in entry.result.message.content if block.type == "text")
+            results[entry.custom_id] = {"status": "ok", "text": text, "error": None}
+        else:
+            error = getattr(entry.result, "error", None)
+            results[entry.custom_id] = {"status": "error", "text": "", "error": str(error or entry.result.type)}
+    return results
@@ -0,0 +1,73 @@
+"""
+OpenAI Batch API support: packages many conversations into one batch input file
+Note: Requests are built by utils_openai.get_request_params, so batch and streaming calls stay identical
+"""
+import os
+import json
+import logging
+from openai import OpenAI
+from api import utils_openai
+
+logger = logging.getLogger(__name__)
+
+
+def make_client(base_url=None):
+    """Return the shared client, or a dedicated one for a different endpoint (e.g. a local stand-in)"""
+    if base_url is None:
+        return utils_openai.client
+    return OpenAI(api_key=os.environ.get("OPENAI_API_KEY", "stand-in"), base_url=base_url)
+
+
+def submit_batch(requests, client):
+    """Submit a list of (custom_id, messages, response_mode) and return the provider batch ID"""
+    lines = []
+    for custom_id, messages, response_mode in requests:
+        body = utils_openai.get_request_params(messages, response_mode)
+        lines.append(json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/responses", "body": body}))
+    batch_file = client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+    batch = client.batches.create(input_file_id=batch_file.id, endpoint="/v1/responses", completion_window="24h")
+    logger.info(f"Submitted OpenAI batch {batch.id} with {len(requests)} requests")
+    return batch.id
+
+
+def get_batch_status(batch_id, client):
+    """Return ("running" | "ended", human-readable progress)"""
+    batch = client.batches.retrieve(batch_id)
+    counts = batch.request_counts
+    progress = f"{batch.status}" if counts is None else f"{batch.status} {counts.completed + counts.failed}/{counts.total}"
+    if batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+        return "running", progress
+    # Note: "expired" and "cancelled" batches may still carry partial results
+    return "ended", progress
+
+
+def get_batch_results(batch_id, client):
+    """Return {custom_id: {"status": "ok" | "error", "text": ..., "error": ...}}"""
+    batch = client.batches.retrieve(batch_id)
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            response = entry.get("response") or {}
+            if entry.get("error") or response.get("status_code") != 200:
+                error = entry.get("error") or response.get("body", {}).get("error")
+                results[entry["custom_id"]] = {"status": "error", "text": "", "error": str(error)}
+            else:
+                results[entry["custom_id"]] = {"status": "ok", "text": extract_output_text(response["body"]), "error": None}
+    return results
+
+
+def extract_output_text(body):
+    """Concatenate the output_text parts of a Responses API body"""
+    texts = []
+    for output in body.get("output", []):
+        if output.get("type") != "message":
+            continue
+        for item in output.get("content", []):
+            if item.get("type") == "output_text":
+                texts.append(item["text"])
+    return "".join(texts)
@@ -0,0 +1,159 @@
+"""
+Conversation compaction (opt-in: WORKBENCH_COMPACTION=1)
+
+Older turns are replaced by summaries before a request is sent; the document is never modified.
+
+- Turns are grouped in fixed blocks counted from the start of the conversation (BLOCK_TURNS
+    each), so a block's content, and therefore its cache key, does not change as the
+    conversation grows
+- Every complete block is summarized in the background with a cheaper model of the same
+    provider; summaries are cached by the exact content of the block
+- A request uses the summaries of the leading blocks that are ready and older than the last
+    WINDOW_TURNS turns; everything after them is sent verbatim. A block whose summary is not
+    ready yet is sent in full, so compaction never delays a request
+
+Known Issue: Summaries are kept in memory only and are recomputed after a restart
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("WORKBENCH_COMPACTION", "0") == "1"
+WINDOW_TURNS = int(os.environ.get("WORKBENCH_COMPACTION_WINDOW", "6"))  # Recent turns that are always sent verbatim
+BLOCK_TURNS = 8  # Turns (user + assistant message) per summarized block
+CACHE_SIZE = 512
+
+SUMMARY_MODELS = {
+    "openai": "gpt-4.1-mini",
+    "anthropic": "claude-3-5-haiku-latest",
+    "gemini": "gemini-2.5-flash",
+}
+SUMMARY_INSTRUCTIONS = (
+    "Summarize this part of a conversation between a user and an assistant, so that the conversation can "
+    "continue without it. Keep facts, decisions, code identifiers, numbers and open questions; drop pleasantries. "
+    "Write the summary in the language of the conversation."
+)
+
+_summaries = OrderedDict()  # block key -> summary text
+_pending = set()            # block keys being summarized
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="compaction")
+
+
+def block_key(backend, block):
+    encoded = json.dumps([backend, block], ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def block_text(block):
+    """Plain-text transcript of a block (images are replaced by a placeholder)"""
+    lines = []
+    for message in block:
+        parts = [item["text"] if item["type"] == "text" else "[image]" for item in message["content"]]
+        lines.append(f"{message['role'].capitalize()}:\n" + "\n".join(parts))
+    return "\n\n".join(lines)
+
+
+def compact(messages, backend):
+    """Return the messages to send: summaries of older blocks (if ready) followed by the remaining messages"""
+    if not ENABLED:
+        return messages
+    with tracing.span("compaction.compact", message_count=len(messages)):
+        return _compact(messages, backend)
+
+
+def _compact(messages, backend):
+    block_size = 2 * BLOCK_TURNS
+    # Note: Messages alternate user/assistant and end with the new user message
+    complete_blocks = (len(messages) - 1) // block_size
+    # Blocks that may be replaced: complete, and entirely before the recent window
+    eligible = max(0, (len(messages) - 1 - 2 * WINDOW_TURNS) // block_size)
+    summaries = []
+    for index in range(complete_blocks):
+        block = messages[index * block_size:(index + 1) * block_size]
+        key = block_key(backend, block)
+        with _lock:
+            summary = _summaries.get(key)
+            if summary is not None:
+                _summaries.move_to_end(key)
+        if summary is None:
+            # Note: Also prepares blocks still inside the window, so they are ready when they leave it
+            _schedule(key, backend, block)
+        elif len(summaries) == index and index < eligible:
+            summaries.append(summary)
+    if not summaries:
+        return messages
+    remaining = messages[len(summaries) * block_size:]
+    summary_text = "\n\n".join(
+        f"<summary turns=\"{index * BLOCK_TURNS + 1}-{(index + 1) * BLOCK_TURNS}\">\n{summary}\n</summary>"
+        for index, summary in enumerate(summaries))
+    first = remaining[0]
+    # Note: The summary goes into the first remaining user message, which keeps roles alternating
+    compacted = [{"role": first["role"], "content": [
+        {"type": "text", "text": f"(Earlier turns of this conversation, summarized:)\n{summary_text}\n\n"}
+    ] + first["content"]}] + remaining[1:]
+    logger.info(f"Compaction: {len(messages) - len(remaining)} of {len(messages)} messages sent as summaries")
+    return compacted
+
+
+def _schedule(key, backend, block):
+    with _lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    _executor.submit(_summarize_task, key, backend, block)
+
+
+def _summarize_task(key, backend, block):
+    try:
+        summary = summarize(backend, block_text(block))
+        with _lock:
+            _summaries[key] = summary
+            while len(_summaries) > CACHE_SIZE:
+                _summaries.popitem(last=False)
+        logger.debug(f"Compaction: summarized a block of {len(block)} messages with {SUMMARY_MODELS[backend]}")
+    except Exception as e:
+        logger.error(f"Compaction: summary failed: {e}")
+    finally:
+        with _lock:
+            _pending.discard(key)
+
+
+def summarize(backend, text):
+    """Summarize a transcript with the cheaper model of a backend"""
+    model = SUMMARY_MODELS[backend]
+    with tracing.span("compaction.summarize", backend=backend, model=model, text_bytes=len(text)):
+        return _summarize(backend, model, text)
+
+
+def _summarize(backend, model, text):
+    if backend == "openai":
+        from api.utils_openai import client
+        if client is None:
+            raise Exception("OpenAI client is not available")
+        response = client.responses.create(model=model, instructions=SUMMARY_INSTRUCTIONS, input=text, store=False)
+        return response.output_text
+    elif backend == "anthropic":
+        from api.utils_anthropic import client
+        if client is None:
+            raise Exception("Anthropic client is not available")
+        response = client.messages.create(model=model, system=SUMMARY_INSTRUCTIONS, max_tokens=2048,
+                                          messages=[{"role": "user", "content": text}])
+        return "".join(block.text for block in response.content if block.type == "text")
+    elif backend == "gemini":
+        from google.genai.types import GenerateContentConfig
+        from api.utils_gemini import client
+        if client is None:
+            raise Exception("Gemini client is not available")
+        response = client.models.generate_content(
+            model=model, contents=text, config=GenerateContentConfig(system_instruction=SUMMARY_INSTRUCTIONS))
+        return response.text
+    else:
+        raise Exception("Unexpected backend")
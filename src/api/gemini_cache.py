@@ -0,0 +1,124 @@
+"""
+Gemini context caching (opt-in: WORKBENCH_GEMINI_CACHE=1)
+
+For long sessions, the stable prefix of the history (with the system prompt and tools) is stored
+as cached content on the server; following turns send only the messages after it. One cache is
+kept per session and tools variant:
+- Reused while the session's first messages hash to the same prefix; its TTL is refreshed once
+    less than half of it is left
+- Replaced by a cache of the longer prefix once the uncached messages grow past MIN_TOKENS
+- Deleted (in the background) once earlier turns are edited, which changes the prefix hash
+- Shared with forks of the session (see Session.fork) until their histories diverge
+- Only used, never created, by candidate responses (see Session.generate_candidates), which
+    would otherwise each create one
+
+Known Issue: In process mode, each child process keeps its own caches
+Note: Caches of a closed app expire with their TTL
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from google.genai.types import CreateCachedContentConfig, UpdateCachedContentConfig
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("WORKBENCH_GEMINI_CACHE", "0") == "1"
+TTL = 600         # Seconds
+MIN_TOKENS = 8192  # Estimated tokens before a prefix is worth caching (the API requires at least 4096 for Pro)
+
+
+def estimate_tokens(messages):
+    """Rough token count: 4 characters per token, 258 tokens per image"""
+    total = 0
+    for message in messages:
+        for item in message["content"]:
+            total += len(item["text"]) // 4 if item["type"] == "text" else 258
+    return total
+
+
+def prefix_hash(model, system_prompt, variant, messages):
+    encoded = json.dumps([model, system_prompt, variant, messages], ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ContextCache:
+    def __init__(self):
+        self.entries = {}  # (session ID, variant) -> {"name", "hash", "count", "expires_at"}
+        self.lock = threading.Lock()
+
+    def prepare(self, client, session_id, model, variant, system_prompt, tools, messages, translate, create=True):
+        """
+        Return (cached content name or None, number of leading messages it covers).
+        translate(messages) -> contents (see translate_messages)
+        create: False to only use a valid existing cache
+        """
+        key = (session_id, variant)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None:
+            count = entry["count"]
+            valid = (count < len(messages) and entry["expires_at"] - time.time() > 60 and
+                     prefix_hash(model, system_prompt, variant, messages[:count]) == entry["hash"])
+            if not valid:
+                logger.debug("Gemini context cache is stale (earlier turns were edited, or it expired)")
+                self._drop(client, key)
+                entry = None
+            elif estimate_tokens(messages[count:-1]) < MIN_TOKENS or not create:
+                self._refresh(client, entry)
+                return entry["name"], count
+            else:
+                # Note: The uncached part grew large; cache the longer prefix instead
+                self._drop(client, key)
+                entry = None
+        prefix = messages[:-1]
+        if not create or estimate_tokens(prefix) < MIN_TOKENS:
+            return None, 0
+        try:
+            with tracing.span("gemini_cache.create", messages=len(prefix)):
+                cached = client.caches.create(model=model, config=CreateCachedContentConfig(
+                    contents=translate(prefix), system_instruction=system_prompt, tools=tools, ttl=f"{TTL}s"))
+        except Exception as e:
+            logger.warning(f"Failed to create Gemini context cache: {e}")
+            return None, 0
+        entry = {"name": cached.name, "hash": prefix_hash(model, system_prompt, variant, prefix),
+                 "count": len(prefix), "expires_at": time.time() + TTL}
+        with self.lock:
+            self.entries[key] = entry
+        logger.info(f"Created Gemini context cache for {len(prefix)} messages")
+        return entry["name"], entry["count"]
+
+    def fork(self, source_id, target_id):
+        """Let a forked session use the caches of its source (a cache is deleted once no session uses it)"""
+        with self.lock:
+            for (session_id, variant), entry in list(self.entries.items()):
+                if session_id == source_id:
+                    self.entries[(target_id, variant)] = dict(entry)
+
+    def _refresh(self, client, entry):
+        if entry["expires_at"] - time.time() > TTL / 2:
+            return
+        try:
+            client.caches.update(name=entry["name"], config=UpdateCachedContentConfig(ttl=f"{TTL}s"))
+            entry["expires_at"] = time.time() + TTL
+        except Exception as e:
+            logger.warning(f"Failed to refresh Gemini context cache: {e}")
+
+    def _drop(self, client, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            # Note: Forked sessions may still use the same cache
+            if entry is None or any(other["name"] == entry["name"] for other in self.entries.values()):
+                return
+        def _delete():
+            try:
+                client.caches.delete(name=entry["name"])
+            except Exception as e:
+                logger.debug(f"Failed to delete Gemini context cache: {e}")
+        threading.Thread(target=_delete, daemon=True).start()
+
+
+context_cache = ContextCache()
@@ -0,0 +1,280 @@
+"""
+Provider calls in child processes
+
+In process mode, a request runs in a pooled child process, so SDK stream parsing never competes
+with the UI for the GIL. The child coalesces "generating" deltas (one message per 20 ms at most)
+and sends them over a pipe; a reader thread in the UI process turns them into the same signals
+as Worker. Cancelling kills the child, which stops the request at once, instead of waiting for
+the SDK to return control so that stop_requested can be checked. The pool replaces killed
+children in the background.
+
+Note: With the spawn start method (Windows), a child imports the main module once, when it starts;
+    children are reused, so this cost is not paid per request
+"""
+import os
+import logging
+import importlib
+import threading
+import multiprocessing
+from PySide6.QtCore import QObject, Signal
+from utils import request_context, tracing
+from api import compaction
+from api.worker import BACKENDS, messages_size
+
+logger = logging.getLogger(__name__)
+
+
+# Child process
+class _ChildParent:
+    """Stand-in for Worker inside the child: collects events and sends them to the UI process"""
+    def __init__(self, conn, flush_interval=0.02):
+        # Note: A killed child needs no stop flag
+        self.stop_requested = False
+        self.conn = conn
+        self.pending = []
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.flush_thread = threading.Thread(target=self._flush_task, args=(flush_interval,))
+        self.flush_thread.daemon = True
+        self.flush_thread.start()
+
+    def safe_signal_emit(self, state, payload):
+        with self.lock:
+            if state == "generating":
+                self.pending.append(payload)
+            else:
+                self._flush()
+                self.conn.send(("event", state, payload))
+
+    def finish(self, message):
+        self.done.set()
+        self.flush_thread.join()
+        with self.lock:
+            self._flush()
+            self.conn.send(message)
+
+    def _flush_task(self, flush_interval):
+        while not self.done.wait(flush_interval):
+            with self.lock:
+                self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.conn.send(("event", "generating", "".join(self.pending)))
+            self.pending = []
+
+
+def _child_main(conn):
+    """Serve requests until the pipe is closed: (module name, messages, response_mode, context IDs) -> events"""
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        module_name, messages, response_mode, context_ids = job
+        # Note: Backends read the session ID (e.g. for prompt cache keys)
+        token = request_context.bind(**context_ids)
+        parent = _ChildParent(conn)
+        try:
+            graceful = importlib.import_module(module_name).run(messages, response_mode, parent=parent)
+            parent.finish(("done", bool(graceful)))
+        except Exception as e:
+            parent.finish(("error", str(e)))
+        finally:
+            request_context.reset(token)
+
+
+# UI process
+class _Child:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_child_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+
+class ProcessPool:
+    """Warm child processes, reused across requests"""
+    def __init__(self, warm_size=2):
+        self.context = multiprocessing.get_context("spawn")
+        self.warm_size = warm_size
+        self.idle = []
+        self.spawning = 0
+        self.lock = threading.Lock()
+        self.closed = False
+        self._top_up()
+
+    def acquire(self):
+        with self.lock:
+            child = self.idle.pop() if self.idle else None
+        if child is None:
+            child = _Child(self.context)
+        self._top_up()
+        return child
+
+    def release(self, child):
+        """Return a child that finished its request"""
+        with self.lock:
+            if not self.closed and len(self.idle) < self.warm_size and child.process.is_alive():
+                self.idle.append(child)
+                return
+        self._stop(child)
+
+    def discard(self, child):
+        """Kill a child (e.g. to cancel its request)"""
+        child.process.kill()
+        child.conn.close()
+        threading.Thread(target=child.process.join, daemon=True).start()
+        self._top_up()
+
+    def _top_up(self):
+        with self.lock:
+            missing = 0 if self.closed else self.warm_size - len(self.idle) - self.spawning
+            self.spawning += max(missing, 0)
+        def _spawn():
+            for _ in range(missing):
+                child = _Child(self.context)
+                with self.lock:
+                    self.spawning -= 1
+                    self.idle.append(child)
+        if missing > 0:
+            threading.Thread(target=_spawn, daemon=True).start()
+
+    def _stop(self, child):
+        try:
+            child.conn.send(None)
+        except OSError:
+            pass
+        child.process.join(timeout=1)
+        if child.process.is_alive():
+            child.process.kill()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for child in idle:
+            self._stop(child)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Note: The number of warm children is set with WORKBENCH_WORKER_PROCESSES (default: 2)
+            _pool = ProcessPool(int(os.environ.get("WORKBENCH_WORKER_PROCESSES", "2")))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+class ProcessWorker(QObject):
+    """Drop-in replacement for Worker that runs the request in a child process"""
+    signal = Signal(dict)
+
+    def __init__(self, backend, messages, response_mode):
+        # Note: ProcessWorker relies on the self-deletion pattern for clean-up
+        super().__init__(parent=None)
+        # Initialize attributes
+        self.backend = backend
+        self.messages = messages
+        self.response_mode = response_mode
+        self.stop_requested = False
+        self.child = None
+        self.lock = threading.Lock()
+        # Note: Created on the UI thread; the IDs are bound again on the reader thread and in the child
+        self.context_ids = request_context.current()
+
+    def _background_task(self):
+        # Note: Spans inside the child process are not traced; the reader thread records the request as a whole
+        request_context.bind(**self.context_ids)
+        with tracing.span("process_worker.run", backend=self.backend, response_mode=self.response_mode) as run_span:
+            self._run(run_span)
+        logger.debug("Exiting the worker process reader thread")
+
+    def _run(self, run_span):
+        pool = get_pool()
+        try:
+            # Emit initial state
+            self.safe_signal_emit("waiting", None)
+            if self.backend not in BACKENDS:
+                raise Exception("Unexpected backend")
+            child = pool.acquire()
+            with self.lock:
+                if self.stop_requested:
+                    pool.release(child)
+                    return
+                self.child = child
+            # Note: Compaction runs here, so summaries are cached in the UI process and shared by all children
+            messages = compaction.compact(self.messages, self.backend)
+            # Note: Sending may block until the child reads (large messages), so it happens here
+            with tracing.span("process_worker.send", message_bytes=messages_size(messages)):
+                child.conn.send((BACKENDS[self.backend].__name__, messages, self.response_mode, self.context_ids))
+            self.messages = None
+            while True:
+                message = child.conn.recv()
+                if message[0] == "event":
+                    if message[1] == "generating":
+                        run_span.add_delta(message[2])
+                    self.safe_signal_emit(message[1], message[2])
+                    continue
+                with self.lock:
+                    self.child = None
+                pool.release(child)
+                # Note: "ending" implies a graceful exit
+                if message[0] == "done":
+                    if message[1]:
+                        self.safe_signal_emit("ending", None)
+                elif message[0] == "error":
+                    raise Exception(message[1])
+                else:
+                    raise Exception(f"Unexpected message from worker process: {message[0]}")
+                break
+        except (EOFError, OSError) as e:
+            # Note: Expected when the child was killed to cancel the request
+            if not self.stop_requested:
+                logger.error(f"Worker process died: {e}")
+                self.safe_signal_emit("error", f"Worker process died: {e}")
+        except Exception as e:
+            logger.error(f"Worker exception: {e}")
+            self.safe_signal_emit("error", str(e))
+
+    def memory_usage(self):
+        """Approximate bytes held by the request (until it is sent to the child)"""
+        return messages_size(self.messages)
+
+    def safe_signal_emit(self, state, payload):
+        # Note: This wrapper ensures that workers requested to stop do not emit signals
+        if not self.stop_requested:
+            if tracing.is_enabled():
+                self.signal.emit({"state": state, "payload": payload, "emitted_at": tracing.now_us()})
+            else:
+                self.signal.emit({"state": state, "payload": payload})
+
+    def start(self):
+        thread = threading.Thread(target=self._background_task)
+        thread.daemon = True
+        thread.start()
+
+    def clean_up_resources(self):
+        logger.debug("Requesting ProcessWorker to stop")
+        with self.lock:
+            self.stop_requested = True
+            child, self.child = self.child, None
+        if child is not None:
+            get_pool().discard(child)
+        # Self-Deletion
+        logger.debug("Calling deleteLater on ProcessWorker")
+        self.deleteLater()
@@ -2,6 +2,8 @@ import os
 import logging
 import anthropic
 from system_prompt.get_system_prompt import get_system_prompt
+from utils import tracing
+from api import asset_cache
 
 logger = logging.getLogger(__name__)
 if "ANTHROPIC_API_KEY" in os.environ:
@@ -36,19 +38,23 @@ def apply_cache_breakpoints(system_prompt, messages):
     else:
         raise Exception("Unexpected num_message")
     # Note: idx_all always includes the last message
+    # Note: The marked messages are copied; parsed messages may be shared (e.g. by candidates)
+    messages = list(messages)
     for idx in idx_all:
-        messages[idx]["content"][-1]["cache_control"] = {"type": "ephemeral"}
+        content = list(messages[idx]["content"])
+        content[-1] = {**content[-1], "cache_control": {"type": "ephemeral"}}
+        messages[idx] = {**messages[idx], "content": content}
     return system_prompt, messages
 
 
-def get_stream(messages, response_mode):
-    logger.debug(f"Sending messages to the API server")
-
+def get_request_params(messages, response_mode):
+    """Build the arguments of client.messages.stream/create (shared by streaming and batch requests)"""
     system_prompt = get_system_prompt()
-    system_prompt, messages = apply_cache_breakpoints(system_prompt, messages)
+    with tracing.span("apply_cache_breakpoints"):
+        system_prompt, messages = apply_cache_breakpoints(system_prompt, messages)
     
     if response_mode == "normal":
-        stream = client.messages.stream(
+        return dict(
             system=system_prompt,
             messages=messages,
             model="claude-opus-4-20250514",
@@ -56,9 +62,8 @@ def get_stream(messages, response_mode):
             max_tokens=32000,
             thinking={"type": "disabled"},
         )
-        return stream
     elif response_mode == "thinking":
-        stream = client.messages.stream(
+        return dict(
             system=system_prompt,
             messages=messages,
             model="claude-opus-4-20250514",
@@ -66,7 +71,6 @@ def get_stream(messages, response_mode):
             max_tokens=32000,
             thinking={"type": "enabled", "budget_tokens": 31999},
         )
-        return stream
     elif response_mode == "advanced":
         tools = [{
             "type": "web_search_20250305",
@@ -74,7 +78,7 @@ def get_stream(messages, response_mode):
             "max_uses": 10,
             "user_location": {"type": "approximate", "country": "US"},
         }]
-        stream = client.messages.stream(
+        return dict(
             system=system_prompt,
             messages=messages,
             model="claude-sonnet-4-20250514",  # Note: Opus is too expensive for multi-turn online research
@@ -83,14 +87,60 @@ def get_stream(messages, response_mode):
             thinking={"type": "enabled", "budget_tokens": 31999},
             tools=tools,
         )
-        return stream
     else:
         raise Exception("Unexpected response_mode")
 
 
+FILES_API_BETA = "files-api-2025-04-14"
+
+
+def upload_image(image_bytes, media_type):
+    """Upload function of the asset cache (Anthropic files do not expire)"""
+    extension = media_type.split("/")[-1]
+    file = client.beta.files.upload(file=(f"image.{extension}", image_bytes, media_type))
+    return file.id, None
+
+
+def use_file_references(messages, resolve_image):
+    """Replace base64 image sources by file references where resolve_image returns one"""
+    messages_new = []
+    for message in messages:
+        content_new = []
+        for item in message["content"]:
+            if item["type"] == "image" and item["source"]["type"] == "base64":
+                file_id = resolve_image(item["source"]["media_type"], item["source"]["data"])
+                if file_id is not None:
+                    item = {"type": "image", "source": {"type": "file", "file_id": file_id}}
+            content_new.append(item)
+        messages_new.append({"role": message["role"], "content": content_new})
+    return messages_new
+
+
+def get_stream(messages, response_mode, uses_files=False):
+    logger.debug(f"Sending messages to the API server")
+    params = get_request_params(messages, response_mode)
+    if uses_files:
+        # Note: File references require the Files API beta
+        params["extra_headers"] = {"anthropic-beta": FILES_API_BETA}
+    stream = client.messages.stream(**params)
+    return stream
+
+
 def run(messages, response_mode, parent):
+    with asset_cache.request_assets("anthropic", upload_image) as resolve_image:
+        uses_files = False
+        if resolve_image is not None:
+            with tracing.span("use_file_references"):
+                messages = use_file_references(messages, resolve_image)
+            uses_files = any(item["type"] == "image" and item["source"]["type"] == "file"
+                             for message in messages for item in message["content"])
+        return _run(messages, response_mode, parent, uses_files)
+
+
+def _run(messages, response_mode, parent, uses_files):
     separate_next_tool_call = False
-    with get_stream(messages, response_mode) as stream:
+    # Note: The request is sent when the stream is entered; see the "first_delta" instant for the time to first token
+    with tracing.span("stream") as span, get_stream(messages, response_mode, uses_files) as stream:
         for event in stream:
             # If stop requested
             if parent.stop_requested:
@@ -111,6 +161,7 @@ def run(messages, response_mode, parent):
                         parent.safe_signal_emit("generating", "Searching...\n\n")
             
             if event.type == "text":
+                span.add_delta(event.text)
                 parent.safe_signal_emit("generating", event.text)
                 separate_next_tool_call = True
     # Exit gracefully
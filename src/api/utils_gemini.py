@@ -1,11 +1,14 @@
 import os
+import io
 import base64
 import logging
 from google import genai
-from google.genai.types import Part, Content
+from google.genai.types import Part, Content, UploadFileConfig
 from google.genai.types import GenerateContentConfig, ThinkingConfig
 from google.genai.types import Tool, GoogleSearch, UrlContext
 from system_prompt.get_system_prompt import get_system_prompt
+from utils import request_context, tracing
+from api import asset_cache, gemini_cache
 
 logger = logging.getLogger(__name__)
 if "GEMINI_API_KEY" in os.environ:
@@ -14,8 +17,8 @@ else:
     client = None
 
 
-def translate_messages(messages):
-    """Translate internal message format to Gemini API content format"""
+def translate_messages(messages, resolve_image=None):
+    """Translate internal message format to Gemini API content format (images by URI if resolve_image returns one)"""
     contents = []
     for message in messages:
         content_items = message["content"]
@@ -30,6 +33,10 @@ def translate_messages(messages):
                 # Add image part from base64
                 media_type = item["source"]["media_type"]
                 b64_data = item["source"]["data"]
+                file_uri = resolve_image(media_type, b64_data) if resolve_image is not None else None
+                if file_uri is not None:
+                    parts.append(Part.from_uri(file_uri=file_uri, mime_type=media_type))
+                    continue
                 try:
                     image_bytes = base64.b64decode(b64_data)
                 except Exception as e:
@@ -49,34 +56,48 @@ def translate_messages(messages):
             contents.append(Content(role=gemini_role, parts=parts))
     return contents
 
-def get_stream(messages, response_mode):
+def upload_image(image_bytes, media_type):
+    """Upload function of the asset cache (Gemini files expire after 48 hours)"""
+    file = client.files.upload(file=io.BytesIO(image_bytes), config=UploadFileConfig(mime_type=media_type))
+    expires_at = file.expiration_time.timestamp() if file.expiration_time is not None else None
+    return file.uri, expires_at
+
+
+def get_stream(messages, response_mode, resolve_image=None):
     logger.debug(f"Sending messages to the API server")
 
     system_prompt = get_system_prompt()
-    contents = translate_messages(messages)
     
     if response_mode == "normal":
         model = "gemini-2.5-pro-preview-06-05"
-        config = GenerateContentConfig(
-            system_instruction=system_prompt,
-            thinking_config=ThinkingConfig(include_thoughts=True, thinking_budget=128),
-        )
+        thinking_config = ThinkingConfig(include_thoughts=True, thinking_budget=128)
+        tools = None
     elif response_mode == "thinking":
         model = "gemini-2.5-pro-preview-06-05"
-        config = GenerateContentConfig(
-            system_instruction=system_prompt,
-            thinking_config=ThinkingConfig(include_thoughts=True, thinking_budget=32768),
-        )
+        thinking_config = ThinkingConfig(include_thoughts=True, thinking_budget=32768)
+        tools = None
     elif response_mode == "advanced":
         model = "gemini-2.5-pro-preview-06-05"
-        config = GenerateContentConfig(
-            system_instruction=system_prompt,
-            thinking_config=ThinkingConfig(include_thoughts=True, thinking_budget=32768),
-            tools=[Tool(url_context=UrlContext()), Tool(google_search=GoogleSearch())],
-        )
+        thinking_config = ThinkingConfig(include_thoughts=True, thinking_budget=32768)
+        tools = [Tool(url_context=UrlContext()), Tool(google_search=GoogleSearch())]
     else:
         raise Exception("Unexpected response_mode")
     
+    # Note: Cached content carries the system prompt and tools, which then must not be sent again
+    cache_name, cached_count = None, 0
+    context_ids = request_context.current()
+    session_id = context_ids.get("session_id")
+    if gemini_cache.ENABLED and session_id is not None:
+        cache_name, cached_count = gemini_cache.context_cache.prepare(
+            client, session_id, model, "tools" if tools else "plain", system_prompt, tools, messages,
+            lambda prefix: translate_messages(prefix, resolve_image), create="candidate" not in context_ids)
+    if cache_name is not None:
+        config = GenerateContentConfig(cached_content=cache_name, thinking_config=thinking_config)
+    else:
+        config = GenerateContentConfig(system_instruction=system_prompt, thinking_config=thinking_config, tools=tools)
+    with tracing.span("translate_messages"):
+        contents = translate_messages(messages[cached_count:], resolve_image)
+    
     stream = client.models.generate_content_stream(
         model=model,
         contents=contents,
@@ -85,14 +106,25 @@ def get_stream(messages, response_mode):
     return stream
 
 
+def fork_session(source_id, target_id):
+    gemini_cache.context_cache.fork(source_id, target_id)
+
+
 def run(messages, response_mode, parent):
     # Debug: Gemini does not offer early stopping support yet
-    stream = get_stream(messages, response_mode)
+    with asset_cache.request_assets("gemini", upload_image) as resolve_image, tracing.span("stream") as span:
+        return _run_stream(get_stream(messages, response_mode, resolve_image), span, parent)
+
+
+def _run_stream(stream, span, parent):
+    usage = None
     for event in stream:
         # If stop requested
         if parent.stop_requested:
             # Exit ungracefully
             return False
+        # Note: The last chunk carries the usage of the whole request
+        usage = getattr(event, "usage_metadata", None) or usage
         # Depending on the event content, determine state
         text_event = getattr(event, "text", None)
         if text_event is None:
@@ -110,6 +142,11 @@ def run(messages, response_mode, parent):
             parent.safe_signal_emit("thinking", None)
         else:
             # If no thought metadata is available, default to the "generating" state.
+            span.add_delta(text_event)
             parent.safe_signal_emit("generating", text_event)
+    if usage is not None:
+        cached_tokens = usage.cached_content_token_count or 0
+        span.set(prompt_tokens=usage.prompt_token_count, cached_tokens=cached_tokens)
+        logger.info(f"Gemini turn: {usage.prompt_token_count} prompt tokens, {cached_tokens} from cached content")
     # Exit gracefully
     return True
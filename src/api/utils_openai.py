@@ -1,8 +1,14 @@
 import os
+import json
+import time
+import hashlib
 import logging
-from openai import OpenAI
+import threading
+from openai import OpenAI, NotFoundError, BadRequestError
 from openai.types.shared_params import Reasoning
 from system_prompt.get_system_prompt import get_system_prompt
+from utils import request_context, tracing
+from api import asset_cache
 
 logger = logging.getLogger(__name__)
 if "OPENAI_API_KEY" in os.environ:
@@ -10,9 +16,21 @@ if "OPENAI_API_KEY" in os.environ:
 else:
     client = None
 
+# Response chaining (opt-in: WORKBENCH_OPENAI_CHAINING=1)
+#   Responses are stored on the server, and a turn whose history matches the last completed
+#   response of the session exactly sends only the new user message (previous_response_id).
+#   Any edit to earlier turns changes the history hash, so the full history is sent instead.
+#   Candidate responses (see Session.generate_candidates) are not recorded, so the turn after a
+#   committed candidate sends the full history.
+# Known Issue: In process mode, each child process keeps its own chains; a turn served by another
+#   child sends the full history
+CHAINING = os.environ.get("WORKBENCH_OPENAI_CHAINING", "0") == "1"
+_chains = {}  # session_id -> (response_mode, hash of the history including the response, response id)
+_chains_lock = threading.Lock()
 
-def translate_messages(messages):
-    """Translate from Anthropic to OpenAI format"""
+
+def translate_messages(messages, resolve_image=None):
+    """Translate from Anthropic to OpenAI format (images are sent as file IDs if resolve_image returns one)"""
     messages_new = []
     for message in messages:
         role    = message["role"]
@@ -27,7 +45,11 @@ def translate_messages(messages):
                 elif item["type"] == "image":
                     media_type = item["source"]["media_type"]
                     base64_data = item["source"]["data"]
-                    content_new.append({"type": "input_image", "image_url": f"data:{media_type};base64,{base64_data}"})
+                    file_id = resolve_image(media_type, base64_data) if resolve_image is not None else None
+                    if file_id is not None:
+                        content_new.append({"type": "input_image", "file_id": file_id})
+                    else:
+                        content_new.append({"type": "input_image", "image_url": f"data:{media_type};base64,{base64_data}"})
         elif role == "assistant":
             content_new = []
             for item in content:
@@ -40,58 +62,147 @@ def translate_messages(messages):
     return messages_new
 
 
-def get_stream(messages, response_mode):
-    logger.debug(f"Sending messages to the API server")
-    
+def get_request_params(messages, response_mode, resolve_image=None):
+    """Build the arguments of client.responses.create (shared by streaming and batch requests)"""
     system_prompt = get_system_prompt()
-    messages = translate_messages(messages)
+    with tracing.span("translate_messages"):
+        messages = translate_messages(messages, resolve_image)
     
     if response_mode == "normal":
-        stream = client.responses.create(
+        return dict(
             input=messages,
             model="gpt-4.1",
             instructions=system_prompt,
-            stream=True,
             temperature=1.0,
             store=False,
         )
-        return stream
     elif response_mode == "thinking":
-        stream = client.responses.create(
+        return dict(
             input=messages,
             model="o3",
             instructions=system_prompt,
             reasoning=Reasoning(effort="high", summary="detailed"),
-            stream=True,
             temperature=1.0,
             store=False,
         )
-        return stream
     elif response_mode == "advanced":
-        stream = client.responses.create(
+        return dict(
             input=messages,
             model="o3-pro",
             instructions=system_prompt,
             reasoning=Reasoning(effort="high", summary="detailed"),
-            stream=True,
             temperature=1.0,
             store=False,
         )
-        return stream
     else:
         raise Exception("Unexpected response_mode")
 
 
+def history_hash(messages):
+    encoded = json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def upload_image(image_bytes, media_type):
+    """Upload function of the asset cache (OpenAI files do not expire)"""
+    extension = media_type.split("/")[-1]
+    file = client.files.create(file=(f"image.{extension}", image_bytes, media_type), purpose="vision")
+    return file.id, None
+
+
+def get_stream(messages, response_mode, session_id=None, previous_response_id=None, resolve_image=None):
+    """
+    Open a response stream; with previous_response_id, `messages` holds only the new turn.
+    Returns (stream, bytes of the request input)
+    """
+    params = get_request_params(messages, response_mode, resolve_image)
+    if session_id is not None:
+        # Note: Keeps the requests of a session (and of its forks; see Session.fork) on the same prompt cache
+        cache_key = request_context.current().get("cache_key", session_id)
+        params["extra_body"] = {"prompt_cache_key": f"workbench-{cache_key}"}
+    if CHAINING and session_id is not None:
+        params["store"] = True
+        if previous_response_id is not None:
+            params["previous_response_id"] = previous_response_id
+    input_bytes = len(json.dumps(params["input"]))
+    logger.debug(f"Sending messages to the API server ({input_bytes} bytes)")
+    # Note: Returns once the response headers arrived (connection and server queueing)
+    with tracing.span("get_stream", input_bytes=input_bytes, chained=previous_response_id is not None):
+        stream = client.responses.create(**params, stream=True)
+    return stream, input_bytes
+
+
+def open_stream(messages, response_mode, session_id, resolve_image=None):
+    """Open a stream, chained to the session's last response if its history is unchanged"""
+    previous_response_id = None
+    if CHAINING and session_id is not None and len(messages) > 1:
+        with _chains_lock:
+            chain = _chains.get(session_id)
+        if chain is not None and chain[0] == response_mode and chain[1] == history_hash(messages[:-1]):
+            previous_response_id = chain[2]
+        elif chain is not None:
+            logger.debug("Session history was edited (or the mode changed); sending the full history")
+    if previous_response_id is not None:
+        try:
+            stream, input_bytes = get_stream(messages[-1:], response_mode, session_id, previous_response_id,
+                                             resolve_image)
+            return stream, input_bytes, True
+        except (NotFoundError, BadRequestError) as e:
+            # Note: E.g. the stored response expired or was deleted
+            logger.warning(f"Chained request failed, sending the full history: {e}")
+            with _chains_lock:
+                _chains.pop(session_id, None)
+    stream, input_bytes = get_stream(messages, response_mode, session_id, resolve_image=resolve_image)
+    return stream, input_bytes, False
+
+
+def fork_session(source_id, target_id):
+    """A fork starts with the same history, so it can continue the session's response chain"""
+    with _chains_lock:
+        if source_id in _chains:
+            _chains[target_id] = _chains[source_id]
+
+
 def run(messages, response_mode, parent):
-    with get_stream(messages, response_mode) as stream:
+    with asset_cache.request_assets("openai", upload_image) as resolve_image:
+        return _run(messages, response_mode, parent, resolve_image)
+
+
+def _run(messages, response_mode, parent, resolve_image):
+    context_ids = request_context.current()
+    session_id = context_ids.get("session_id")
+    start = time.perf_counter()
+    first_token = None
+    response_id = None
+    deltas = []
+    stream, input_bytes, chained = open_stream(messages, response_mode, session_id, resolve_image)
+    with tracing.span("stream") as span, stream:
         for event in stream:
             # If stop requested
             if parent.stop_requested:
                 # Exit ungracefully
                 return False
+            if event.type == "response.created":
+                response_id = event.response.id
             if event.type == "response.in_progress":
                 parent.safe_signal_emit("thinking", None)
             if event.type == "response.output_text.delta":
+                if first_token is None:
+                    first_token = time.perf_counter()
+                span.add_delta(event.delta)
+                deltas.append(event.delta)
                 parent.safe_signal_emit("generating", event.delta)
+            if event.type == "response.completed":
+                details = getattr(event.response.usage, "input_tokens_details", None)
+                cached_tokens = getattr(details, "cached_tokens", 0) or 0
+                ttft = (first_token - start) * 1000 if first_token is not None else float("nan")
+                logger.info(f"OpenAI turn: {input_bytes} bytes sent (chained: {chained}), TTFT {ttft:.0f} ms, "
+                            f"{cached_tokens} cached input tokens")
+    # Note: Concurrent candidates would overwrite each other's chain, whichever of them is committed
+    if CHAINING and session_id is not None and response_id is not None and "candidate" not in context_ids:
+        # Note: The document will hold the response exactly as streamed (see Session.on_worker_event)
+        history = messages + [{"role": "assistant", "content": [{"type": "text", "text": "".join(deltas)}]}]
+        with _chains_lock:
+            _chains[session_id] = (response_mode, history_hash(history), response_id)
     # Exit gracefully
     return True
@@ -1,12 +1,21 @@
 import logging
 import threading
 from PySide6.QtCore import QObject, Signal
+from utils import request_context, tracing
+from api import compaction
 from api import utils_anthropic
 from api import utils_openai
 from api import utils_gemini
 
 logger = logging.getLogger(__name__)
 
+# Backend name -> module providing run(messages, response_mode, parent)
+BACKENDS = {
+    "openai": utils_openai,
+    "anthropic": utils_anthropic,
+    "gemini": utils_gemini,
+}
+
 class Worker(QObject):
     signal = Signal(dict)
     
@@ -18,22 +27,23 @@ class Worker(QObject):
         self.messages = messages
         self.response_mode = response_mode
         self.stop_requested = False
+        # Note: Created on the UI thread; the IDs are bound again on the worker's thread
+        self.context_ids = request_context.current()
 
     def _background_task(self):
+        request_context.bind(**self.context_ids)
         try:
             # Emit initial state
             self.safe_signal_emit("waiting", None)
             
             # Known Issue: The background task can hang if this part never returns
             #   This would prevent the thread from ending, causing a memory leak
-            if self.backend == "openai":
-                graceful = utils_openai.run(self.messages, self.response_mode, parent=self)
-            elif self.backend == "anthropic":
-                graceful = utils_anthropic.run(self.messages, self.response_mode, parent=self)
-            elif self.backend == "gemini":
-                graceful = utils_gemini.run(self.messages, self.response_mode, parent=self)
-            else:
+            if self.backend not in BACKENDS:
                 raise Exception("Unexpected backend")
+            # Note: Compaction only changes what is sent; self.messages is left as parsed
+            messages = compaction.compact(self.messages, self.backend)
+            with tracing.span("worker.run", backend=self.backend, response_mode=self.response_mode):
+                graceful = BACKENDS[self.backend].run(messages, self.response_mode, parent=self)
             
             # Note: "ending" implies a graceful exit
             if graceful:
@@ -43,10 +53,17 @@ class Worker(QObject):
             self.safe_signal_emit("error", str(e))
         logger.debug("Exiting the thread")
 
+    def memory_usage(self):
+        """Approximate bytes held by the request (message text and base64 images)"""
+        return messages_size(self.messages)
+
     def safe_signal_emit(self, state, payload):
         # Note: This wrapper ensures that workers requested to stop do not emit signals
         if not self.stop_requested:
-            self.signal.emit({"state": state, "payload": payload})
+            if tracing.is_enabled():
+                self.signal.emit({"state": state, "payload": payload, "emitted_at": tracing.now_us()})
+            else:
+                self.signal.emit({"state": state, "payload": payload})
 
     def start(self):
         thread = threading.Thread(target=self._background_task)
@@ -59,3 +76,23 @@ class Worker(QObject):
         # Self-Deletion
         logger.debug("Calling deleteLater on Worker")
         self.deleteLater()
+
+
+def messages_size(messages):
+    """Approximate bytes of parsed messages (see parse_text)"""
+    total = 0
+    for message in messages or []:
+        for item in message["content"]:
+            total += sum(len(value) for value in item.values() if isinstance(value, str))
+    return total
+
+
+def fork_session(source_id, target_id):
+    """Let a forked session reuse the provider state of its source (see Session.fork)"""
+    # Known Issue: In process mode, the provider state lives in the child processes and is not forked;
+    #   the fork still shares the prompt cache key
+    for module in BACKENDS.values():
+        # Note: The hook is optional (e.g. Anthropic caching needs no state)
+        hook = getattr(module, "fork_session", None)
+        if hook is not None:
+            hook(source_id, target_id)
@@ -0,0 +1,122 @@
+"""
+Benchmark: loading, typing and scrolling a large transcript, TextEditor vs PlainTextEditor
+
+A synthetic transcript (User/Assistant turns with prose, code, and an image every few turns) is
+loaded the way a session loads a workspace (setPlainText + restore_images). Key presses are then
+sent in the middle of the document and the editor is scrolled page by page; each step is timed
+until the viewport is repainted.
+
+Usage (from src/): python -m benchmarks.bench_editor_modes [--size-mb 10] [--modes rich plain]
+"""
+import time
+import argparse
+from PySide6.QtCore import Qt, QEvent
+from PySide6.QtGui import QImage, QColor, QKeyEvent
+from PySide6.QtWidgets import QApplication
+from ui.text_editor.text_editor import TextEditor
+from ui.text_editor.plain_text_editor import PlainTextEditor
+from headless.batch_runner import percentile
+from utils.blob_store import blob_hash
+
+EDITOR_CLASSES = {"rich": TextEditor, "plain": PlainTextEditor}
+IMAGE_EVERY = 8  # Turns
+
+
+def make_transcript(size):
+    """Return (text, number of images) of about size characters"""
+    prose = ("The quick brown fox jumps over the lazy dog while the compiler reports nothing unusual. " * 6).strip()
+    code = "\n".join(f"    result_{i} = compute(value_{i}, factor={i})  # step {i}" for i in range(12))
+    parts, length, turn, images = [], 0, 0, 0
+    while length < size:
+        user = f"User:\nQuestion {turn}: {prose}\n"
+        if turn % IMAGE_EVERY == 0:
+            user += "\ufffc\n"
+            images += 1
+        part = f"{user}\nAssistant:\n{prose}\n```python\n{code}\n```\n{prose}\n\n"
+        parts.append(part)
+        length += len(part)
+        turn += 1
+    return "".join(parts) + "User:\n", images
+
+
+def paint(app, editor):
+    app.processEvents()
+    editor.viewport().repaint()
+
+
+def make_images(count):
+    """Distinct PNG images, keyed by content hash (in insertion order)"""
+    images = {}
+    for index in range(count):
+        image = QImage(256, 256, QImage.Format_RGB32)
+        image.fill(QColor(index % 256, (index // 256) % 256, 150))
+        png_data = TextEditor._image_to_png(None, image)
+        images[blob_hash(png_data)] = png_data
+    return images
+
+
+def run_mode(app, mode, text, images, keys, pages):
+    editor = EDITOR_CLASSES[mode]()
+    editor.resize(1000, 800)
+    editor.show()
+    app.processEvents()
+    start_time = time.perf_counter()
+    editor.setPlainText(text)
+    editor.restore_images(list(images), images.__getitem__)
+    paint(app, editor)
+    load_time = time.perf_counter() - start_time
+    # Typing in the middle of the document
+    cursor = editor.textCursor()
+    cursor.setPosition(editor.document().characterCount() // 2)
+    editor.setTextCursor(cursor)
+    editor.ensureCursorVisible()
+    paint(app, editor)
+    typing = []
+    for index in range(keys):
+        key, char = (Qt.Key_Return, "\r") if index % 40 == 39 else (Qt.Key_A, "a")
+        start_time = time.perf_counter()
+        QApplication.sendEvent(editor, QKeyEvent(QEvent.KeyPress, key, Qt.NoModifier, char))
+        paint(app, editor)
+        typing.append((time.perf_counter() - start_time) * 1000)
+    # Scrolling page by page from the top, then jumping to the end
+    scroll_bar = editor.verticalScrollBar()
+    scroll_bar.setValue(0)
+    paint(app, editor)
+    scrolling = []
+    for index in range(pages + 1):
+        start_time = time.perf_counter()
+        if index < pages:
+            scroll_bar.setValue(scroll_bar.value() + scroll_bar.pageStep())
+        else:
+            scroll_bar.setValue(scroll_bar.maximum())
+        paint(app, editor)
+        scrolling.append((time.perf_counter() - start_time) * 1000)
+    # Serializing for a request
+    start_time = time.perf_counter()
+    editor.get_text()
+    get_text_time = time.perf_counter() - start_time
+    editor.clean_up_resources()
+    app.processEvents()
+    return load_time, typing, scrolling, get_text_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare TextEditor and PlainTextEditor on a large transcript")
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--modes", nargs="+", choices=list(EDITOR_CLASSES), default=list(EDITOR_CLASSES))
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=100)
+    args = parser.parse_args()
+    app = QApplication([])
+    text, image_count = make_transcript(int(args.size_mb * 1024 * 1024))
+    images = make_images(image_count)
+    print(f"Transcript: {len(text) / (1024 * 1024):.1f} M characters, {image_count} images")
+    for mode in args.modes:
+        load_time, typing, scrolling, get_text_time = run_mode(app, mode, text, images, args.keys, args.pages)
+        print(f"[{mode}] load {load_time:.2f} s  |  get_text {get_text_time:.2f} s")
+        print(f"[{mode}] typing:    p50 {percentile(typing, 50):.1f} ms, p95 {percentile(typing, 95):.1f} ms, max {max(typing):.1f} ms")
+        print(f"[{mode}] scrolling: p50 {percentile(scrolling, 50):.1f} ms, p95 {percentile(scrolling, 95):.1f} ms, max {max(scrolling):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
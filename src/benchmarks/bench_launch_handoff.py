@@ -0,0 +1,47 @@
+"""
+Benchmark: second launch of main.pyw while an instance is running (single-instance hand-off)
+
+A stand-in instance server (see single_instance) runs in this process; main.pyw is launched with a
+workspace path and must hand it off and exit before importing Qt, so this also runs on Linux.
+
+Usage (from src/): python -m benchmarks.bench_launch_handoff [--runs 10]
+"""
+import os
+import sys
+import time
+import queue
+import argparse
+import tempfile
+import subprocess
+from utils.single_instance import InstanceServer
+from headless.batch_runner import percentile
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.pyw")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the hand-off latency of a second launch")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    received = queue.Queue()
+    with tempfile.TemporaryDirectory() as instance_dir:
+        server = InstanceServer(instance_dir, lambda launch_args, cwd: received.put(launch_args))
+        env = dict(os.environ, WORKBENCH_INSTANCE_DIR=instance_dir)
+        timings = []
+        for run in range(args.runs):
+            workspace_path = f"workspace-{run}.json"
+            start_time = time.perf_counter()
+            result = subprocess.run([sys.executable, MAIN_SCRIPT, workspace_path], env=env, capture_output=True)
+            elapsed = time.perf_counter() - start_time
+            if result.returncode != 0:
+                raise Exception(f"Launch failed: {result.stderr.decode(errors='replace')}")
+            if received.get(timeout=1) != [workspace_path]:
+                raise Exception("Unexpected hand-off arguments")
+            timings.append(elapsed * 1000)
+        server.close()
+    print(f"Hand-off launches: {args.runs}  |  p50 {percentile(timings, 50):.0f} ms, "
+          f"p95 {percentile(timings, 95):.0f} ms, max {max(timings):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: UI-thread cost of the Markdown preview while a response streams into a large transcript
+
+The preview is attached to an editor holding a synthetic transcript (see bench_editor_modes); a
+response is then streamed into the editor character by character. Reported: the time to fill the
+preview, the UI-thread time per preview update, and for comparison the time to render the whole
+transcript once (what re-rendering on every token would cost).
+
+Usage (from src/): python -m benchmarks.bench_markdown_preview [--size-mb 10]
+"""
+import time
+import argparse
+from PySide6.QtGui import QTextDocument
+from PySide6.QtWidgets import QApplication
+from ui.markdown_preview import MarkdownPreview
+from ui.text_editor.plain_text_editor import PlainTextEditor
+from benchmarks.bench_editor_modes import make_transcript
+from headless.batch_runner import percentile
+
+
+def wait_until_idle(app, preview, quiet_period=0.5):
+    """Process events until the preview has not changed for quiet_period seconds"""
+    last_change, segments = time.perf_counter(), None
+    while time.perf_counter() - last_change < quiet_period:
+        app.processEvents()
+        time.sleep(0.005)
+        if len(preview.positions) != segments or not preview.renderer.queue.empty():
+            segments = len(preview.positions)
+            last_change = time.perf_counter()
+    return last_change
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the Markdown preview on a large transcript")
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--chars", type=int, default=2000, help="Characters streamed")
+    args = parser.parse_args()
+    app = QApplication([])
+    text, _ = make_transcript(int(args.size_mb * 1024 * 1024))
+    editor = PlainTextEditor()
+    editor.setPlainText(text)
+    preview = MarkdownPreview()
+    preview.resize(600, 800)
+    preview.show()
+    # Time every update on the UI thread
+    update_times = []
+    on_updated = preview.on_updated
+    def _timed_update(*update):
+        start_time = time.perf_counter()
+        on_updated(*update)
+        update_times.append((time.perf_counter() - start_time) * 1000)
+    preview.renderer.updated.disconnect(preview.on_updated)
+    preview.renderer.updated.connect(_timed_update)
+    # Fill the preview
+    start_time = time.perf_counter()
+    preview.attach(editor)
+    fill_time = wait_until_idle(app, preview) - start_time
+    print(f"Transcript: {len(text) / (1024 * 1024):.1f} M characters, {len(preview.positions)} segments")
+    print(f"Fill: {fill_time:.1f} s  |  UI thread: {sum(update_times) / 1000:.1f} s in {len(update_times)} updates, "
+          f"max {max(update_times):.0f} ms")
+    # Stream a response (about 500 characters per second)
+    update_times.clear()
+    response = ("Streamed prose with `inline code` and **bold** words. " * 3 + "\n") * (args.chars // 165 + 1)
+    for index, char in enumerate(response[:args.chars]):
+        editor.insert_at_end(char, 0, animate=False)
+        app.processEvents()
+        if index % 5 == 0:
+            time.sleep(0.01)
+    wait_until_idle(app, preview)
+    print(f"Streaming: {len(update_times)} updates  |  UI thread p50 {percentile(update_times, 50):.1f} ms, "
+          f"p95 {percentile(update_times, 95):.1f} ms, max {max(update_times):.1f} ms")
+    # For comparison: rendering the whole transcript once
+    document = QTextDocument()
+    start_time = time.perf_counter()
+    document.setMarkdown(editor.toPlainText())
+    document.toHtml()
+    print(f"Full render of the transcript (per update without the preview's cache): {time.perf_counter() - start_time:.2f} s")
+    preview.clean_up_resources()
+    editor.clean_up_resources()
+
+
+if __name__ == "__main__":
+    main()
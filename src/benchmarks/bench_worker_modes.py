@@ -0,0 +1,91 @@
+"""
+Benchmark: UI keystroke latency while responses stream, thread mode vs process mode
+
+A synthetic backend (see synthetic_backend) streams several responses at once; meanwhile key
+presses are posted to a text editor every 16 ms and the delay until each is handled is measured.
+
+Usage (from src/): python -m benchmarks.bench_worker_modes [--streams 4] [--modes thread process]
+"""
+import os
+import sys
+import time
+import argparse
+from PySide6.QtCore import Qt, QTimer, QEvent
+from PySide6.QtGui import QKeyEvent
+from PySide6.QtWidgets import QApplication, QTextEdit
+from api import worker
+from api import process_worker
+from benchmarks import synthetic_backend
+from headless.batch_runner import percentile
+
+
+class ProbeEditor(QTextEdit):
+    """Records the delay between posting a key press and handling it"""
+    def __init__(self):
+        super().__init__()
+        self.posted_at = []
+        self.latencies = []
+
+    def post_key(self):
+        self.posted_at.append(time.perf_counter())
+        QApplication.postEvent(self, QKeyEvent(QEvent.KeyPress, Qt.Key_A, Qt.NoModifier, "a"))
+
+    def keyPressEvent(self, event):
+        self.latencies.append(time.perf_counter() - self.posted_at.pop(0))
+        super().keyPressEvent(event)
+
+
+def run_mode(app, mode, streams):
+    probe = ProbeEditor()
+    sink = QTextEdit()  # Receives the streamed text, like a session
+    workers, finished = [], []
+    def _on_event(event_data):
+        if event_data["state"] == "generating":
+            sink.insertPlainText(event_data["payload"])
+        elif event_data["state"] in ("ending", "error"):
+            finished.append(event_data["state"])
+    worker_class = process_worker.ProcessWorker if mode == "process" else worker.Worker
+    for _ in range(streams):
+        stream_worker = worker_class("synthetic", [{"role": "user", "content": []}], "normal")
+        stream_worker.signal.connect(_on_event)
+        workers.append(stream_worker)
+    key_timer = QTimer()
+    key_timer.timeout.connect(probe.post_key)
+    key_timer.start(16)
+    start_time = time.perf_counter()
+    for stream_worker in workers:
+        stream_worker.start()
+    while len(finished) < streams:
+        app.processEvents()
+    elapsed = time.perf_counter() - start_time
+    key_timer.stop()
+    app.processEvents()
+    for stream_worker in workers:
+        stream_worker.clean_up_resources()
+    latencies = [latency * 1000 for latency in probe.latencies]
+    print(f"{mode:>8}: {streams} streams in {elapsed:.2f} s  |  "
+          f"keystroke latency p50 {percentile(latencies, 50):.1f} ms, p95 {percentile(latencies, 95):.1f} ms, "
+          f"p99 {percentile(latencies, 99):.1f} ms, max {max(latencies, default=0):.1f} ms  "
+          f"({len(latencies)} keys, errors: {finished.count('error')})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare UI keystroke latency between worker modes")
+    parser.add_argument("--streams", type=int, default=4, help="Concurrent streams")
+    parser.add_argument("--modes", nargs="+", default=["thread", "process"], choices=["thread", "process"])
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    worker.BACKENDS["synthetic"] = synthetic_backend
+    if "process" in args.modes:
+        # Start with warm children, as the app does
+        os.environ["WORKBENCH_WORKER_PROCESSES"] = str(args.streams)
+        pool = process_worker.get_pool()
+        while len(pool.idle) < args.streams:
+            time.sleep(0.05)
+    for mode in args.modes:
+        run_mode(app, mode, args.streams)
+    process_worker.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Synthetic provider backend for benchmarks (no network)
+
+Mimics the CPU profile of an SDK stream: every delta is parsed from a JSON server-sent event and
+turned into nested objects before it is emitted.
+"""
+import json
+import time
+
+CHUNKS = 2000
+EVENT = json.dumps({
+    "type": "response.output_text.delta",
+    "item_id": "msg_" + "0" * 48,
+    "output_index": 0,
+    "content_index": 0,
+    "delta": "lorem ipsum ",
+    "logprobs": [{"token": f"t{i}", "logprob": -0.1 * i, "top_logprobs": []} for i in range(40)],
+})
+
+
+class _Model:
+    """Stand-in for a validated SDK model"""
+    def __init__(self, data):
+        for key, value in data.items():
+            if isinstance(value, dict):
+                value = _Model(value)
+            elif isinstance(value, list):
+                value = [_Model(item) if isinstance(item, dict) else item for item in value]
+            setattr(self, key, value)
+
+
+def run(messages, response_mode, parent):
+    for _ in range(CHUNKS):
+        if parent.stop_requested:
+            return False
+        event = _Model(json.loads(EVENT))
+        parent.safe_signal_emit("generating", event.delta)
+        # Note: Real streams arrive in bursts; a short sleep releases the GIL like socket reads do
+        time.sleep(0.0005)
+    return True
@@ -0,0 +1,199 @@
+"""
+Persistent provider batch jobs (OpenAI Batch API / Anthropic Message Batches)
+
+A job file is written before anything is sent to the provider and updated after every
+transition, so a restarted process can pick up any job where it left off:
+  preparing -> submitted -> ended -> completed
+
+Note: This module must not import Qt
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import importlib
+from headless.workspace_items import read_sessions, extend_transcript, content_sha, is_workspace
+
+logger = logging.getLogger(__name__)
+
+BATCH_MODULES = {
+    "openai": "api.batch_openai",
+    "anthropic": "api.batch_anthropic",
+}
+
+
+class BatchJob:
+    """Persistent state of one provider batch"""
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def create(cls, job_dir, backend, response_mode, items):
+        job_id = "job-{}-{}".format(time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:8])
+        data = {
+            "job_id": job_id,
+            "backend": backend,
+            "response_mode": response_mode,
+            "status": "preparing",
+            "provider_batch_id": None,
+            "created_at": time.time(),
+            "items": {
+                f"item-{idx}": {
+                    "source_path": item.source_path,
+                    "session_index": item.session_index,
+                    "content_sha": item.content_sha,
+                }
+                for idx, item in enumerate(items)
+            },
+        }
+        job = cls(os.path.join(job_dir, f"{job_id}.json"), data)
+        job.save()
+        return job
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(path, json.load(f))
+
+    @property
+    def job_id(self):
+        return self.data["job_id"]
+
+    @property
+    def status(self):
+        return self.data["status"]
+
+    @property
+    def results_path(self):
+        return os.path.splitext(self.path)[0] + ".results.jsonl"
+
+    def set_status(self, status, **fields):
+        self.data["status"] = status
+        self.data.update(fields)
+        self.save()
+
+    def save(self):
+        write_atomic(self.path, json.dumps(self.data, indent=4))
+
+
+def load_jobs(job_dir):
+    jobs = []
+    if not os.path.isdir(job_dir):
+        return jobs
+    for filename in sorted(os.listdir(job_dir)):
+        if filename.endswith(".json"):
+            jobs.append(BatchJob.load(os.path.join(job_dir, filename)))
+    return jobs
+
+
+def submit_job(items, backend, response_mode, job_dir, base_url=None):
+    """Package items into a single provider batch and persist the job"""
+    if backend not in BATCH_MODULES:
+        raise Exception(f"Batch mode is not supported for backend: {backend}")
+    if not items:
+        raise Exception("No items to submit")
+    os.makedirs(job_dir, exist_ok=True)
+    module = importlib.import_module(BATCH_MODULES[backend])
+    job = BatchJob.create(job_dir, backend, response_mode, items)
+    requests = [(custom_id, item.get_messages(), response_mode)
+                for custom_id, item in zip(job.data["items"], items)]
+    # Known Issue: A crash between submission and the save below leaves a "preparing" job
+    #   whose provider batch is unknown; such jobs are reported by "status" and never resubmitted
+    batch_id = module.submit_batch(requests, module.make_client(base_url))
+    job.set_status("submitted", provider_batch_id=batch_id, submitted_at=time.time())
+    logger.info(f"{job.job_id}: submitted {len(items)} items as {backend} batch {batch_id}")
+    return job
+
+
+def poll_jobs(job_dir, base_url=None, wait=True, min_interval=10.0, max_interval=300.0):
+    """Poll every unfinished job until it ends, then collect and write back its results"""
+    interval = min_interval
+    while True:
+        pending = [job for job in load_jobs(job_dir) if job.status in ("submitted", "ended")]
+        if not pending:
+            logger.info("No unfinished batch jobs")
+            return
+        progressed = False
+        for job in pending:
+            module = importlib.import_module(BATCH_MODULES[job.data["backend"]])
+            client = module.make_client(base_url)
+            if job.status == "submitted":
+                state, progress = module.get_batch_status(job.data["provider_batch_id"], client)
+                logger.info(f"{job.job_id}: {progress}")
+                if progress != job.data.get("last_progress"):
+                    progressed = True
+                    job.set_status(job.status, last_progress=progress)
+                if state == "ended":
+                    job.set_status("ended", ended_at=time.time())
+            if job.status == "ended":
+                collect_results(job, module, client)
+                progressed = True
+        if not wait:
+            return
+        # Note: Back off while nothing changes; batches take minutes to hours
+        interval = min_interval if progressed else min(max_interval, interval * 1.5)
+        logger.info(f"Next poll in {interval:.0f}s")
+        time.sleep(interval)
+
+
+def collect_results(job, module, client):
+    """Download results, record them durably, then write them back into their source files"""
+    results = module.get_batch_results(job.data["provider_batch_id"], client)
+    # Step 1: Persist the raw results next to the job file (the write-back below can then be retried)
+    with open(job.results_path, "w", encoding="utf-8") as f:
+        for custom_id, item in job.data["items"].items():
+            result = results.get(custom_id, {"status": "error", "text": "", "error": "missing from batch output"})
+            f.write(json.dumps({"custom_id": custom_id, **item, **result}, ensure_ascii=False) + "\n")
+    # Step 2: Write back, grouped by source file
+    by_source = {}
+    for custom_id, item in job.data["items"].items():
+        result = results.get(custom_id)
+        if result is not None and result["status"] == "ok":
+            by_source.setdefault(item["source_path"], []).append((item, result["text"]))
+    written, skipped = 0, 0
+    for source_path, entries in by_source.items():
+        try:
+            count = write_back(source_path, entries)
+        except Exception as e:
+            logger.error(f"{job.job_id}: failed to write back into {source_path}: {e}")
+            count = 0
+        written += count
+        skipped += len(entries) - count
+    errors = sum(1 for result in results.values() if result["status"] != "ok")
+    logger.info(f"{job.job_id}: wrote back {written}, skipped {skipped} (source changed), {errors} errors; "
+                f"results in {job.results_path}")
+    job.set_status("completed", completed_at=time.time(), written=written, skipped=skipped, errors=errors)
+
+
+def write_back(source_path, entries):
+    """Extend each originating session whose text is unchanged since submission; return the count written"""
+    session_data_all = read_sessions(source_path)
+    count = 0
+    for item, response_text in entries:
+        idx = item["session_index"]
+        if (idx >= len(session_data_all) or content_sha(session_data_all[idx]["text_content"],
+                                                        session_data_all[idx].get("image_hashes", [])) != item["content_sha"]):
+            logger.warning(f"{source_path}#{idx} changed since submission; result left in the results file")
+            continue
+        # Note: The response is appended after the last image, so image_hashes stays aligned with the text
+        session_data = session_data_all[idx]
+        session_data["text_content"] = extend_transcript(session_data["text_content"], response_text)
+        count += 1
+    if count == 0:
+        return 0
+    if is_workspace(source_path):
+        write_atomic(source_path, json.dumps({"session_data_all": session_data_all}, ensure_ascii=False, indent=4))
+    else:
+        write_atomic(source_path, session_data_all[0]["text_content"])
+    return count
+
+
+def write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
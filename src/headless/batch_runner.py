@@ -0,0 +1,174 @@
+"""
+Headless runner: streams many conversations through the api.utils_* backends concurrently
+
+Note: This module must not import Qt (api.worker does); backend modules are imported lazily
+"""
+import json
+import time
+import logging
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from headless.workspace_items import extend_transcript
+
+logger = logging.getLogger(__name__)
+
+BACKEND_MODULES = {
+    "openai": "api.utils_openai",
+    "anthropic": "api.utils_anthropic",
+    "gemini": "api.utils_gemini",
+}
+
+
+class HeadlessCollector:
+    """Stand-in for api.worker.Worker: collects the events emitted by utils_*.run"""
+    def __init__(self, stop_event):
+        self.stop_event = stop_event
+        self.chunks = []
+        self.error = None
+        self.start_time = time.perf_counter()
+        self.first_token_time = None
+
+    @property
+    def stop_requested(self):
+        return self.stop_event.is_set()
+
+    def safe_signal_emit(self, state, payload):
+        if state == "generating":
+            if self.first_token_time is None:
+                self.first_token_time = time.perf_counter()
+            self.chunks.append(payload)
+        elif state == "error":
+            self.error = payload
+
+
+def run_item(item, backend, response_mode, stop_event):
+    """Run a single work item and return its output record"""
+    collector = HeadlessCollector(stop_event)
+    try:
+        module = importlib.import_module(BACKEND_MODULES[backend])
+        graceful = module.run(item.get_messages(), response_mode, parent=collector)
+        status = "ok" if graceful else "stopped"
+    except Exception as e:
+        logger.error(f"{item.item_id}: {e}")
+        collector.error = str(e)
+        status = "error"
+    end_time = time.perf_counter()
+    response_text = "".join(collector.chunks)
+    record = {
+        "item_id": item.item_id,
+        "source_path": item.source_path,
+        "session_index": item.session_index,
+        "content_sha": item.content_sha,
+        "backend": backend,
+        "response_mode": response_mode,
+        "status": status,
+        "error": collector.error,
+        "latency_s": round(end_time - collector.start_time, 4),
+        "ttft_s": None if collector.first_token_time is None else round(collector.first_token_time - collector.start_time, 4),
+        "response_text": response_text,
+    }
+    if status == "ok":
+        record["text_content"] = extend_transcript(item.text_content, response_text)
+        if item.image_hashes:
+            record["image_hashes"] = item.image_hashes
+    return record
+
+
+def load_completed_keys(output_path):
+    """Return the keys of items that already finished successfully in a previous run"""
+    completed = set()
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Note: A crash can leave a truncated last line; that item simply runs again
+                    continue
+                if record.get("status") == "ok":
+                    completed.add(result_key(record))
+    except FileNotFoundError:
+        pass
+    return completed
+
+
+def result_key(record):
+    return (record["item_id"], record["content_sha"], record["backend"], record["response_mode"])
+
+
+def run_batch(items, backend, response_mode, output_path, concurrency=8, resume=True):
+    """Run items with bounded concurrency, appending one JSON line per finished item"""
+    if backend not in BACKEND_MODULES:
+        raise Exception(f"Unexpected backend: {backend}")
+    completed = load_completed_keys(output_path) if resume else set()
+    pending = [item for item in items
+               if (item.item_id, item.content_sha, backend, response_mode) not in completed]
+    logger.info(f"{len(items)} items, {len(items) - len(pending)} already completed, {len(pending)} to run")
+    stats = BatchStats()
+    stop_event = threading.Event()
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Note: Submission is bounded so that only a window of items is in flight at any time
+        queue = iter(pending)
+        in_flight = set()
+        try:
+            while True:
+                while len(in_flight) < concurrency * 2:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    in_flight.add(executor.submit(run_item, item, backend, response_mode, stop_event))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    stats.add(record)
+                    logger.info(f"[{stats.count}/{len(pending)}] {record['status']} {record['item_id']} ({record['latency_s']:.2f}s)")
+        except KeyboardInterrupt:
+            logger.warning("Interrupted; finished items are kept and will be skipped on resume")
+            stop_event.set()
+            for future in in_flight:
+                future.cancel()
+            raise
+        finally:
+            logger.info(stats.report())
+    return stats
+
+
+class BatchStats:
+    """Throughput and latency bookkeeping for a batch run"""
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.count = 0
+        self.status_counts = {}
+        self.latencies = []
+        self.ttfts = []
+        self.output_chars = 0
+
+    def add(self, record):
+        self.count += 1
+        self.status_counts[record["status"]] = self.status_counts.get(record["status"], 0) + 1
+        self.latencies.append(record["latency_s"])
+        if record["ttft_s"] is not None:
+            self.ttfts.append(record["ttft_s"])
+        self.output_chars += len(record["response_text"])
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+        return (
+            f"Finished {self.count} items in {elapsed:.1f}s {self.status_counts} | "
+            f"throughput {self.count / elapsed:.2f} items/s, {self.output_chars / elapsed:.0f} chars/s | "
+            f"latency p50 {percentile(self.latencies, 50):.2f}s p90 {percentile(self.latencies, 90):.2f}s "
+            f"max {percentile(self.latencies, 100):.2f}s | ttft p50 {percentile(self.ttfts, 50):.2f}s"
+        )
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
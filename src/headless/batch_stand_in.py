@@ -0,0 +1,221 @@
+"""
+Local stand-in for the provider batch endpoints (no network, no API key)
+
+Serves the subset of the OpenAI Batch API (files, batches) and Anthropic Message Batches
+that api.batch_openai / api.batch_anthropic use. Every request is answered with a short reply that
+counts the images it carried; a batch ends after it has been polled a few times.
+
+Note: Paths are accepted with or without the /v1 prefix, so the same --base-url works for both backends
+
+Usage (from src/): python -m headless.batch_stand_in [--port 8765]
+  then: python main_headless.py batch-submit <paths...> --base-url http://127.0.0.1:8765
+"""
+import re
+import json
+import time
+import uuid
+import logging
+import argparse
+import threading
+from email.parser import BytesParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TYPES = ("input_image", "image")
+
+
+def count_images(value):
+    if isinstance(value, dict):
+        return int(value.get("type") in IMAGE_TYPES) + sum(count_images(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(count_images(item) for item in value)
+    return 0
+
+
+def make_reply(body):
+    return f"Stand-in reply ({count_images(body)} images)"
+
+
+class BatchStandIn:
+    """In-process server; batches end once they have been polled polls_to_end times"""
+    def __init__(self, host="127.0.0.1", port=0, polls_to_end=2):
+        self.polls_to_end = polls_to_end
+        self.files = {}  # File ID -> bytes
+        self.batches = {}  # Batch ID -> {"backend", "polls", "data", "results"}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, name="BatchStandIn", daemon=True)
+        self.thread.start()
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _make_handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.handle(self, "GET")
+
+            def do_POST(self):
+                stand_in.handle(self, "POST")
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def handle(self, handler, method):
+        path = handler.path.split("?")[0]
+        path = path[len("/v1"):] if path.startswith("/v1/") else path
+        body = handler.rfile.read(int(handler.headers.get("Content-Length", 0)))
+        routes = [
+            ("POST", r"/files", self.create_file),
+            ("GET", r"/files/([\w-]+)/content", self.get_file_content),
+            ("POST", r"/batches", self.create_openai_batch),
+            ("GET", r"/batches/([\w-]+)", self.get_openai_batch),
+            ("POST", r"/messages/batches", self.create_anthropic_batch),
+            ("GET", r"/messages/batches/([\w-]+)", self.get_anthropic_batch),
+            ("GET", r"/messages/batches/([\w-]+)/results", self.get_anthropic_results),
+        ]
+        for route_method, pattern, route in routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                try:
+                    with self.lock:
+                        status, content_type, payload = route(handler, body, *match.groups())
+                except KeyError:
+                    status, content_type, payload = 404, "application/json", {"error": {"message": "not found"}}
+                break
+        else:
+            status, content_type, payload = 404, "application/json", {"error": {"message": f"no route: {method} {path}"}}
+        data = json.dumps(payload).encode("utf-8") if content_type == "application/json" else payload
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _poll(self, batch_id):
+        """Count a status request; return True once the batch has ended"""
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        return batch["polls"] >= self.polls_to_end
+
+    # OpenAI
+    def create_file(self, handler, body):
+        message = BytesParser().parsebytes(
+            b"Content-Type: " + handler.headers["Content-Type"].encode("latin-1") + b"\r\n\r\n" + body)
+        content = next(part.get_payload(decode=True) for part in message.get_payload()
+                       if part.get_param("name", header="content-disposition") == "file")
+        file_id = f"file-{uuid.uuid4().hex}"
+        self.files[file_id] = content
+        return 200, "application/json", {"id": file_id, "object": "file", "bytes": len(content),
+                                         "created_at": int(time.time()), "filename": "batch.jsonl",
+                                         "purpose": "batch", "status": "processed"}
+
+    def get_file_content(self, handler, body, file_id):
+        return 200, "application/octet-stream", self.files[file_id]
+
+    def create_openai_batch(self, handler, body):
+        params = json.loads(body)
+        lines = [json.loads(line) for line in self.files[params["input_file_id"]].decode("utf-8").splitlines() if line.strip()]
+        output_file_id = f"file-{uuid.uuid4().hex}"
+        self.files[output_file_id] = "".join(json.dumps({
+            "id": f"batch_req_{idx}",
+            "custom_id": line["custom_id"],
+            "response": {"status_code": 200, "request_id": f"req_{idx}", "body": {
+                "object": "response",
+                "status": "completed",
+                "output": [{"type": "message", "role": "assistant", "content": [
+                    {"type": "output_text", "text": make_reply(line["body"]), "annotations": []}]}],
+            }},
+            "error": None,
+        }) + "\n" for idx, line in enumerate(lines)).encode("utf-8")
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        self.batches[batch_id] = {"polls": 0, "total": len(lines), "output_file_id": output_file_id, "data": {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": params["endpoint"],
+            "input_file_id": params["input_file_id"],
+            "completion_window": params["completion_window"],
+            "created_at": int(time.time()),
+        }}
+        return 200, "application/json", self._openai_batch(batch_id, ended=False)
+
+    def get_openai_batch(self, handler, body, batch_id):
+        return 200, "application/json", self._openai_batch(batch_id, ended=self._poll(batch_id))
+
+    def _openai_batch(self, batch_id, ended):
+        batch = self.batches[batch_id]
+        return {**batch["data"],
+                "status": "completed" if ended else "in_progress",
+                "output_file_id": batch["output_file_id"] if ended else None,
+                "error_file_id": None,
+                "request_counts": {"total": batch["total"], "completed": batch["total"] if ended else 0, "failed": 0}}
+
+    # Anthropic
+    def create_anthropic_batch(self, handler, body):
+        requests = json.loads(body)["requests"]
+        batch_id = f"msgbatch_{uuid.uuid4().hex}"
+        self.batches[batch_id] = {"polls": 0, "total": len(requests), "results": "".join(json.dumps({
+            "custom_id": request["custom_id"],
+            "result": {"type": "succeeded", "message": {
+                "id": f"msg_{idx}",
+                "type": "message",
+                "role": "assistant",
+                "model": request["params"]["model"],
+                "content": [{"type": "text", "text": make_reply(request["params"])}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": 0, "output_tokens": 0},
+            }},
+        }) + "\n" for idx, request in enumerate(requests)).encode("utf-8"), "data": {
+            "id": batch_id,
+            "type": "message_batch",
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "expires_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 86400)),
+            "archived_at": None,
+            "cancel_initiated_at": None,
+        }}
+        return 200, "application/json", self._anthropic_batch(batch_id, ended=False)
+
+    def get_anthropic_batch(self, handler, body, batch_id):
+        return 200, "application/json", self._anthropic_batch(batch_id, ended=self._poll(batch_id))
+
+    def get_anthropic_results(self, handler, body, batch_id):
+        return 200, "application/x-jsonl", self.batches[batch_id]["results"]
+
+    def _anthropic_batch(self, batch_id, ended):
+        batch = self.batches[batch_id]
+        return {**batch["data"],
+                "processing_status": "ended" if ended else "in_progress",
+                "ended_at": batch["data"]["created_at"] if ended else None,
+                "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+                "request_counts": {"processing": 0 if ended else batch["total"],
+                                   "succeeded": batch["total"] if ended else 0,
+                                   "errored": 0, "canceled": 0, "expired": 0}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the provider batch endpoints")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    stand_in = BatchStandIn(port=args.port)
+    print(f"Batch stand-in listening on {stand_in.base_url} (Ctrl+C to stop)")
+    try:
+        stand_in.thread.join()
+    except KeyboardInterrupt:
+        stand_in.close()
+
+
+if __name__ == "__main__":
+    main()
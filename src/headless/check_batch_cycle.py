@@ -0,0 +1,64 @@
+"""
+Check: a provider batch runs submit -> poll -> write-back against the local stand-in (see batch_stand_in)
+
+For each batch backend, a workspace (with an image) and a plain transcript are submitted through
+api.batch_*, polled until the batch ends and written back; the replies must land in the sessions.
+
+Usage (from src/): python -m headless.check_batch_cycle
+"""
+import os
+import tempfile
+from utils.blob_store import blob_hash
+from headless.workspace_items import load_items, read_sessions
+from headless.batch_jobs import submit_job, poll_jobs, load_jobs, BATCH_MODULES
+from headless.batch_stand_in import BatchStandIn
+from headless.check_round_trip import PNG_DATA, write_workspace, check
+
+
+def check_backend(backend, base_url, work_dir):
+    digest = blob_hash(PNG_DATA)
+    workspace_path = os.path.join(work_dir, "workspace.json")
+    write_workspace(workspace_path, [
+        {"text_content": "User:\nWhat is in this image? \ufffc\n", "image_hashes": [digest]},
+        {"text_content": "User:\nNo images here\n"},
+    ], {digest: PNG_DATA})
+    transcript_path = os.path.join(work_dir, "transcript.txt")
+    with open(transcript_path, "w", encoding="utf-8") as f:
+        f.write("User:\nHello\n")
+    job_dir = os.path.join(work_dir, "batch_jobs")
+    # Submit
+    job = submit_job(load_items([workspace_path, transcript_path]), backend, "normal", job_dir, base_url=base_url)
+    check(job.status == "submitted" and job.data["provider_batch_id"], "the job is submitted")
+    # Poll: the first poll sees a running batch, the next one collects and writes back
+    poll_jobs(job_dir, base_url=base_url, wait=True, min_interval=0.05)
+    [job] = load_jobs(job_dir)
+    check(job.status == "completed", "the job is completed")
+    check((job.data["written"], job.data["skipped"], job.data["errors"]) == (3, 0, 0), "every item is written back")
+    # Write-back
+    session_data_all = read_sessions(workspace_path)
+    check(session_data_all[0]["text_content"] ==
+          "User:\nWhat is in this image? \ufffc\nAssistant:\nStand-in reply (1 images)\nUser:\n",
+          "the image reached the provider and the reply is appended")
+    check(session_data_all[0]["image_hashes"] == [digest], "image_hashes are kept")
+    check(session_data_all[1]["text_content"].endswith("Assistant:\nStand-in reply (0 images)\nUser:\n"),
+          "the second session gets its reply")
+    with open(transcript_path, "r", encoding="utf-8") as f:
+        check(f.read().endswith("Assistant:\nStand-in reply (0 images)\nUser:\n"), "the transcript gets its reply")
+    # A second poll has nothing left to do
+    poll_jobs(job_dir, base_url=base_url, wait=False)
+    check(load_jobs(job_dir)[0].data["written"] == 3, "a completed job is not collected again")
+
+
+def main():
+    stand_in = BatchStandIn()
+    try:
+        for backend in BATCH_MODULES:
+            with tempfile.TemporaryDirectory() as work_dir:
+                check_backend(backend, stand_in.base_url, work_dir)
+            print(f"{backend}: batch cycle OK")
+    finally:
+        stand_in.close()
+
+
+if __name__ == "__main__":
+    main()
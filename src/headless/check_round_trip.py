@@ -0,0 +1,74 @@
+"""
+Check: a workspace with an image survives the headless path (load -> request -> write-back)
+
+A workspace is written the way SaveEngine writes it (images as U+FFFC in text_content, PNG bytes
+in the .blobs container). Its items must carry the image as a base64 tag to the provider, and a
+written-back response must keep image_hashes aligned with the text.
+
+Usage (from src/): python -m headless.check_round_trip
+"""
+import os
+import json
+import base64
+import tempfile
+from utils.blob_store import BlobContainer, blob_hash, container_path_for
+from utils.workspace_reader import scan_workspace
+from headless.workspace_items import WorkItem, load_items, read_sessions
+from headless.batch_jobs import write_back
+
+# A 1x1 PNG
+PNG_DATA = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==")
+
+
+def write_workspace(path, session_data_all, blobs):
+    BlobContainer(container_path_for(path)).write_many(blobs)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"session_data_all": session_data_all}, f, ensure_ascii=False)
+
+
+def check(condition, message):
+    if not condition:
+        raise Exception(f"Check failed: {message}")
+
+
+def main():
+    digest = blob_hash(PNG_DATA)
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "workspace.json")
+        write_workspace(path, [
+            {"text_content": "User:\nWhat is in this image? \ufffc\nAnd this one: \ufffc\n\n\n", "image_hashes": [digest, digest]},
+            {"text_content": "User:\nNo images here\n"},
+        ], {digest: PNG_DATA})
+        # Load: images reach the request as base64 tags
+        items = load_items([path])
+        check(len(items) == 2, "both sessions are loaded")
+        tag = "<8442d621>{}</8442d621>".format(base64.b64encode(PNG_DATA).decode("utf-8"))
+        check(items[0].get_text() == f"User:\nWhat is in this image? {tag}\nAnd this one: {tag}\n\n\n",
+              "images become base64 tags")
+        messages = items[0].get_messages()
+        images = [item for item in messages[0]["content"] if item["type"] == "image"]
+        check(len(images) == 2, "the request carries both images")
+        check("\ufffc" not in json.dumps(messages, ensure_ascii=False), "no U+FFFC is sent")
+        # Write-back: the response is appended after the images
+        entries = [({"session_index": 0, "content_sha": items[0].content_sha}, "Two dots \ufffc."),
+                   ({"session_index": 1, "content_sha": items[1].content_sha}, "Indeed.")]
+        check(write_back(path, entries) == 2, "both sessions are written back")
+        session_data_all = read_sessions(path)
+        check(session_data_all[0]["image_hashes"] == [digest, digest], "image_hashes are kept")
+        check(session_data_all[0]["text_content"].count("\ufffc") == 2, "the text still has two images")
+        check(session_data_all[0]["text_content"].endswith("\nAssistant:\nTwo dots \ufffd.\nUser:\n"),
+              "the response is appended")
+        check("image_hashes" not in session_data_all[1], "sessions without images stay without")
+        check([ref.load() for ref in scan_workspace(path)] == session_data_all, "the app can load the workspace")
+        # Reload: the images are still found (the sessions now end with an empty user turn)
+        item = WorkItem(path, 0, session_data_all[0]["text_content"], session_data_all[0]["image_hashes"],
+                        BlobContainer(container_path_for(path)).read)
+        check(item.get_text().count(tag) == 2, "the written-back session still has its images")
+        # A write-back never overwrites a session that changed since submission
+        check(write_back(path, entries) == 0, "changed sessions are skipped")
+    print("Round trip OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Loading of headless work items from Workbench workspaces and transcript files
+
+Note: This module must not import Qt; it is shared by the headless entry points
+"""
+import os
+import json
+import base64
+import hashlib
+import logging
+from utils.parse_text import parse_text
+from utils.blob_store import BlobContainer, container_path_for
+
+logger = logging.getLogger(__name__)
+
+
+class WorkItem:
+    """
+    A single conversation (one session of a workspace, or one transcript file)
+
+    Images are U+FFFC in text_content; their content hashes are listed in order in image_hashes, and
+    load_blob(hash) returns their PNG bytes (from the workspace's blob container)
+    """
+    def __init__(self, source_path, session_index, text_content, image_hashes=(), load_blob=None):
+        self.source_path = source_path
+        self.session_index = session_index
+        self.text_content = text_content
+        self.image_hashes = list(image_hashes)
+        self.load_blob = load_blob
+        self.item_id = "{}#{}".format(source_path, session_index)
+        self.content_sha = content_sha(text_content, self.image_hashes)
+
+    def get_text(self):
+        """The text with images as base64 tags, like TextEditor.get_text()"""
+        if not self.image_hashes:
+            return self.text_content
+        pieces = self.text_content.split("\ufffc")
+        if len(pieces) != len(self.image_hashes) + 1:
+            raise Exception("Unexpected number of images in {}".format(self.item_id))
+        parts = [pieces[0]]
+        for digest, piece in zip(self.image_hashes, pieces[1:]):
+            base64_data = base64.b64encode(self.load_blob(digest)).decode("utf-8")
+            parts.append(f"<8442d621>{base64_data}</8442d621>")
+            parts.append(piece)
+        return "".join(parts)
+
+    def get_messages(self):
+        return parse_text(self.get_text())
+
+
+def content_sha(text_content, image_hashes=()):
+    # Note: Sessions without images hash as before, so jobs submitted earlier still match
+    data = text_content + "".join(image_hashes)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def load_items(paths):
+    """Expand files and directories into work items (invalid transcripts are skipped)"""
+    items = []
+    for path in iter_source_files(paths):
+        try:
+            session_data_all = read_sessions(path)
+        except Exception as e:
+            logger.error(f"Failed to read {path}: {e}")
+            continue
+        container = None
+        for session_index, session_data in enumerate(session_data_all):
+            image_hashes = session_data.get("image_hashes", [])
+            if image_hashes and container is None:
+                container = BlobContainer(container_path_for(path))
+            item = WorkItem(path, session_index, session_data["text_content"], image_hashes,
+                            container.read if container is not None else None)
+            try:
+                messages = item.get_messages()
+            except Exception as e:
+                logger.error(f"Skipping {item.item_id}: {e}")
+                continue
+            if messages is None:
+                logger.warning(f"Skipping {item.item_id}: not a valid transcript ending with 'User:'")
+                continue
+            items.append(item)
+    return items
+
+
+def iter_source_files(paths):
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            for root, _, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    if os.path.splitext(filename)[1].lower() in (".json", ".txt", ".md"):
+                        yield os.path.join(root, filename)
+        else:
+            yield path
+
+
+def is_workspace(path):
+    return os.path.splitext(path)[1].lower() == ".json"
+
+
+def read_sessions(path):
+    """Return the session data ({"text_content", "image_hashes"}) of a workspace (.json) or transcript file"""
+    with open(path, "r", encoding="utf-8") as f:
+        if is_workspace(path):
+            return json.load(f)["session_data_all"]
+        return [{"text_content": f.read()}]
+
+
+def extend_transcript(text_content, response_text):
+    """Append an assistant turn and a fresh user tag, mirroring what Session does in the UI"""
+    # Note: Trailing newlines are the scroll-past-end padding of the editor; they are not content
+    # Note: U+FFFC marks an image; one in the response would misalign the session's image_hashes
+    response_text = response_text.replace("\ufffc", "\ufffd")
+    return text_content.rstrip("\n") + "\nAssistant:\n" + response_text + "\nUser:\n"
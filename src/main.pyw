@@ -9,30 +9,26 @@ if getattr(sys, "frozen", False):
     BASE_DIR = os.path.dirname(os.path.abspath(sys.executable))
 else:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Single instance: hand the arguments to a running instance before paying for the heavy imports
+# Note: Worker processes must not hand off; they import this file as "__mp_main__" (spawn), or run
+#   it as "__main__" with --multiprocessing-fork (PyInstaller build)
+from utils.single_instance import forward_to_running_instance, InstanceServer
+INSTANCE_DIR = os.environ.get("WORKBENCH_INSTANCE_DIR", os.path.join(BASE_DIR, "instance"))
+if (__name__ == "__main__" and "--multiprocessing-fork" not in sys.argv
+        and os.environ.get("WORKBENCH_SINGLE_INSTANCE", "1") != "0"
+        and forward_to_running_instance(INSTANCE_DIR, sys.argv[1:])):
+    sys.exit(0)
 # Import other dependencies
 import logging
-from logging.handlers import RotatingFileHandler
+import multiprocessing
+from utils.logging_pipeline import setup_logging as setup_logging_pipeline, stop_logging
 from PySide6.QtWidgets import QApplication, QTextEdit
 from ui.main_window import MainWindow
 
 
 def setup_logging():
-    log_dir = os.path.join(BASE_DIR, "logs")
-    # Check if log directory exists, if not, create it
-    os.makedirs(log_dir, exist_ok=True)
-    # Configure logging
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.StreamHandler(),
-            RotatingFileHandler(
-                os.path.join(log_dir, "app.log"),
-                maxBytes=5 * 1024 * 1024,  # max log file size (5 MB)
-                backupCount=5  # keep last 5 backup log files
-            )
-        ]
-    )
+    # Note: Log calls only enqueue records; a writer thread does the file I/O (see logging_pipeline)
+    setup_logging_pipeline(os.path.join(BASE_DIR, "logs"), level=logging.DEBUG)
     # Set logger levels for different modules
     logging.getLogger("PySide6").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
@@ -57,18 +53,28 @@ def main():
     text_edit.fontMetrics().boundingRect("🙂")
     text_edit.deleteLater()  # Self-Deletion
     # Create main window
-    window = MainWindow()
+    window = MainWindow(BASE_DIR)
     window.show()
+    window.open_launch_args(sys.argv[1:], os.getcwd())
+    # Later launches hand off to this instance
+    instance_server = None
+    if os.environ.get("WORKBENCH_SINGLE_INSTANCE", "1") != "0":
+        instance_server = InstanceServer(INSTANCE_DIR, window.handoff_received.emit)
     # Run application event loop
     logger.info("Entering main event loop")
     result = app.exec()
     # Clean up remaining resources
     logger.info("Main event loop finished; Cleaning up remaining resources")
+    if instance_server is not None:
+        instance_server.close()
     app.processEvents()
     # Exit application
     logger.info("Application exiting")
+    stop_logging()
     sys.exit(result)
 
 
 if __name__ == "__main__":
+    # Note: Required for worker processes in a PyInstaller build (see ProcessWorker)
+    multiprocessing.freeze_support()
     main()
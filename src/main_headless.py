@@ -0,0 +1,93 @@
+# Headless (non-GUI) entry point for bulk jobs over Workbench workspaces and transcripts
+# Note: Nothing reachable from this file may import Qt
+#   Usage: python main_headless.py run <paths...> --output results.jsonl [--backend openai] [--concurrency 8]
+#          python main_headless.py batch-submit <paths...> [--backend openai]
+#          python main_headless.py batch-poll [--no-wait]
+#          python main_headless.py batch-status
+import os
+import sys
+# Check if the app is packaged by PyInstaller
+if getattr(sys, "frozen", False):
+    BASE_DIR = os.path.dirname(os.path.abspath(sys.executable))
+else:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Import other dependencies
+import argparse
+import logging
+from headless.workspace_items import load_items
+from headless.batch_runner import run_batch, BACKEND_MODULES
+from headless.batch_jobs import submit_job, poll_jobs, load_jobs, BATCH_MODULES
+
+
+def setup_logging(verbose):
+    logging.basicConfig(
+        level=logging.DEBUG if verbose else logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("anthropic").setLevel(logging.WARNING)
+    logging.getLogger("openai").setLevel(logging.WARNING)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Workbench headless batch runner")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    # run: stream every conversation through a backend
+    run_parser = subparsers.add_parser("run", help="Run workspaces/transcripts and write results to JSONL")
+    run_parser.add_argument("paths", nargs="+", help="Workspace .json files, transcript files or directories")
+    run_parser.add_argument("--output", required=True, help="JSONL output file (appended to; used for resume)")
+    run_parser.add_argument("--backend", choices=sorted(BACKEND_MODULES), default="openai")
+    run_parser.add_argument("--response-mode", choices=["normal", "thinking", "advanced"], default="normal")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--no-resume", action="store_true", help="Re-run items already completed in the output")
+    # batch-*: provider batch APIs for large offline jobs (persisted in --job-dir)
+    default_job_dir = os.path.join(BASE_DIR, "batch_jobs")
+    submit_parser = subparsers.add_parser("batch-submit", help="Submit workspaces/transcripts as one provider batch")
+    submit_parser.add_argument("paths", nargs="+", help="Workspace .json files, transcript files or directories")
+    submit_parser.add_argument("--backend", choices=sorted(BATCH_MODULES), default="openai")
+    submit_parser.add_argument("--response-mode", choices=["normal", "thinking", "advanced"], default="normal")
+    poll_parser = subparsers.add_parser("batch-poll", help="Poll unfinished batches and write results back")
+    poll_parser.add_argument("--no-wait", action="store_true", help="Poll once instead of until all jobs end")
+    status_parser = subparsers.add_parser("batch-status", help="List batch jobs")
+    for sub_parser in (submit_parser, poll_parser, status_parser):
+        sub_parser.add_argument("--job-dir", default=default_job_dir)
+        # Note: Point this at a local stand-in endpoint to exercise batch mode without the real API
+        sub_parser.add_argument("--base-url", default=None, help="Override the provider API base URL")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    setup_logging(args.verbose)
+    logger = logging.getLogger(__name__)
+    if args.command == "run":
+        items = load_items(args.paths)
+        try:
+            stats = run_batch(items, args.backend, args.response_mode, args.output,
+                              concurrency=max(1, args.concurrency), resume=not args.no_resume)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        sys.exit(0 if stats.status_counts.get("error", 0) == 0 else 1)
+    elif args.command == "batch-submit":
+        items = load_items(args.paths)
+        job = submit_job(items, args.backend, args.response_mode, args.job_dir, base_url=args.base_url)
+        logger.info(f"Job saved to {job.path}; run batch-poll to collect results")
+    elif args.command == "batch-poll":
+        try:
+            poll_jobs(args.job_dir, base_url=args.base_url, wait=not args.no_wait)
+        except KeyboardInterrupt:
+            logger.info("Polling interrupted; run batch-poll again to resume")
+            sys.exit(130)
+    elif args.command == "batch-status":
+        for job in load_jobs(args.job_dir):
+            logger.info("{} {} {} items={} {}".format(
+                job.job_id, job.data["backend"], job.status, len(job.data["items"]), job.data.get("last_progress", "")))
+    else:
+        raise Exception(f"Unexpected command: {args.command}")
+
+
+if __name__ == "__main__":
+    main()
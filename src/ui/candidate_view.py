@@ -0,0 +1,84 @@
+import logging
+from PySide6.QtCore import QEvent, Qt
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QTabWidget, QPlainTextEdit, QLabel
+
+logger = logging.getLogger(__name__)
+
+
+class CandidateView(QWidget):
+    """Compact view of several responses streaming at once; one of them is committed to the transcript"""
+    def __init__(self, count, font, on_commit, on_discard):
+        # Note: CandidateView relies on the self-deletion pattern for clean-up
+        super().__init__(parent=None)
+        # Define attributes
+        self.on_commit = on_commit    # Callback: on_commit(index)
+        self.on_discard = on_discard  # Callback: on_discard()
+        self.states = ["waiting"] * count
+        self.lengths = [0] * count  # Characters received per candidate
+        # Set up layout
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.tabs = QTabWidget(self)
+        self.tabs.setDocumentMode(True)
+        self.editors = []
+        for index in range(count):
+            # Note: QPlainTextEdit appends streamed text cheaply
+            editor = QPlainTextEdit()
+            editor.setReadOnly(True)
+            editor.setFont(font)
+            editor.installEventFilter(self)
+            self.editors.append(editor)
+            self.tabs.addTab(editor, "")
+            self.update_tab_title(index)
+        layout.addWidget(self.tabs)
+        self.hint = QLabel(f"Candidates  |  1~{count} or Alt+Left/Right: Switch  |  Enter: Use  |  Esc: Discard all")
+        layout.addWidget(self.hint)
+
+    def append(self, index, text):
+        # Note: A separate cursor leaves the reader's cursor (and scroll position) alone
+        cursor = QTextCursor(self.editors[index].document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.lengths[index] += len(text)
+        self.update_tab_title(index)
+
+    def set_state(self, index, state):
+        self.states[index] = state
+        self.update_tab_title(index)
+
+    def update_tab_title(self, index):
+        self.tabs.setTabText(index, f"#{index + 1} {self.states[index]} ({self.lengths[index]})")
+
+    def text(self, index):
+        return self.editors[index].toPlainText()
+
+    def current_index(self):
+        return self.tabs.currentIndex()
+
+    def focus(self):
+        self.tabs.currentWidget().setFocus()
+
+    def eventFilter(self, source, event):
+        if event.type() == QEvent.KeyPress:
+            mods, key = event.modifiers(), event.key()
+            if not mods and key in (Qt.Key_Return, Qt.Key_Enter):
+                self.on_commit(self.current_index())
+                return True
+            if not mods and key == Qt.Key_Escape:
+                self.on_discard()
+                return True
+            if not mods and Qt.Key_1 <= key < Qt.Key_1 + len(self.editors):
+                self.tabs.setCurrentIndex(key - Qt.Key_1)
+                self.focus()
+                return True
+            if mods == Qt.AltModifier and key in (Qt.Key_Left, Qt.Key_Right):
+                step = 1 if key == Qt.Key_Right else -1
+                self.tabs.setCurrentIndex((self.current_index() + step) % len(self.editors))
+                self.focus()
+                return True
+        return super().eventFilter(source, event)
+
+    def clean_up_resources(self):
+        # Self-Deletion
+        self.deleteLater()
@@ -1,24 +1,75 @@
 import os
-import json
+import time
 import logging
 import win32con
 from ctypes import windll, wintypes
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QEvent, QTimer, Signal
 from PySide6.QtGui import QAction, QKeySequence, QShortcut
-from PySide6.QtWidgets import QMainWindow, QVBoxLayout, QWidget, QApplication, QSystemTrayIcon, QMenu, QFileDialog
+from PySide6.QtWidgets import QMainWindow, QVBoxLayout, QWidget, QApplication, QSystemTrayIcon, QMenu, QFileDialog, QSplitter, QMessageBox
 from ui.workspace import Workspace
+from ui.markdown_preview import MarkdownPreview
+from ui.memory_manager import MemoryManager
+from api.process_worker import shutdown_pool
+from api import asset_cache
 from ui.status_bar.global_status_bar import GlobalStatusBar
 from utils.app_icons import get_app_icon
+from utils.save_engine import SaveEngine
+from utils.journal import Journal, replay_journal
+from utils.workspace_reader import scan_workspace
+from utils.closed_session_history import ClosedSessionHistory
+from utils.search_index import SearchIndex
+from utils.record_store import RecordStore
+from utils.stall_monitor import StallMonitor
+from utils import tracing
 
 logger = logging.getLogger(__name__)
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # Emitted from the instance server thread: (args, cwd)
+    handoff_received = Signal(list, str)
+    
+    def __init__(self, base_dir):
         super().__init__()
         # Define attributes
         self.save_path = None
         self.alt_o_id = 1  # Hotkey IDs
         self.alt_u_id = 2
+        self.is_in_tray = False
+        self.handoff_received.connect(self.on_handoff)
+        # Saving happens on a background thread (see SaveEngine)
+        self.save_engine = SaveEngine()
+        self.save_engine.finished.connect(self.on_save_finished)
+        # Crash recovery: replay the journal left behind by an unclean exit, then start a new one
+        journal_path = os.path.join(base_dir, "journal", "workspace.journal")
+        try:
+            recovered_data = replay_journal(journal_path)
+        except Exception as e:
+            logger.error(f"Failed to replay journal: {e}")
+            recovered_data = None
+            # Keep the unreadable journal for manual inspection instead of overwriting it
+            os.replace(journal_path, journal_path + ".corrupt")
+        self.journal = Journal(journal_path)
+        # Closed sessions are kept on disk, across restarts (Ctrl+Shift+T)
+        self.closed_session_history = ClosedSessionHistory(os.path.join(base_dir, "history", "closed_sessions.sqlite3"))
+        # Full-text search (Ctrl+Shift+F); known workspace files are re-indexed when their mtime changes
+        self.search_index = SearchIndex(os.path.join(base_dir, "index", "search.sqlite3"))
+        self.search_index.refresh_sources()
+        self.index_refresh_timer = QTimer(self)
+        self.index_refresh_timer.timeout.connect(self.search_index.refresh_sources)
+        self.index_refresh_timer.start(30000)
+        # Hibernated sessions (see MemoryManager); records left by a previous run are stale
+        self.hibernation_store = RecordStore(os.path.join(base_dir, "hibernation", "sessions.sqlite3"))
+        self.hibernation_store.clear()
+        # Images uploaded through provider file APIs (opt-in; see asset_cache)
+        asset_cache.configure(os.path.join(base_dir, "assets", "assets.sqlite3"))
+        # Event-loop stall detection (F12 toggles); stalls are reported to logs/stalls.jsonl
+        self.stall_monitor = StallMonitor(os.path.join(base_dir, "logs", "stalls.jsonl"))
+        if os.environ.get("WORKBENCH_STALL_MONITOR", "1") != "0":
+            self.stall_monitor.start()
+        # Request tracing (Ctrl+F12 toggles); traces are written to logs/traces
+        self.trace_dir = os.path.join(base_dir, "logs", "traces")
+        if os.environ.get("WORKBENCH_TRACE", "0") == "1":
+            tracing.start()
         # Configure window
         self.update_window_title()
         self.resize(800, 600)
@@ -28,23 +79,37 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
         layout.setContentsMargins(0, 0, 0, 0)
+        # Markdown preview of the current session, next to the workspace (F7 toggles)
+        # Note: Created first; the workspace attaches its current session (see update_preview)
+        self.markdown_preview = MarkdownPreview()
+        self.markdown_preview.hide()
         # Add the workspace
         self.workspace = Workspace(self)
-        layout.addWidget(self.workspace)
+        splitter = QSplitter(Qt.Horizontal)
+        splitter.addWidget(self.workspace)
+        splitter.addWidget(self.markdown_preview)
+        layout.addWidget(splitter)
         # Initialize the global status bar
         self.global_status_bar = GlobalStatusBar(self)
-        self.global_status_bar.update_backend_status(self.workspace.backend)
+        self.global_status_bar.update_backend_status(self.workspace.backend, self.workspace.worker_mode)
         layout.addWidget(self.global_status_bar)
+        # Keep session memory under a budget by hibernating idle background tabs
+        self.memory_manager = MemoryManager(self.workspace, self.hibernation_store, self.global_status_bar)
+        # Restore unsaved work from the previous run
+        if recovered_data is not None:
+            self.restore_recovered_data(recovered_data)
         # Focus on the workspace
         self.workspace.focus()
         # Set up system tray and global hotkeys
-        self.is_in_tray = False
         self.setup_system_tray()
         self.register_global_hotkeys()
         # Register keyboard shortcuts
         QShortcut(QKeySequence("Ctrl+S"), self).activated.connect(self.handle_save)
         QShortcut(QKeySequence("Ctrl+Shift+S"), self).activated.connect(self.handle_save_as)
         QShortcut(QKeySequence("Ctrl+O"), self).activated.connect(self.handle_load_file)
+        QShortcut(QKeySequence("F12"), self).activated.connect(self.toggle_stall_monitor)
+        QShortcut(QKeySequence("Ctrl+F12"), self).activated.connect(self.toggle_tracing)
+        QShortcut(QKeySequence("F7"), self).activated.connect(self.toggle_preview)
     
     def update_window_title(self):
         if self.save_path is None:
@@ -52,16 +117,29 @@ class MainWindow(QMainWindow):
         else:
             self.setWindowTitle("{} - Workbench".format(os.path.basename(self.save_path)))
     
+    def restore_recovered_data(self, data):
+        logger.info(f"Recovering {len(data['session_data_all'])} sessions from the journal")
+        # Note: Images are in the journal, or in the workspace file's blob container if never edited
+        def _load_blob(digest):
+            if self.journal.blob_container.has(digest) or data["save_path"] is None:
+                return self.journal.blob_container.read(digest)
+            return self.save_engine.get_container(data["save_path"]).read(digest)
+        self.workspace.set_data(data, _load_blob)
+        self.set_save_path(data["save_path"])
+        self.global_status_bar.show_save_success("Recovered unsaved work from the last session")
+
+    def set_save_path(self, save_path):
+        self.save_path = save_path
+        self.update_window_title()
+        self.journal.record_meta(save_path)
+
     def handle_save(self):
         logger.info("Save triggered (Ctrl+S).")
         if not self.save_path:
             self.handle_save_as()  # If no current file, behave like Save As
         else:
             try:
-                with open(self.save_path, "w", encoding="utf-8") as f:
-                    json.dump(self.workspace.get_data(), f, indent=4)
-                self.global_status_bar.show_save_success(f"Saved to {self.save_path}")
-                logger.info(f"Saved to {self.save_path}")
+                self.save_to(self.save_path)
             except Exception as e:
                 self.global_status_bar.show_save_error(f"Error during save: {e}")
                 logger.error(f"Error during save: {e}")
@@ -74,32 +152,116 @@ class MainWindow(QMainWindow):
             if filepath:
                 if not os.path.splitext(filepath)[1] and selected_filter == "JSON (*.json)":
                     filepath += ".json"
-                with open(filepath, "w", encoding="utf-8") as f:
-                    json.dump(self.workspace.get_data(), f, indent=4)
-                self.save_path = filepath
-                self.update_window_title()
-                self.global_status_bar.show_save_success(f"Saved to {filepath}")
-                logger.info(f"Saved to {self.save_path}")
+                self.save_to(filepath)
+                self.set_save_path(filepath)
         except Exception as e:
             logger.error(f"Error during save as: {e}")
             self.global_status_bar.show_save_error(f"Error during save as: {e}")
+
+    def save_to(self, filepath):
+        # Note: Only the snapshot is taken on the UI thread; the result arrives in on_save_finished
+        entries, blobs = self.workspace.get_save_snapshot()
+        self.save_engine.request_save(filepath, entries, blobs)
+
+    def on_save_finished(self, result):
+        if result["error"] is None:
+            container = self.save_engine.get_container(result["path"])
+            self.workspace.update_record_refs(result["path"], result["records"], container)
+            if result["path"] == self.save_path:
+                # Note: Records are written in tab order (the signal does not keep the order of the keys)
+                records = result["records"]
+                self.workspace.saved_session_uids = sorted(records, key=lambda key: records[key][0])
+            self.search_index.add_source(result["path"])
+            self.global_status_bar.show_save_success(f"Saved to {result['path']}")
+            logger.info(f"Saved to {result['path']}")
+        else:
+            self.global_status_bar.show_save_error(f"Error during save: {result['error']}")
     
     def handle_load_file(self):
         """Handles the Ctrl+O (load file) action."""
         logger.info("Load file triggered (Ctrl+O).")
+        open_dir = os.path.dirname(self.save_path) if self.save_path else ""
+        filepath, _ = QFileDialog.getOpenFileName(self, "Open File", open_dir, "JSON (*.json);;All Files (*)")
+        if filepath:
+            self.load_file(filepath)
+    
+    def load_file(self, filepath, store_sessions=False):
+        """store_sessions: keep the replaced tabs in the closed-session history"""
         try:
-            open_dir = os.path.dirname(self.save_path) if self.save_path else ""
-            filepath, _ = QFileDialog.getOpenFileName(self, "Open File", open_dir, "JSON (*.json);;All Files (*)")
-            if filepath:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    self.workspace.set_data(json.load(f))
-                self.save_path = filepath
-                self.update_window_title()
+            # Note: The file is only scanned for record locations; sessions load when first shown
+            # Images are stored once per content hash in the workspace's blob container
+            container = self.save_engine.get_container(filepath)
+            self.workspace.set_data({"session_data_all": scan_workspace(filepath, container)}, store_sessions=store_sessions)
+            self.workspace.saved_session_uids = [self.workspace.widget(idx).session_uid for idx in range(self.workspace.count())]
+            self.search_index.add_source(filepath)
+            self.set_save_path(filepath)
+            if store_sessions:
+                self.global_status_bar.show_save_success(f"Loaded from {filepath}  |  Previous tabs: Ctrl+Shift+T")
+            else:
                 self.global_status_bar.show_save_success(f"Loaded from {filepath}")
         except Exception as e:
             logger.error(f"Error during load file: {e}")
             self.global_status_bar.show_save_error(f"Error during load file: {e}")
     
+    def open_launch_args(self, args, cwd):
+        """Open the workspace files among the arguments of a launch (e.g. a file association)"""
+        for arg in args:
+            filepath = os.path.abspath(os.path.join(cwd, arg))
+            if filepath.lower().endswith(".json") and os.path.isfile(filepath):
+                # Note: A launch comes unannounced (e.g. a double click in Explorer), so nothing is discarded:
+                #   busy sessions need a confirmation, and the replaced tabs go to the closed-session history
+                busy = sum(1 for idx in range(self.workspace.count()) if self.workspace.widget(idx).is_busy())
+                if busy:
+                    answer = QMessageBox.question(
+                        self, "Open Workspace",
+                        f"{busy} session(s) are still generating. Stop them and open {os.path.basename(filepath)}?")
+                    if answer != QMessageBox.Yes:
+                        continue
+                self.load_file(filepath, store_sessions=True)
+    
+    def on_handoff(self, args, cwd):
+        """A second launch handed its arguments to this instance (see single_instance)"""
+        logger.info(f"Launch handed off: {args}")
+        self.show_window()
+        self.open_launch_args(args, cwd)
+    
+    def toggle_preview(self):
+        self.markdown_preview.setVisible(self.markdown_preview.isHidden())
+        self.update_preview(self.workspace.currentWidget())
+        self.global_status_bar.show_info("Markdown preview: " + ("OFF" if self.markdown_preview.isHidden() else "ON"))
+
+    def update_preview(self, session):
+        """The preview follows the current session; while hidden, it previews nothing"""
+        if self.markdown_preview.isHidden() or session is None or not session.is_materialized():
+            self.markdown_preview.attach(None)
+        else:
+            self.markdown_preview.attach(session.text_editor)
+
+    def toggle_stall_monitor(self):
+        if self.stall_monitor.toggle():
+            self.global_status_bar.show_info("Stall monitor: ON")
+        else:
+            p50, p99, worst = self.stall_monitor.latency_percentiles()
+            self.global_status_bar.show_info(
+                f"Stall monitor: OFF  |  Event-loop latency p50 {p50:.1f} ms, p99 {p99:.1f} ms, max {worst:.0f} ms  |  "
+                f"Stalls: {self.stall_monitor.stall_count}")
+
+    def toggle_tracing(self):
+        if tracing.is_enabled():
+            path = self.write_trace()
+            self.global_status_bar.show_info(f"Tracing: OFF  |  Trace written to {path}")
+        else:
+            tracing.start()
+            self.global_status_bar.show_info("Tracing: ON  |  Ctrl+F12 again to write the trace")
+
+    def write_trace(self):
+        path = os.path.join(self.trace_dir, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+        try:
+            tracing.stop(path)
+        except OSError as e:
+            logger.error(f"Failed to write trace: {e}")
+        return path
+
     def setup_system_tray(self):
         """Configure system tray icon and menu"""
         self.tray_icon = QSystemTrayIcon(self)
@@ -137,6 +299,7 @@ class MainWindow(QMainWindow):
             self.setWindowState(self.windowState() & ~Qt.WindowMinimized)
             self.activateWindow()
             self.is_in_tray = False
+            self.workspace.update_rendering()
 
         def _show_window_gaurenteed():
             # Issue: In Windows 11, when attempting to restore the PyQt application window (with Alt+O), occasionally
@@ -179,6 +342,14 @@ class MainWindow(QMainWindow):
             logger.debug("Hide window: hiding window to tray")
             self.is_in_tray = True
             self.hide()
+            # Sessions buffer streamed text while hidden (see Workspace.update_rendering)
+            self.workspace.update_rendering()
+
+    def changeEvent(self, event):
+        # Note: A minimized window renders nothing either
+        if event.type() == QEvent.WindowStateChange and getattr(self, "workspace", None) is not None:
+            self.workspace.update_rendering()
+        super().changeEvent(event)
 
     def register_global_hotkeys(self):
         """Register global hotkeys."""
@@ -221,7 +392,22 @@ class MainWindow(QMainWindow):
         """Exit the application."""
         logger.info("Quit application requested")
         # Clean up workspace resources
+        if tracing.is_enabled():
+            self.write_trace()
+        self.stall_monitor.clean_up_resources()
+        self.memory_manager.clean_up_resources()
+        self.markdown_preview.clean_up_resources()
         self.workspace.clean_up_resources()
+        # Finish pending saves
+        self.save_engine.clean_up_resources()
+        # A clean exit leaves no journal behind
+        self.journal.close(remove=True)
+        self.closed_session_history.close()
+        self.index_refresh_timer.stop()
+        self.search_index.close()
+        self.hibernation_store.close()
+        shutdown_pool()
+        asset_cache.shutdown()
         # Unregister hotkeys
         self.unregister_global_hotkeys()
         # Hide tray icon
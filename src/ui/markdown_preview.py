@@ -0,0 +1,117 @@
+import logging
+from PySide6.QtGui import QColor, QPalette, QTextCursor, QTextBlockFormat, QTextCharFormat
+from PySide6.QtWidgets import QTextBrowser
+from utils.markdown_renderer import MarkdownRenderer
+
+logger = logging.getLogger(__name__)
+
+
+class MarkdownPreview(QTextBrowser):
+    """
+    Rendered Markdown of the current session (F7 toggles; see MainWindow.toggle_preview)
+
+    Parsing and rendering happen on the renderer's thread (see MarkdownRenderer); this pane only
+    forwards the edits of the previewed document and splices the rendered segments in.
+
+    Known Issue: Filling the preview of a very large transcript takes several seconds for 10 MB;
+        it is filled in chunks, so the UI stays usable meanwhile
+    """
+    def __init__(self):
+        # Note: MarkdownPreview relies on the self-deletion pattern for clean-up
+        super().__init__(parent=None)
+        self.setOpenExternalLinks(True)
+        # Note: Updates replace segments all the time; there is nothing to undo
+        self.document().setUndoRedoEnabled(False)
+        # Set color (as in TextEditor)
+        pal = self.palette()
+        pal.setColor(QPalette.Text, QColor(216, 222, 233))  # Text
+        pal.setColor(QPalette.Base, QColor(48, 56, 65))     # Background
+        self.setPalette(pal)
+        # Define attributes
+        self.text_editor = None  # Editor being previewed
+        self.generation = 0      # Incremented on every attach; older updates are dropped
+        self.positions = []      # Start position of each segment in this document
+        self.renderer = MarkdownRenderer()
+        self.renderer.updated.connect(self.on_updated)
+
+    def attach(self, text_editor):
+        """Preview a text editor (None: nothing)"""
+        if text_editor is self.text_editor:
+            return
+        self.detach()
+        if text_editor is None:
+            return
+        self.text_editor = text_editor
+        text_editor.document().contentsChange.connect(self.on_contents_change)
+        self.reset()
+
+    def detach(self):
+        if self.text_editor is not None:
+            try:
+                self.text_editor.document().contentsChange.disconnect(self.on_contents_change)
+            except RuntimeError:
+                pass  # The editor is already deleted
+            self.text_editor = None
+        self.reset()
+
+    def reset(self):
+        """Clear the preview and render the previewed text from scratch"""
+        self.generation += 1
+        self.positions = []
+        self.clear()
+        if self.text_editor is not None:
+            self.renderer.reset(self.generation, self.text_editor.toPlainText())
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        document = self.text_editor.document()
+        # Large changes (e.g. setPlainText) are cheaper to send as a new text
+        if chars_added > 65536 or chars_removed > 65536:
+            self.reset()
+            return
+        inserted = ""
+        if chars_added:
+            cursor = QTextCursor(document)
+            cursor.setPosition(position)
+            # Note: The count may include the final paragraph separator
+            cursor.setPosition(min(position + chars_added, document.characterCount() - 1), QTextCursor.KeepAnchor)
+            # Note: selectedText() uses U+2029 as the paragraph separator
+            inserted = cursor.selectedText().replace("\u2029", "\n")
+        self.renderer.edit(position, chars_removed, inserted)
+
+    def on_updated(self, generation, index, removed, htmls):
+        """Replace segments [index, index + removed) by the rendered htmls"""
+        if generation != self.generation:
+            return
+        document = self.document()
+        scroll_bar = self.verticalScrollBar()
+        # Follow the end of the document (e.g. a streaming response) if it was in view
+        at_end = scroll_bar.value() >= scroll_bar.maximum() - 4
+        end_index = index + removed
+        start = self.positions[index] if index < len(self.positions) else document.characterCount() - 1
+        end = self.positions[end_index] if end_index < len(self.positions) else document.characterCount() - 1
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        new_positions = []
+        for html in htmls:
+            new_positions.append(cursor.position())
+            # Note: Each segment starts in a plain block; the block would otherwise inherit the format of
+            #   the segment before it (e.g. a code block), which differs between a first insert and a replace
+            cursor.setBlockFormat(QTextBlockFormat())
+            cursor.setCharFormat(QTextCharFormat())
+            cursor.insertHtml(html)
+            cursor.insertBlock()
+        cursor.endEditBlock()
+        # Shift the positions of the segments after the replaced ones
+        delta = cursor.position() - end
+        self.positions[index:] = new_positions + [position + delta for position in self.positions[end_index:]]
+        if at_end:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def clean_up_resources(self):
+        self.detach()
+        self.renderer.close()
+        # Self-Deletion
+        self.deleteLater()
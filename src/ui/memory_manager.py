@@ -0,0 +1,78 @@
+import os
+import time
+import logging
+from PySide6.QtCore import QObject, QTimer
+
+logger = logging.getLogger(__name__)
+
+
+def format_bytes(size):
+    if size < 1024 * 1024:
+        return f"{size / 1024:.0f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+class MemoryManager(QObject):
+    """
+    Keeps the estimated memory use of all sessions under a budget.
+
+    Every check, each session reports its usage (see Session.memory_usage); the totals go to the
+    global status bar and the breakdown to the tab tooltips. Over budget, idle background sessions
+    are hibernated (least recently used first) until usage is back under the target.
+
+    Note: The budget is set with WORKBENCH_MEMORY_BUDGET_MB (default: 1024)
+    """
+    def __init__(self, workspace, store, status_bar, check_interval=15000, min_idle_seconds=300):
+        super().__init__(parent=workspace)
+        self.workspace = workspace
+        self.store = store
+        self.status_bar = status_bar
+        self.budget = int(os.environ.get("WORKBENCH_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024
+        self.target = int(self.budget * 0.8)  # Hysteresis: hibernate down to 80% of the budget
+        self.min_idle_seconds = min_idle_seconds
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+        self.timer.start(check_interval)
+
+    def check(self):
+        sessions = [self.workspace.widget(idx) for idx in range(self.workspace.count())]
+        usages = {session.session_uid: session.memory_usage() for session in sessions}
+        total = sum(sum(usage.values()) for usage in usages.values())
+        if total > self.budget:
+            total -= self.hibernate_idle_sessions(sessions, usages, total - self.target)
+        # Report
+        for idx, session in enumerate(sessions):
+            if session.is_materialized():
+                usage = usages[session.session_uid]
+                tooltip = "  |  ".join(f"{name.capitalize()}: {format_bytes(size)}" for name, size in usage.items())
+            else:
+                tooltip = "Not loaded (restored when selected)"
+            self.workspace.setTabToolTip(idx, tooltip)
+        loaded = sum(session.is_materialized() for session in sessions)
+        self.status_bar.update_memory_status(total, self.budget, loaded, len(sessions))
+
+    def hibernate_idle_sessions(self, sessions, usages, excess):
+        """Hibernate idle background sessions until `excess` bytes are released; return the bytes released"""
+        current = self.workspace.currentWidget()
+        now = time.monotonic()
+        candidates = [session for session in sessions
+                      if session is not current
+                      and session.can_hibernate()
+                      and now - session.last_active >= self.min_idle_seconds]
+        candidates.sort(key=lambda session: session.last_active)
+        released = 0
+        for session in candidates:
+            if released >= excess:
+                break
+            size = sum(usages[session.session_uid].values())
+            if session.hibernate(self.store):
+                released += size
+                usages[session.session_uid] = {"text": 0, "images": 0, "undo": 0, "worker": 0}
+        if released:
+            logger.info(f"Hibernated idle sessions, released about {format_bytes(released)}")
+        elif excess > 0:
+            logger.debug("Over the memory budget, but no session can be hibernated")
+        return released
+
+    def clean_up_resources(self):
+        self.timer.stop()
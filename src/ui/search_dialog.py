@@ -0,0 +1,57 @@
+import time
+import logging
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem
+
+logger = logging.getLogger(__name__)
+
+
+class SearchDialog(QDialog):
+    """Ranked full-text search across saved workspaces, closed sessions and open tabs"""
+    def __init__(self, parent, search_index, open_hit):
+        super().__init__(parent)
+        # Define attributes
+        self.search_index = search_index
+        self.open_hit = open_hit  # Callback: open_hit(hit, query)
+        # Configure dialog
+        self.setWindowTitle("Search All  |  Enter: Open")
+        self.resize(700, 400)
+        layout = QVBoxLayout(self)
+        self.line_edit = QLineEdit(self)
+        self.line_edit.setPlaceholderText("Search workspaces, closed sessions and open tabs")
+        layout.addWidget(self.line_edit)
+        self.result_list = QListWidget(self)
+        self.result_list.setWordWrap(True)
+        layout.addWidget(self.result_list)
+        # Search as you type (debounced)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+        self.line_edit.textChanged.connect(lambda: self.search_timer.start(150))
+        # Open the selected (or first) hit
+        self.line_edit.returnPressed.connect(self.open_current)
+        self.result_list.itemActivated.connect(self.open_current)
+
+    def run_search(self):
+        start_time = time.perf_counter()
+        hits = self.search_index.search(self.line_edit.text())
+        elapsed = time.perf_counter() - start_time
+        self.result_list.clear()
+        for hit in hits:
+            item = QListWidgetItem("{}\n    {}".format(hit["title"], hit["snippet"]))
+            item.setData(Qt.UserRole, hit)
+            self.result_list.addItem(item)
+        if hits:
+            self.result_list.setCurrentRow(0)
+        self.setWindowTitle(f"{len(hits)} results in {elapsed * 1000:.1f} ms  |  Enter: Open")
+
+    def open_current(self):
+        # Note: Run a pending search first, so Enter right after typing opens a fresh result
+        if self.search_timer.isActive():
+            self.search_timer.stop()
+            self.run_search()
+        item = self.result_list.currentItem()
+        if item is None:
+            return
+        self.accept()
+        self.open_hit(item.data(Qt.UserRole), self.line_edit.text())
@@ -1,14 +1,30 @@
+import os
+import re
+import sys
+import time
+import uuid
 import logging
 from enum import Enum, auto
 from PySide6.QtCore import QEvent, Qt
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QDialog, QLineEdit
-from api.worker import Worker
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QDialog, QLineEdit, QCheckBox
+from api.worker import Worker, fork_session
+from api.process_worker import ProcessWorker
+from ui.candidate_view import CandidateView
 from ui.status_bar.local_status_bar import LocalStatusBar
 from ui.text_editor.text_editor import TextEditor
+from ui.text_editor.plain_text_editor import PlainTextEditor
 from utils.parse_text import parse_text
+from utils.record_store import StoredRecordRef
+from utils import request_context, tracing
 
 logger = logging.getLogger(__name__)
 
+# Number of candidates started by Alt+Enter (see Session.generate_candidates)
+CANDIDATE_COUNT = int(os.environ.get("WORKBENCH_CANDIDATES", "3"))
+# Editor: "rich" (TextEditor, with image thumbnails) or "plain" (PlainTextEditor, for large transcripts)
+EDITOR_CLASS = PlainTextEditor if os.environ.get("WORKBENCH_EDITOR", "rich") == "plain" else TextEditor
+
 
 class SessionState(Enum):
     IDLE = auto()
@@ -19,17 +35,60 @@ class SessionState(Enum):
 
 class Session(QWidget):
     """A single instance of a text editing session"""
-    def __init__(self, parent):
+    def __init__(self, parent, record_ref=None):
         # Note: Session relies on the self-deletion pattern for clean-up
         super().__init__(parent=None)
         # Define attributes
         self.workspace = parent
         self.search_text = ""
+        self.search_regex = False
+        self.search_case_sensitive = False
+        self.session_uid = uuid.uuid4().hex
+        # Provider prompt caches are keyed by lineage: forks keep the key of their source (see fork)
+        self.cache_key = self.session_uid
         # Set up layout
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.setContentsMargins(0, 0, 0, 0)
+        # Lazy materialization: a session loaded from a workspace file starts as a stub that only
+        #   knows where its record is (record_ref); the editor is built when the tab is first shown
+        self.record_ref = record_ref
+        self.text_editor = None
+        self.status_bar = None
+        # Initialize session state
+        self.session_state = SessionState.IDLE
+        # Initialize worker
+        self.worker = None
+        # Candidates: several responses streaming at once (see generate_candidates)
+        self.candidate_workers = []
+        self.candidate_view = None
+        # Workaround for scrolling past the last line
+        #     New attribute required to store trailing newline count
+        self.number_of_trailing_newline_characters = 0
+        # Dirty tracking: the revision changes with every document edit (see get_data)
+        self.revision = 0
+        self.cached_data = None  # (revision, data)
+        # Crash recovery: edits are journaled once the workspace calls start_journaling()
+        self.journaling = False
+        # Tracing: ID of the latest request (see generate_response)
+        self.request_id = None
+        # Hibernation: time of the last use, and the cursor position to restore (see hibernate)
+        self.last_active = time.monotonic()
+        self.hibernated_cursor_position = None
+        # Deferred rendering: streamed text is buffered while the session is not visible (see Workspace.update_rendering)
+        self.rendering_deferred = False
+        # Build the editor right away, unless this is a stub
+        if record_ref is None:
+            self.materialize()
+
+    def is_materialized(self):
+        return self.text_editor is not None
+
+    def materialize(self):
+        """Build the text editor (and load the record of a stub)"""
+        if self.is_materialized():
+            return
         # Create text editor
-        self.text_editor = TextEditor()
+        self.text_editor = EDITOR_CLASS()
         self.text_editor.insertPlainText("User:\n")
         # Add multiple lines to the end
         # Workaround: Enable scrolling past the last line
@@ -39,21 +98,156 @@ class Session(QWidget):
         cursor.setPosition(cursor_position)     # Set cursor to stored position
         self.text_editor.setTextCursor(cursor)  # Apply cursor position to editor
         # stretch=1: expands to occupy available space
-        layout.addWidget(self.text_editor, stretch=1)
-        # Initialize session state
-        self.session_state = SessionState.IDLE
-        # Initialize worker
-        self.worker = None
+        self.main_layout.addWidget(self.text_editor, stretch=1)
+        self.text_editor.set_deferred_rendering(self.rendering_deferred)
         # Install event filter on text editor to handle key events
         self.text_editor.installEventFilter(self)
         # Initialize the local status bar
         self.status_bar = LocalStatusBar(self)
         self.status_bar.update_session_status(self.session_state.name.lower())
         self.status_bar.update_read_only_status(self.text_editor.isReadOnly())
-        layout.addWidget(self.status_bar)
-        # Workaround for scrolling past the last line
-        #     New attribute required to store trailing newline count
-        self.number_of_trailing_newline_characters = 0
+        self.main_layout.addWidget(self.status_bar)
+        # Show find-all progress ("n of m") in the local status bar
+        find_all_manager = self.text_editor.find_all_manager
+        find_all_manager.on_update = lambda: self.status_bar.update_find_status(find_all_manager.status_text())
+        # Track changes
+        self.text_editor.document().contentsChanged.connect(self.on_contents_changed)
+        self.text_editor.document().contentsChange.connect(self.on_contents_change)
+        # Load the record of a stub
+        if self.record_ref is not None:
+            logger.debug("Materializing session")
+            data = self.record_ref.load()
+            journaling, self.journaling = self.journaling, False
+            self.set_data(data, self.record_ref.load_blob)
+            self.journaling = journaling
+            # Note: Edits are journaled relative to the loaded content. A hibernated session's content is
+            #   in the journal already, but a workspace file's record changes once the file is saved again
+            if journaling and not isinstance(self.record_ref, StoredRecordRef):
+                self.workspace.journal.record_snapshot(self.session_uid, data, {}, self.record_ref.load_blob)
+            # A hibernated session returns to where it was
+            if self.hibernated_cursor_position is not None:
+                cursor = self.text_editor.textCursor()
+                cursor.setPosition(min(self.hibernated_cursor_position, self.text_editor.document().characterCount() - 1))
+                self.text_editor.setTextCursor(cursor)
+                self.text_editor.ensureCursorVisible()
+                self.hibernated_cursor_position = None
+            if isinstance(self.record_ref, StoredRecordRef):
+                self.record_ref.discard()
+            self.record_ref = None
+
+    def set_deferred_rendering(self, deferred):
+        self.rendering_deferred = deferred
+        if self.is_materialized():
+            self.text_editor.set_deferred_rendering(deferred)
+
+    def is_busy(self):
+        """A request is running, or its candidates are waiting for a choice"""
+        return self.session_state != SessionState.IDLE or self.worker is not None or self.candidate_view is not None
+
+    def can_fork(self):
+        return not self.is_busy()
+
+    def fork(self):
+        """
+        Return a new session that continues from this one (e.g. to try a different follow-up).
+        Copy-on-write where possible:
+        - Images share this session's PNG storage and thumbnails (see TextEditor.copy_from)
+        - Provider state carries over (prompt cache key, response chain, Gemini context cache),
+            so the first request of the fork hits the same provider caches
+        """
+        self.materialize()
+        session = Session(self.workspace)
+        session.cache_key = self.cache_key
+        session.text_editor.copy_from(self.text_editor)
+        fork_session(self.session_uid, session.session_uid)
+        # Continue where this session is
+        cursor = session.text_editor.textCursor()
+        cursor.setPosition(self.text_editor.textCursor().position())
+        session.text_editor.setTextCursor(cursor)
+        session.text_editor.ensureCursorVisible()
+        return session
+
+    def can_hibernate(self):
+        """Only an idle session with no pending work can be hibernated"""
+        return (self.is_materialized()
+                and self.session_state == SessionState.IDLE
+                and self.worker is None
+                and self.candidate_view is None
+                and not self.text_editor.isReadOnly()
+                and not self.text_editor.animation_manager.is_animating)
+
+    def hibernate(self, store):
+        """
+        Move the content to a RecordStore and destroy the editor; the session becomes a stub
+        and is materialized again when shown
+        Known Issue: The undo history and find-all highlighting do not survive hibernation
+        """
+        if not self.can_hibernate():
+            return False
+        logger.debug(f"Hibernating session {self.session_uid}")
+        self.record_ref = StoredRecordRef(store, store.put(self.get_data(), self.get_blobs()))
+        self.hibernated_cursor_position = self.text_editor.textCursor().position()
+        # Note: The journal already holds this content, so journaling simply continues after materialize()
+        self.main_layout.removeWidget(self.text_editor)
+        self.main_layout.removeWidget(self.status_bar)
+        self.text_editor.clean_up_resources()
+        self.status_bar.deleteLater()
+        self.text_editor = None
+        self.status_bar = None
+        self.cached_data = None
+        return True
+
+    def memory_usage(self):
+        """Estimated bytes held in memory, by category (a stub holds nothing)"""
+        usage = {"text": 0, "images": 0, "undo": 0, "worker": 0}
+        if self.is_materialized():
+            usage["text"] = 2 * self.text_editor.document().characterCount()  # UTF-16
+            if self.cached_data is not None:
+                usage["text"] += sys.getsizeof(self.cached_data[1]["text_content"])
+            usage["images"] = self.text_editor.image_resources.resident_bytes()
+            usage["undo"] = self.text_editor.undo_bytes
+            usage["worker"] = self.text_editor.animation_manager.pending_bytes()
+        for worker in [self.worker] + self.candidate_workers:
+            if worker is not None:
+                usage["worker"] += worker.memory_usage()
+        return usage
+
+    def on_contents_changed(self):
+        self.revision += 1
+        self.last_active = time.monotonic()
+
+    def start_journaling(self):
+        """Record the current content in the workspace journal, then every change after it"""
+        journal = self.workspace.journal
+        if journal is None:
+            return
+        if self.is_materialized():
+            journal.record_snapshot(self.session_uid, self.get_data(), self.get_blobs())
+        else:
+            journal.record_ref(self.session_uid, self.record_ref)
+        self.journaling = True
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        # Note: While read-only, the document only changes through insert_at_end(), which is journaled on arrival
+        if not self.journaling or self.text_editor.isReadOnly():
+            return
+        inserted, image_hashes, blobs = "", [], {}
+        if chars_added:
+            cursor = QTextCursor(self.text_editor.document())
+            cursor.setPosition(position)
+            cursor.setPosition(position + chars_added, QTextCursor.KeepAnchor)
+            # Note: selectedText() uses U+2029 as the paragraph separator
+            inserted = cursor.selectedText().replace("\u2029", "\n")
+            if "\ufffc" in inserted:
+                image_hashes = self.text_editor.get_image_hashes(position, position + chars_added)
+                blobs = {digest: self.text_editor.get_image_data(digest) for digest in image_hashes}
+        self.workspace.journal.record_edit(self.session_uid, position, chars_removed, inserted, image_hashes, blobs)
+
+    def insert_at_end(self, text, animate=True):
+        """Insert text at the end of the document (before the trailing newlines), with animation by default"""
+        if self.journaling:
+            self.workspace.journal.record_append(self.session_uid, text, self.number_of_trailing_newline_characters)
+        self.text_editor.insert_at_end(text, self.number_of_trailing_newline_characters, animate)
 
     def set_session_state(self, state):
         """Update the session state"""
@@ -65,41 +259,155 @@ class Session(QWidget):
         self.status_bar.update_read_only_status(enabled)
 
     def generate_response(self, response_mode):
+        # Tracing: spans on this thread and on the worker's carry the session and request IDs
+        self.request_id = uuid.uuid4().hex[:12]
+        token = request_context.bind(session_id=self.session_uid, request_id=self.request_id, cache_key=self.cache_key)
+        tracing.async_begin("request", self.request_id, backend=self.workspace.backend, response_mode=response_mode)
+        try:
+            with tracing.span("generate_response"):
+                self._generate_response(response_mode)
+        finally:
+            request_context.reset(token)
+
+    def _prepare_request(self):
+        """Enter WAITING and parse the transcript; returns the messages, or None on a syntax error"""
         # Update UI state to waiting and set text editor to read only
         self.set_session_state(SessionState.WAITING)
         self.set_read_only(True)
         # Get current text from editor (now in read-only mode)
-        current_text = self.text_editor.get_text()
+        with tracing.span("get_text") as span:
+            current_text = self.text_editor.get_text()
+            span.set(chars=len(current_text))
         # Parse messages from text and check for syntax errors
-        messages = parse_text(current_text)
+        with tracing.span("parse_text") as span:
+            messages = parse_text(current_text)
+            span.set(messages=len(messages) if messages else 0)
         # If there is a syntax error then clean up and exit
         if messages is None:
+            tracing.async_end("request", self.request_id, error="syntax error")
+            # Note: The request has ended; a later reset_ui_state() must not end it again
+            self.request_id = None
             # Turn off read-only
             self.set_read_only(False)
             # Return to IDLE
             self.set_session_state(SessionState.IDLE)
             # Show error in red
             self.status_bar.show_syntax_error()
-            return
-        # Otherwise, create a worker and start it
-        else:
-            # Workaround for scrolling beyond the last line:
-            #     Calculate and update "num_of_trailing_newline_characters"
-            trailing_newlines = 0
-            index = len(current_text) - 1
-            while index >= 0 and current_text[index] == "\n":
-                trailing_newlines += 1
-                index -= 1
-            self.number_of_trailing_newline_characters = trailing_newlines
-            # Create a worker
-            self.worker = Worker(self.workspace.backend, messages, response_mode)
+            return None
+        # Workaround for scrolling beyond the last line:
+        #     Calculate and update "num_of_trailing_newline_characters"
+        trailing_newlines = 0
+        index = len(current_text) - 1
+        while index >= 0 and current_text[index] == "\n":
+            trailing_newlines += 1
+            index -= 1
+        self.number_of_trailing_newline_characters = trailing_newlines
+        # The response is undone in one step (Ctrl+Z)
+        self.text_editor.start_streamed_edit()
+        return messages
+
+    def _generate_response(self, response_mode):
+        messages = self._prepare_request()
+        if messages is not None:
+            self.worker = self._create_worker(messages, response_mode)
             # Connect the signal
             self.worker.signal.connect(self.on_worker_event)
             # Start the worker
             self.worker.start()
 
+    def _create_worker(self, messages, response_mode):
+        # Note: In process mode, the request runs in a child process (see ProcessWorker)
+        if self.workspace.worker_mode == "process":
+            return ProcessWorker(self.workspace.backend, messages, response_mode)
+        return Worker(self.workspace.backend, messages, response_mode)
+
+    def generate_candidates(self, response_mode, count=CANDIDATE_COUNT):
+        """Stream several responses to the same messages at once; the chosen one is committed (see CandidateView)"""
+        # Tracing: the candidates share one request ID
+        self.request_id = uuid.uuid4().hex[:12]
+        token = request_context.bind(session_id=self.session_uid, request_id=self.request_id, cache_key=self.cache_key)
+        tracing.async_begin("request", self.request_id, backend=self.workspace.backend, response_mode=response_mode,
+                            candidates=count)
+        try:
+            with tracing.span("generate_candidates"):
+                self._generate_candidates(response_mode, count)
+        finally:
+            request_context.reset(token)
+
+    def _generate_candidates(self, response_mode, count):
+        messages = self._prepare_request()
+        if messages is None:
+            return
+        # Show the candidates between the editor and the local status bar
+        self.candidate_view = CandidateView(count, self.text_editor.font(), self.commit_candidate, self.discard_candidates)
+        self.main_layout.insertWidget(1, self.candidate_view)
+        # Note: The workers share the parsed messages; backends do not modify them
+        self.candidate_workers = []
+        for index in range(count):
+            # Note: Bound as candidate, backends leave the session's provider state alone (e.g. response chains)
+            token = request_context.bind(candidate=index)
+            try:
+                self.candidate_workers.append(self._create_worker(messages, response_mode))
+            finally:
+                request_context.reset(token)
+        for index, worker in enumerate(self.candidate_workers):
+            worker.signal.connect(lambda event_data, index=index: self.on_candidate_event(index, event_data))
+            worker.start()
+        self.candidate_view.focus()
+
+    def on_candidate_event(self, index, event_data):
+        state, payload = event_data["state"], event_data["payload"]
+        if self.candidate_view is None:
+            return
+        if state == "generating":
+            if self.session_state != SessionState.GENERATING:
+                self.set_session_state(SessionState.GENERATING)
+            if self.candidate_view.states[index] != "generating":
+                self.candidate_view.set_state(index, "generating")
+            self.candidate_view.append(index, payload)
+        elif state in ("waiting", "thinking"):
+            self.candidate_view.set_state(index, state)
+        elif state in ("ending", "error"):
+            if state == "error":
+                self.candidate_view.append(index, "\n<Error: {}>".format(payload))
+            self.candidate_view.set_state(index, "done" if state == "ending" else "error")
+            self.candidate_workers[index].clean_up_resources()
+            self.candidate_workers[index] = None
+        else:
+            raise Exception()
+
+    def commit_candidate(self, index):
+        text = self.candidate_view.text(index)
+        if not text:
+            return
+        self.close_candidates()
+        # Note: Inserted at once; the candidate was already read in the candidate view
+        self.insert_at_end("\nAssistant:\n" + text + "\nUser:\n", animate=False)
+        self.text_editor.flush_animation(self.reset_ui_state)
+        self.text_editor.setFocus()
+
+    def discard_candidates(self):
+        self.close_candidates()
+        self.reset_ui_state()
+        self.text_editor.setFocus()
+
+    def close_candidates(self):
+        """Stop the candidates still streaming and remove the candidate view"""
+        for worker in self.candidate_workers:
+            if worker is not None:
+                worker.clean_up_resources()
+        self.candidate_workers = []
+        if self.candidate_view is not None:
+            self.main_layout.removeWidget(self.candidate_view)
+            self.candidate_view.clean_up_resources()
+            self.candidate_view = None
+
     def on_worker_event(self, event_data):
         state, payload = event_data["state"], event_data["payload"]
+        # Tracing: time from the worker's emit to delivery on the UI thread
+        if "emitted_at" in event_data:
+            tracing.complete("signal_delivery", event_data["emitted_at"], tracing.now_us(),
+                             state=state, request_id=self.request_id)
         # Handle state updates
         if state == "waiting":
             # If first transitioning to WAITING
@@ -112,15 +420,15 @@ class Session(QWidget):
         elif state == "generating":
             # If first transitioning to GENERATING
             if self.session_state != SessionState.GENERATING:
-                self.text_editor.insert_at_end("\nAssistant:\n", self.number_of_trailing_newline_characters)
+                self.insert_at_end("\nAssistant:\n")
                 self.set_session_state(SessionState.GENERATING)
-            self.text_editor.insert_at_end(payload, self.number_of_trailing_newline_characters)
+            self.insert_at_end(payload)
         # If the worker is ending gracefully
         elif state == "ending":
             # Clean up and remove the worker
             self.remove_worker()
             # Insert the user tag
-            self.text_editor.insert_at_end("\nUser:\n", self.number_of_trailing_newline_characters)
+            self.insert_at_end("\nUser:\n")
             # Flush the text animation, and then reset UI state
             self.text_editor.flush_animation(self.reset_ui_state)
         # If the worker experienced an error
@@ -128,7 +436,7 @@ class Session(QWidget):
             # Clean up and remove the worker
             self.remove_worker()
             # Insert the error message
-            self.text_editor.insert_at_end("\n<Error: {}>".format(payload), self.number_of_trailing_newline_characters)
+            self.insert_at_end("\n<Error: {}>".format(payload))
             # Flush the text animation, and then reset UI state
             self.text_editor.flush_animation(self.reset_ui_state)
         else:
@@ -152,6 +460,16 @@ class Session(QWidget):
                 if key == Qt.Key_Return:
                     self.key_press_ctrl_shift_enter()
                     return True
+            # Alt+Enter
+            if mods == Qt.AltModifier:
+                if key == Qt.Key_Return:
+                    self.key_press_alt_enter()
+                    return True
+            # Alt+Shift+Enter
+            if mods == (Qt.AltModifier | Qt.ShiftModifier):
+                if key == Qt.Key_Return:
+                    self.key_press_alt_shift_enter()
+                    return True
             # Tab
             if not mods:
                 if key == Qt.Key_Tab:
@@ -172,6 +490,11 @@ class Session(QWidget):
                 if key == Qt.Key_F3:
                     self.find_next()
                     return True
+            # Shift+F3
+            if mods == Qt.ShiftModifier:
+                if key == Qt.Key_F3:
+                    self.find_next(backward=True)
+                    return True
         return super().eventFilter(source, event)
     
     def key_press_ctrl_enter(self):
@@ -186,6 +509,14 @@ class Session(QWidget):
         if self.session_state == SessionState.IDLE:
             self.generate_response(response_mode="advanced")
     
+    def key_press_alt_enter(self):
+        if self.session_state == SessionState.IDLE:
+            self.generate_candidates(response_mode="normal")
+
+    def key_press_alt_shift_enter(self):
+        if self.session_state == SessionState.IDLE:
+            self.generate_candidates(response_mode="thinking")
+    
     def key_press_tab(self):
         self.text_editor.insertPlainText("    ")
     
@@ -199,11 +530,19 @@ class Session(QWidget):
                 self.remove_worker()
                 # If already generating, add the User tag
                 if self.session_state == SessionState.GENERATING:
-                    self.text_editor.insert_at_end("\nUser:\n", self.number_of_trailing_newline_characters)
+                    self.insert_at_end("\nUser:\n")
                 # Flush the text animation, and then reset UI state
                 self.text_editor.flush_animation(self.reset_ui_state)
+            elif self.candidate_view is not None:
+                self.discard_candidates()
+        else:
+            # Turn off find-all highlighting
+            self.text_editor.find_all_manager.clear()
     
     def reset_ui_state(self):
+        if self.request_id is not None:
+            tracing.async_end("request", self.request_id)
+            self.request_id = None
         # Turn off read-only
         self.set_read_only(False)
         # Update session state
@@ -211,13 +550,34 @@ class Session(QWidget):
     
     def get_data(self):
         # Note: get_data() should not interfere with session activities
-        return {"text_content": self.text_editor.toPlainText()}
+        # Note: A stub reads its record without materializing (and without caching it)
+        if not self.is_materialized():
+            return self.record_ref.load()
+        # Note: The result is cached until the document changes; callers must not modify it
+        if self.cached_data is None or self.cached_data[0] != self.revision:
+            data = {"text_content": self.text_editor.toPlainText()}
+            # Images appear as U+FFFC in text_content; their content hashes are listed in order
+            image_hashes = self.text_editor.get_image_hashes()
+            if image_hashes:
+                data["image_hashes"] = image_hashes
+            self.cached_data = (self.revision, data)
+        return self.cached_data[1]
+
+    def get_blobs(self):
+        """Encoded images referenced by get_data(), keyed by content hash"""
+        image_hashes = set(self.get_data().get("image_hashes", []))
+        if not self.is_materialized():
+            return {digest: self.record_ref.load_blob(digest) for digest in image_hashes}
+        return {digest: self.text_editor.get_image_data(digest) for digest in image_hashes}
     
-    def set_data(self, data):
+    def set_data(self, data, load_blob=None):
         # Note: We assume set_data() is always used with a new session
         #   That is, we don't worry about session activities
         # Set content
         self.text_editor.setPlainText(data["text_content"])
+        # Restore images (load_blob maps a content hash to PNG bytes)
+        if data.get("image_hashes") and load_blob is not None:
+            self.text_editor.restore_images(data["image_hashes"], load_blob)
         # Set cursor to the top
         cursor = self.text_editor.textCursor()
         cursor.setPosition(0)
@@ -233,42 +593,80 @@ class Session(QWidget):
         logger.debug("Cleaning up session resources")
         # Clean up and remove the worker
         self.remove_worker()
+        self.close_candidates()
         # Clean up text editor resources
-        self.text_editor.clean_up_resources()
+        if self.is_materialized():
+            self.text_editor.clean_up_resources()
+        elif isinstance(self.record_ref, StoredRecordRef):
+            self.record_ref.discard()
         # Self-deletion
         self.deleteLater()
     
     def focus(self):
+        self.last_active = time.monotonic()
+        self.materialize()
         self.text_editor.setFocus()
     
+    def reveal_text(self, query):
+        """Select the first occurrence of the query (or else of one of its words)"""
+        self.materialize()
+        document = self.text_editor.document()
+        for needle in [query.strip()] + query.split():
+            found_cursor = document.find(needle, 0) if needle else None
+            if found_cursor is not None and not found_cursor.isNull():
+                self.text_editor.setTextCursor(found_cursor)
+                self.text_editor.ensureCursorVisible()
+                return
+    
     def show_search_dialog(self):
         dialog = QDialog(self)
-        dialog.setWindowTitle("Enter: Submit        F3: Find Next")
+        dialog.setWindowTitle("Enter: Find All        F3: Next        Shift+F3: Previous")
         dialog.setModal(True)  # Note: Prevent interaction with main window
         dialog.setFixedWidth(400)
         layout = QVBoxLayout(dialog)
         line_edit = QLineEdit(self.search_text, dialog)
         layout.addWidget(line_edit)
+        options_layout = QHBoxLayout()
+        regex_box = QCheckBox("Regex", dialog)
+        regex_box.setChecked(self.search_regex)
+        options_layout.addWidget(regex_box)
+        case_box = QCheckBox("Match case", dialog)
+        case_box.setChecked(self.search_case_sensitive)
+        options_layout.addWidget(case_box)
+        options_layout.addStretch(1)
+        layout.addLayout(options_layout)
         def _submit():
             self.search_text = line_edit.text()
+            self.search_regex = regex_box.isChecked()
+            self.search_case_sensitive = case_box.isChecked()
             dialog.accept()
         line_edit.returnPressed.connect(_submit)
-        dialog.exec()
+        if dialog.exec() == QDialog.Accepted:
+            self.find_all()
     
-    def find_next(self):
+    def find_all(self):
+        """Highlight every match of the search text and select the first one after the cursor"""
+        find_all_manager = self.text_editor.find_all_manager
+        try:
+            pattern = find_all_manager.compile(self.search_text, self.search_regex, self.search_case_sensitive)
+        except re.error as e:
+            logger.debug(f"Invalid search pattern: {e}")
+            find_all_manager.clear()
+            self.status_bar.show_error(f"Invalid Pattern: {e}")
+            return
+        find_all_manager.set_pattern(pattern)
+        find_all_manager.find(self.text_editor.textCursor().selectionStart())
+    
+    def find_next(self, backward=False):
         if not self.search_text:
             return
-        # Get current cursor position
-        cursor = self.text_editor.textCursor()
-        # Search forward from current position
-        # Note: By default find() is case insensitive (PySide 6.9)
-        found_cursor = self.text_editor.document().find(self.search_text, cursor)
-        # If not found, wrap around to the beginning
-        if found_cursor.isNull():
-            found_cursor = self.text_editor.document().find(self.search_text, 0)
-        # If still not found, nothing to do
-        if found_cursor.isNull():
+        find_all_manager = self.text_editor.find_all_manager
+        # Note: Find-all is restarted with the last search if it was turned off (Esc)
+        if not find_all_manager.is_active():
+            self.find_all()
             return
-        # Select the found text
-        self.text_editor.setTextCursor(found_cursor)
-        self.text_editor.ensureCursorVisible()
+        cursor = self.text_editor.textCursor()
+        if backward:
+            find_all_manager.find(cursor.selectionStart(), backward=True)
+        else:
+            find_all_manager.find(cursor.selectionStart() + 1)
@@ -9,6 +9,9 @@ class GlobalStatusBar(QStatusBar):
         super().__init__(parent)
         # Configuration
         self.setSizeGripEnabled(False)
+        # Add the label for session memory
+        self.memory_status = QLabel("")
+        self.addPermanentWidget(self.memory_status)
         # Add the label for api backend
         self.backend_status = QLabel("")
         self.addPermanentWidget(self.backend_status)
@@ -16,7 +19,7 @@ class GlobalStatusBar(QStatusBar):
         self.internal_state = "Ctrl+F: Find  |  Ctrl+R: Reset Current Session  |  Ctrl+Shift+T: Restore Closed Sessions"
         self.showMessage(self.internal_state)
     
-    def update_backend_status(self, backend):
+    def update_backend_status(self, backend, worker_mode="thread"):
         # Workaround: Add one space to the right
         # Background: Rare display issues may cut off 1~2 characters
         if backend == "openai":
@@ -27,6 +30,16 @@ class GlobalStatusBar(QStatusBar):
             self.backend_status.setText("Backend: Gemini (F10) ")
         else:
             raise Exception("Unexpected API backend")
+        if worker_mode == "process":
+            self.backend_status.setText(self.backend_status.text().rstrip() + "  |  Process (F9) ")
+    
+    def update_memory_status(self, used, budget, loaded, total):
+        used_mb, budget_mb = used / (1024 * 1024), budget / (1024 * 1024)
+        self.memory_status.setText(f"Memory: {used_mb:.0f}/{budget_mb:.0f} MB  |  Loaded: {loaded}/{total}  |")
+    
+    def show_info(self, message):
+        self.showMessage(message)
+        QTimer.singleShot(3000, lambda: self.showMessage(self.internal_state))  # Recover in 3 seconds
     
     def show_save_success(self, message):
         self.setStyleSheet("color: rgb(0, 200, 0);")
@@ -8,6 +8,9 @@ class LocalStatusBar(QStatusBar):
         super().__init__(parent)
         # Configuration
         self.setSizeGripEnabled(False)
+        # Add the label for find-all matches ("n of m")
+        self.find_status = QLabel("")
+        self.addPermanentWidget(self.find_status)
         # Add the label for read-only status
         self.read_only_status = QLabel("")
         self.addPermanentWidget(self.read_only_status)
@@ -16,7 +19,7 @@ class LocalStatusBar(QStatusBar):
         
     def update_session_status(self, status):
         if status == "idle":
-            status_text = "Idle        |  Ctrl+Enter: Fast Reply  |  Shift+Enter: Think More  |  Ctrl+Shift+Enter: Advanced Mode"
+            status_text = "Idle        |  Ctrl+Enter: Fast Reply  |  Shift+Enter: Think More  |  Ctrl+Shift+Enter: Advanced Mode  |  Alt+Enter: Candidates"
         elif status == "waiting":
             status_text = "Waiting     |  Press Esc to interrupt"
         elif status == "thinking":
@@ -35,9 +38,15 @@ class LocalStatusBar(QStatusBar):
         read_only_text = "Read-Only: ON " if read_only else "Read-Only: OFF "
         self.read_only_status.setText(read_only_text)
     
+    def update_find_status(self, find_text):
+        self.find_status.setText(find_text)
+
     def show_syntax_error(self):
+        self.show_error("Syntax Error")
+
+    def show_error(self, error_text):
         self.setStyleSheet("color: rgb(200, 0, 0);")
-        self.showMessage("Syntax Error")
+        self.showMessage(error_text)
         def _callback():
             self.setStyleSheet("")
             self.showMessage(self.internal_state)
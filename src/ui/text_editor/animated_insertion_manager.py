@@ -1,5 +1,6 @@
 from PySide6.QtCore import QTimer
 from PySide6.QtGui import QTextCursor
+from utils import tracing
 
 
 class AnimatedInsertionManager:
@@ -18,6 +19,10 @@ class AnimatedInsertionManager:
 
     The class interacts with the TextEditor instance by manipulating its QTextCursor to
     append characters, ensuring that visible changes are smoothly animated.
+
+    While deferred (the editor is not visible), text is only buffered and no timer runs; the
+    buffer is inserted in one edit once the editor becomes visible again, once a flush is
+    requested, or once it grows past max_deferred_chars.
     """
     
     def __init__(self, text_editor, ignore_trailing_newline=True):
@@ -43,6 +48,14 @@ class AnimatedInsertionManager:
         self.total_pending_chars = 0
         # Determines an offset for insertion, used to handle trailing newline characters.
         self.insertion_offset = 0
+        # Whether insertion is deferred (see set_deferred), and the buffer size that forces a bulk insert.
+        self.deferred = False
+        self.max_deferred_chars = 65536
+        # Callbacks waiting for all pending text to be inserted (see when_done).
+        self.done_callbacks = []
+        # Undo: the inserts of one response form a single edit block (see _insert_text).
+        #   Holds the number of undo steps right after the last insert, or None to start a new block.
+        self.undo_steps_after_insert = None
     
     def _process_animation(self):
         """
@@ -60,10 +73,7 @@ class AnimatedInsertionManager:
         """
         # If there is no more text to process, stop the animation and reset state.
         if not self.queue and self.current_text is None:
-            self.is_animating = False
-            self.timer.stop()
-            self.total_pending_chars = 0
-            self.insertion_offset = 0
+            self._finish()
             return
         
         # If there is no current text chunk but the queue has pending texts,
@@ -76,14 +86,8 @@ class AnimatedInsertionManager:
         if self.current_text and self.current_index < len(self.current_text):
             # Retrieve the next character to insert.
             char = self.current_text[self.current_index]
-            # Create a separate QTextCursor for the entire document.
-            cursor = QTextCursor(self.text_editor.document())
-            # Move the cursor to the end of the document.
-            cursor.movePosition(QTextCursor.End)
-            # Move the cursor backwards by 'insertion_offset' characters.
-            cursor.movePosition(QTextCursor.PreviousCharacter, QTextCursor.MoveAnchor, self.insertion_offset)
-            # Insert the character at the current cursor position.
-            cursor.insertText(char)
+            # Insert the character at the end of the document (before the trailing newlines).
+            self._insert_text(char)
             # Move to the next character in the current text chunk.
             self.current_index += 1
             # Calculate the number of remaining characters in the current text chunk.
@@ -108,6 +112,85 @@ class AnimatedInsertionManager:
             self.current_text = None
             self._process_animation()
     
+    def _finish(self):
+        tracing.async_end("animation", id(self))
+        self.is_animating = False
+        self.timer.stop()
+        self.total_pending_chars = 0
+        self.insertion_offset = 0
+        callbacks, self.done_callbacks = self.done_callbacks, []
+        for callback in callbacks:
+            callback()
+    
+    def _insert_pending(self):
+        """Insert all pending text in one edit (no animation)."""
+        self.timer.stop()
+        pending = self.queue
+        if self.current_text is not None:
+            pending = [self.current_text[self.current_index:]] + pending
+        self.queue = []
+        self.current_text = None
+        self.current_index = 0
+        with tracing.span("bulk_insert", chars=self.total_pending_chars):
+            self._insert_text("".join(pending))
+        self._finish()
+    
+    def _insert_text(self, text):
+        """
+        Insert text at the end of the document, before 'insertion_offset' characters.
+
+        Inserts join the previous edit block as long as nothing else was added to the undo stack in between,
+        so a whole response is undone (Ctrl+Z) in one step instead of one step per character.
+        """
+        document = self.text_editor.document()
+        # Create a separate QTextCursor for the entire document.
+        cursor = QTextCursor(document)
+        # Move the cursor to the end of the document.
+        cursor.movePosition(QTextCursor.End)
+        # Move the cursor backwards by 'insertion_offset' characters.
+        cursor.movePosition(QTextCursor.PreviousCharacter, QTextCursor.MoveAnchor, self.insertion_offset)
+        if self.undo_steps_after_insert is not None and document.availableUndoSteps() == self.undo_steps_after_insert:
+            cursor.joinPreviousEditBlock()
+        else:
+            cursor.beginEditBlock()
+        cursor.insertText(text)
+        cursor.endEditBlock()
+        self.undo_steps_after_insert = document.availableUndoSteps()
+    
+    def start_edit_block(self):
+        """Make the next insert start a new undo step (e.g. for a new response)."""
+        self.undo_steps_after_insert = None
+    
+    def insert_immediately(self, text, number_of_trailing_newline_characters=0):
+        """Insert text at the end in one edit (after any pending text), without animation."""
+        self.insert_at_end(text, number_of_trailing_newline_characters)
+        if self.is_animating:
+            self._insert_pending()
+    
+    def set_deferred(self, deferred):
+        """Buffer incoming text instead of animating it (True), or insert the buffer at once and resume (False)."""
+        if deferred == self.deferred:
+            return
+        self.deferred = deferred
+        # Note: Pending text is inserted at once when resuming, or right away if a flush is waiting for it
+        if self.is_animating and (not deferred or self.done_callbacks):
+            self._insert_pending()
+        elif deferred:
+            self.timer.stop()
+    
+    def when_done(self, callback):
+        """Call back once all pending text is inserted; a deferred buffer is inserted right away."""
+        if not self.is_animating:
+            callback()
+            return
+        self.done_callbacks.append(callback)
+        if self.deferred:
+            self._insert_pending()
+    
+    def pending_bytes(self):
+        """Approximate bytes of text still waiting for insertion."""
+        return 2 * self.total_pending_chars  # UTF-16
+    
     def insert_at_end(self, text, number_of_trailing_newline_characters=0):
         """Queue new text for animated insertion at the end of the text editor."""
         # If no animation is currently running
@@ -122,5 +205,10 @@ class AnimatedInsertionManager:
         self.queue.append(text)
         # If no animation is currently running, enable the animation flag and start processing.
         if not self.is_animating:
+            tracing.async_begin("animation", id(self))
             self.is_animating = True
-            self._process_animation()
+            if not self.deferred:
+                self._process_animation()
+        # While deferred, only a large buffer is inserted (in one edit).
+        if self.deferred and self.total_pending_chars > self.max_deferred_chars:
+            self._insert_pending()
@@ -0,0 +1,264 @@
+import os
+import base64
+import logging
+from typing import Callable
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt, QByteArray, QBuffer, QTimer
+from PySide6.QtGui import QFont, QFontDatabase, QImage, QTextCursor
+from PySide6.QtGui import QColor, QPalette
+from ui.text_editor.syntax_highlighter import SyntaxHighlighter
+from ui.text_editor.animated_insertion_manager import AnimatedInsertionManager
+from ui.text_editor.find_all_manager import FindAllManager
+from ui.text_editor.image_resource_manager import ImageResourceManager
+
+logger = logging.getLogger(__name__)
+
+
+class EditorBase:
+    """
+    Behavior shared by TextEditor (QTextEdit) and PlainTextEditor (QPlainTextEdit).
+
+    In both, an image is a single U+FFFC character whose char format identifies the image; subclasses
+    define how, with two methods:
+      _image_format(image_url): the char format of the U+FFFC that shows an image
+      _image_hash(char_format): the content hash of the image a char format shows, or None for text
+    Text, positions and image hashes are therefore the same in both editors, and so are saved
+    workspaces and the journal.
+
+    Note: Mixed in before the Qt base class; set_up_editor() is called from the subclass's __init__
+    """
+    def set_up_editor(self, display_size):
+        """display_size: size of the image thumbnails kept in the document (None: no thumbnails)"""
+        # Always show the vertical scrollbar
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        # Set custom font
+        db_families = QFontDatabase().families()
+        if "Sarasa Mono SC" in db_families:
+            # Known Issue: "Sarasa Fixed SC" seems to have more jagged edges
+            # Workaround: Use "Sarasa Mono SC" but disable calt (contextual alternates)
+            font = QFont("Sarasa Mono SC", 12)
+            font.setFeature(QFont.Tag("calt"), 0)
+        elif "SF Mono" in db_families:
+            font = QFont("SF Mono", 12)
+        elif "Consolas" in db_families:
+            font = QFont("Consolas", 12)
+        elif "Courier New" in db_families:
+            font = QFont("Courier New", 12)
+        else:
+            font = QApplication.font()
+            font.setPointSize(12)
+        self.setFont(font)
+        # Set color
+        pal = self.palette()
+        pal.setColor(QPalette.Text, QColor(216, 222, 233))  # Text
+        pal.setColor(QPalette.Base, QColor(48, 56, 65))     # Background
+        self.setPalette(pal)
+        # Initialize external modules
+        self.highlighter = SyntaxHighlighter(self.document())
+        self.animation_manager = AnimatedInsertionManager(self)
+        self.find_all_manager = FindAllManager(self)
+        # Image bookkeeping: every image is PNG-encoded once, when it enters the document
+        self.image_resources = ImageResourceManager(self.document(), display_size)
+        # Reclaim the thumbnails of deleted images once editing pauses
+        self.image_gc_timer = QTimer(self)
+        self.image_gc_timer.setSingleShot(True)
+        self.image_gc_timer.timeout.connect(self.collect_image_garbage)
+        self.document().contentsChange.connect(self.on_contents_change)
+        # Memory accounting: Qt does not expose the size of the undo stack, so edits are tallied
+        self.undo_bytes = 0
+        # Undo memory cap per session (WORKBENCH_UNDO_LIMIT_MB, default: 32)
+        # Known Issue: QTextDocument cannot drop its oldest undo steps, so the whole history is cleared once over the cap
+        self.undo_limit = int(os.environ.get("WORKBENCH_UNDO_LIMIT_MB", "32")) * 1024 * 1024
+        self.undo_trim_timer = QTimer(self)
+        self.undo_trim_timer.setSingleShot(True)
+        self.undo_trim_timer.timeout.connect(self.trim_undo_history)
+
+    def insertFromMimeData(self, source):
+        """Override to handle pasted image content."""
+        if source.hasImage():
+            # Get image from source
+            image = source.imageData()
+            image = QImage(image)
+            # Insert the image at the cursor position
+            self.textCursor().insertText("\ufffc", self.add_image_resource(self._image_to_png(image), image))
+        else:
+            super().insertFromMimeData(source)
+
+    def add_image_resource(self, png_data, image=None):
+        """Add an image to the document's resources and return a char format referring to it."""
+        # Note: The URL is derived from the content hash, so identical images share one resource
+        image_url = self.image_resources.add(png_data, image)
+        return self._image_format(image_url)
+
+    def get_image_hashes(self, start=0, end=None):
+        """Content hashes of the images in the document (or in positions [start, end)), in document order."""
+        if not self.image_resources.locations:
+            return []
+        image_hashes = []
+        block = self.document().findBlock(start)
+        while block.isValid() and (end is None or block.position() < end):
+            it = block.begin()
+            while not it.atEnd():
+                fragment = it.fragment()
+                digest = self._image_hash(fragment.charFormat()) if fragment.isValid() else None
+                if digest is not None:
+                    # Note: An image fragment may span several identical images
+                    first = max(fragment.position(), start)
+                    last = fragment.position() + fragment.length()
+                    if end is not None:
+                        last = min(last, end)
+                    image_hashes.extend([digest] * max(0, last - first))
+                it += 1
+            block = block.next()
+        return image_hashes
+
+    def get_image_data(self, digest):
+        """PNG bytes of an image in the document"""
+        return self.image_resources.png_data(digest)
+
+    def setPlainText(self, text):
+        super().setPlainText(text)
+        # Note: setPlainText() clears the undo stack
+        self.undo_bytes = 0
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        if self.document().isUndoRedoEnabled():
+            self.undo_bytes += 2 * (chars_removed + chars_added)  # UTF-16
+            if self.undo_bytes > self.undo_limit and not self.undo_trim_timer.isActive():
+                # Note: Not from within the change notification
+                self.undo_trim_timer.start(0)
+        if chars_removed:
+            self.image_gc_timer.start(2000)
+
+    def trim_undo_history(self):
+        if self.undo_bytes <= self.undo_limit:
+            return
+        logger.info(f"Undo history over {self.undo_limit // (1024 * 1024)} MB; clearing it")
+        self.document().clearUndoRedoStacks()
+        self.undo_bytes = 0
+
+    def collect_image_garbage(self):
+        if self.image_resources.resident:
+            self.image_resources.collect_garbage(self.get_image_hashes())
+
+    def restore_images(self, image_hashes, load_blob):
+        """
+        Turn the object replacement characters left by setPlainText() into images.
+        The n-th U+FFFC in the document receives the n-th hash.
+        """
+        text = self.toPlainText()
+        # Locate U+FFFC in document positions (UTF-16 code units, unlike Python indices)
+        positions = []
+        index, position = text.find("\ufffc"), 0
+        previous = 0
+        while index != -1:
+            position += len(text[previous:index].encode("utf-16-le")) // 2
+            positions.append(position)
+            previous = index
+            index = text.find("\ufffc", index + 1)
+        if len(positions) != len(image_hashes):
+            logger.warning(f"Found {len(positions)} image placeholders for {len(image_hashes)} images")
+        # Note: Restoring images must not be undoable
+        self.document().setUndoRedoEnabled(False)
+        cursor = QTextCursor(self.document())
+        for position, digest in zip(positions, image_hashes):
+            # Note: Images already known (e.g. shared with a forked session) need no loading
+            if digest in self.image_resources:
+                self.image_resources.ensure_resident([digest])
+                image_format = self._image_format(self.image_resources.url_for(digest))
+            else:
+                try:
+                    png_data = load_blob(digest)
+                except Exception as e:
+                    logger.error(f"Image {digest} could not be loaded: {e}")
+                    continue
+                image_format = self.add_image_resource(png_data)
+            cursor.setPosition(position)
+            cursor.setPosition(position + 1, QTextCursor.KeepAnchor)
+            # Note: Same as insertImage(), which only takes image formats
+            cursor.insertText("\ufffc", image_format)
+        self.document().setUndoRedoEnabled(True)
+
+    def copy_from(self, other):
+        """Take over the content of another editor, sharing its image storage (see ImageResourceManager.share_from)"""
+        # Note: Resources are added after setPlainText(), which may clear the document's resources
+        self.setPlainText(other.toPlainText())
+        self.image_resources.share_from(other.image_resources)
+        self.restore_images(other.get_image_hashes(), other.get_image_data)
+
+    def get_text(self):
+        """
+        Retrieve the text content with embedded images converted to base64 tags.
+        Images are converted to tags like:
+          <8442d621>base64-data</8442d621>
+        """
+        document = self.document()
+        # Note: Joined once at the end; repeated += is quadratic on large transcripts
+        parts = []
+        block = document.begin()
+        while block.isValid():
+            it = block.begin()
+            while not it.atEnd():
+                fragment = it.fragment()
+                if fragment.isValid():
+                    digest = self._image_hash(fragment.charFormat())
+                    if digest is not None:
+                        # Note: The document only holds a thumbnail (or a placeholder); use the full-resolution PNG bytes
+                        if digest in self.image_resources:
+                            base64_data = base64.b64encode(self.get_image_data(digest)).decode('utf-8')
+                            # Note: An image fragment may span several identical images
+                            parts.append(f"<8442d621>{base64_data}</8442d621>" * fragment.length())
+                            logger.debug("Converted image %s to base64 tag", digest)
+                        else:
+                            logger.error(f"Image resource not found: {digest}")
+                            raise Exception("unexpected error: image resource not found")
+                    else:
+                        # Append normal text fragments
+                        parts.append(fragment.text())
+                it += 1
+            block = block.next()
+            # Add a newline between blocks (except after the final block)
+            if block.isValid():
+                parts.append("\n")
+        return "".join(parts)
+
+    def _image_to_png(self, image):
+        """Convert QImage to PNG bytes."""
+        # Create a byte array to store the image data
+        byte_array = QByteArray()
+        # Create a buffer using the byte array
+        buffer = QBuffer(byte_array)
+        buffer.open(QBuffer.WriteOnly)
+        # Save the image to the buffer in PNG format
+        success = image.save(buffer, "PNG")
+        if not success:
+            logger.error("Failed to save image to buffer")
+        # Make sure to close the buffer
+        buffer.close()
+        return byte_array.data()
+
+    def insert_at_end(self, text, number_of_trailing_newline_characters=0, animate=True):
+        if animate:
+            self.animation_manager.insert_at_end(text, number_of_trailing_newline_characters)
+        else:
+            self.animation_manager.insert_immediately(text, number_of_trailing_newline_characters)
+
+    def start_streamed_edit(self):
+        """The following streamed inserts form their own undo step (see AnimatedInsertionManager)"""
+        self.animation_manager.start_edit_block()
+
+    def flush_animation(self, callback: Callable):
+        # Note: Called back when the animation finishes (at once if nothing is pending)
+        self.animation_manager.when_done(callback)
+
+    def set_deferred_rendering(self, deferred):
+        """Buffer streamed text while the editor is not visible (see AnimatedInsertionManager)"""
+        self.animation_manager.set_deferred(deferred)
+
+    def clean_up_resources(self):
+        self.find_all_manager.clean_up_resources()
+        self.image_gc_timer.stop()
+        self.undo_trim_timer.stop()
+        self.image_resources.clean_up_resources()
+        # Self-Deletion
+        self.deleteLater()
@@ -0,0 +1,242 @@
+import re
+import time
+import bisect
+import logging
+from PySide6.QtCore import QTimer, QPoint
+from PySide6.QtGui import QColor, QTextCursor, QTextCharFormat
+from PySide6.QtWidgets import QTextEdit
+
+logger = logging.getLogger(__name__)
+
+
+class FindAllManager:
+    """
+    Finds every match of a pattern in a TextEditor, without blocking the UI.
+
+    - The document is scanned block by block, in time-boxed chunks on a zero-delay QTimer
+    - Matches are kept as sorted (start, end) document positions
+    - Edits (typing, streamed text) only rescan the blocks they touch; later matches are shifted
+    - Only the matches in the visible range are highlighted (as extra selections)
+
+    Note: Like QTextDocument.find(), a match never spans two blocks (lines)
+    """
+    def __init__(self, text_editor, on_update=None):
+        self.text_editor = text_editor
+        self.on_update = on_update  # Callback: on_update(), whenever the match set or current match changes
+        self.pattern = None         # Compiled regex, or None when find-all is inactive
+        self.starts = []            # Sorted match start positions
+        self.ends = []              # Match end positions (parallel to starts)
+        self.frontier = 0           # Blocks before this position have been scanned
+        self.scan_complete = True
+        self.current = None         # Index of the current match (into starts)
+        # Time-boxed background scan
+        self.scan_timer = QTimer(self.text_editor)
+        self.scan_timer.setSingleShot(True)
+        self.scan_timer.timeout.connect(self._scan_chunk)
+        self.scan_budget = 0.008  # Seconds of scanning per event loop iteration
+        # Coalesce highlight updates (streaming changes the document once per character)
+        self.highlight_timer = QTimer(self.text_editor)
+        self.highlight_timer.setSingleShot(True)
+        self.highlight_timer.timeout.connect(self._highlight_visible)
+        # Formats
+        self.match_format = QTextCharFormat()
+        self.match_format.setBackground(QColor(110, 95, 50))
+        self.current_format = QTextCharFormat()
+        self.current_format.setBackground(QColor(190, 140, 40))
+        # Track changes
+        self.text_editor.document().contentsChange.connect(self.on_contents_change)
+        self.text_editor.verticalScrollBar().valueChanged.connect(self._schedule_highlight)
+
+    @staticmethod
+    def compile(text, regex=False, case_sensitive=False):
+        """Compile a search pattern (raises re.error for an invalid regex)"""
+        if not text:
+            return None
+        flags = 0 if case_sensitive else re.IGNORECASE
+        return re.compile(text if regex else re.escape(text), flags)
+
+    def is_active(self):
+        return self.pattern is not None
+
+    def set_pattern(self, pattern):
+        """Start a fresh scan for a compiled pattern (None to turn find-all off)"""
+        self.pattern = pattern
+        self.starts, self.ends = [], []
+        self.current = None
+        self.frontier = 0
+        self.scan_complete = pattern is None
+        self.scan_timer.stop()
+        if pattern is not None:
+            self.scan_timer.start(0)
+        self._schedule_highlight()
+        self._notify()
+
+    def clear(self):
+        self.set_pattern(None)
+
+    def status_text(self):
+        """E.g. "3 of 120", "3 of 120+" while scanning, or "" when inactive"""
+        if self.pattern is None:
+            return ""
+        total = f"{len(self.starts)}" if self.scan_complete else f"{len(self.starts)}+"
+        if not self.starts:
+            return "No matches" if self.scan_complete else "Searching..."
+        current = "-" if self.current is None else self.current + 1
+        return f"{current} of {total}"
+
+    def _notify(self):
+        if self.on_update is not None:
+            self.on_update()
+
+    def _schedule_highlight(self):
+        if not self.highlight_timer.isActive():
+            self.highlight_timer.start(30)
+
+    def _scan_block(self, block):
+        """Return the (start, end) positions of the matches in a block"""
+        text = block.text()
+        position = block.position()
+        matches = [(m.start(), m.end()) for m in self.pattern.finditer(text) if m.end() > m.start()]
+        if not matches:
+            return []
+        # Note: Document positions count UTF-16 code units, Python indices count code points
+        if len(text.encode("utf-16-le")) != 2 * len(text):
+            units = [0]
+            for char in text:
+                units.append(units[-1] + (2 if ord(char) > 0xFFFF else 1))
+            return [(position + units[s], position + units[e]) for s, e in matches]
+        return [(position + s, position + e) for s, e in matches]
+
+    def _scan_chunk(self, until_new_match=False):
+        """Scan blocks from the frontier (for up to scan_budget seconds, or until a new match is found)"""
+        if self.pattern is None or self.scan_complete:
+            return
+        document = self.text_editor.document()
+        block = document.findBlock(self.frontier)
+        deadline = time.perf_counter() + self.scan_budget
+        found = False
+        while block.isValid():
+            for start, end in self._scan_block(block):
+                self.starts.append(start)
+                self.ends.append(end)
+                found = True
+            block = block.next()
+            if found and until_new_match:
+                break
+            if not until_new_match and time.perf_counter() > deadline:
+                break
+        if block.isValid():
+            self.frontier = block.position()
+            if not until_new_match:
+                self.scan_timer.start(0)
+        else:
+            self.frontier = document.characterCount()
+            self.scan_complete = True
+        self._schedule_highlight()
+        self._notify()
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        """Update the match set for an edit, rescanning only the touched blocks"""
+        if self.pattern is None:
+            return
+        # Large changes (e.g. setPlainText) are cheaper to handle with a fresh scan
+        if chars_added > 65536 or chars_removed > 65536:
+            self.set_pattern(self.pattern)
+            return
+        delta = chars_added - chars_removed
+        document = self.text_editor.document()
+        first_block = document.findBlock(position)
+        last_block = document.findBlock(position + chars_added)
+        if not last_block.isValid():
+            last_block = document.lastBlock()
+        region_start = first_block.position()
+        region_end = last_block.position() + last_block.length()  # In the new document
+        # Nothing scanned yet in this region: the pending scan covers it
+        if region_start >= self.frontier:
+            return
+        # Drop the matches of the touched blocks, and shift the matches after them
+        low = bisect.bisect_left(self.starts, region_start)
+        high = bisect.bisect_left(self.starts, region_end - delta)
+        tail_starts = [start + delta for start in self.starts[high:]]
+        tail_ends = [end + delta for end in self.ends[high:]]
+        # Rescan the touched blocks
+        new_starts, new_ends = [], []
+        block = first_block
+        while block.isValid() and block.position() < region_end:
+            for start, end in self._scan_block(block):
+                new_starts.append(start)
+                new_ends.append(end)
+            block = block.next()
+        self.starts[low:] = new_starts + tail_starts
+        self.ends[low:] = new_ends + tail_ends
+        self.frontier = max(self.frontier + delta, region_end)
+        if self.scan_complete:
+            self.frontier = document.characterCount()
+        # Keep the current match if it was not touched
+        if self.current is not None:
+            if self.current >= high:
+                self.current += len(new_starts) - (high - low)
+            elif self.current >= low:
+                self.current = None
+        self._schedule_highlight()
+        self._notify()
+
+    def find(self, position, backward=False):
+        """
+        Select the next match at or after a position (or the previous one before it), wrapping around.
+        Returns False if there is no match.
+        """
+        if self.pattern is None:
+            return False
+        if backward:
+            index = bisect.bisect_left(self.starts, position) - 1
+            if index < 0:
+                # Note: Wrapping backward needs the whole match set
+                while not self.scan_complete:
+                    self._scan_chunk(until_new_match=True)
+                index = len(self.starts) - 1
+        else:
+            index = bisect.bisect_left(self.starts, position)
+            # Scan ahead (synchronously) until a match after the position turns up
+            while index >= len(self.starts) and not self.scan_complete:
+                self._scan_chunk(until_new_match=True)
+                index = bisect.bisect_left(self.starts, position)
+            if index >= len(self.starts):
+                index = 0
+        if not self.starts:
+            self.current = None
+            self._notify()
+            return False
+        self.current = index
+        cursor = QTextCursor(self.text_editor.document())
+        cursor.setPosition(self.starts[index])
+        cursor.setPosition(self.ends[index], QTextCursor.KeepAnchor)
+        self.text_editor.setTextCursor(cursor)
+        self.text_editor.ensureCursorVisible()
+        self._schedule_highlight()
+        self._notify()
+        return True
+
+    def _highlight_visible(self):
+        """Highlight the matches in the visible range only"""
+        selections = []
+        if self.pattern is not None and self.starts:
+            viewport = self.text_editor.viewport()
+            first = self.text_editor.cursorForPosition(QPoint(0, 0)).position()
+            last = self.text_editor.cursorForPosition(QPoint(viewport.width(), viewport.height())).position()
+            first = self.text_editor.document().findBlock(first).position()
+            last_block = self.text_editor.document().findBlock(last)
+            last = last_block.position() + last_block.length()
+            document = self.text_editor.document()
+            for index in range(bisect.bisect_left(self.starts, first), bisect.bisect_left(self.starts, last)):
+                selection = QTextEdit.ExtraSelection()
+                selection.cursor = QTextCursor(document)
+                selection.cursor.setPosition(self.starts[index])
+                selection.cursor.setPosition(self.ends[index], QTextCursor.KeepAnchor)
+                selection.format = self.current_format if index == self.current else self.match_format
+                selections.append(selection)
+        self.text_editor.setExtraSelections(selections)
+
+    def clean_up_resources(self):
+        self.scan_timer.stop()
+        self.highlight_timer.stop()
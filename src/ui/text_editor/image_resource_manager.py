@@ -0,0 +1,161 @@
+import mmap
+import logging
+import tempfile
+import threading
+from PySide6.QtCore import Qt, QUrl, QSize, QByteArray, QBuffer
+from PySide6.QtGui import QImage, QImageReader, QTextDocument
+from utils.blob_store import blob_hash
+
+logger = logging.getLogger(__name__)
+
+URL_PREFIX = "image://"
+
+
+class SpillFile:
+    """Append-only anonymous temporary file, read back through a memory map"""
+    def __init__(self):
+        self.file = tempfile.TemporaryFile(prefix="workbench-images-")
+        self.size = 0
+        self.map = None  # Note: Re-created when the file has grown past the mapped size
+        self.users = 1   # Managers sharing the file (see ImageResourceManager.share_from)
+        self.lock = threading.Lock()
+
+    def share(self):
+        with self.lock:
+            self.users += 1
+
+    def append(self, data):
+        with self.lock:
+            offset = self.size
+            self.file.seek(offset)
+            self.file.write(data)
+            self.file.flush()
+            self.size += len(data)
+            return offset
+
+    def read(self, offset, length):
+        with self.lock:
+            if self.map is None or len(self.map) < offset + length:
+                if self.map is not None:
+                    self.map.close()
+                self.map = mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ)
+            return self.map[offset:offset + length]
+
+    def close(self):
+        """Release one user; the file is closed with the last one"""
+        with self.lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            self.file.close()
+
+
+class ImageResourceManager:
+    """
+    Image resources of a QTextDocument, keyed by content hash.
+
+    - Identical images share one resource URL ("image://<hash>")
+    - The document only holds display-sized thumbnails; full-resolution PNG bytes are spilled to a memory-mapped file
+    - collect_garbage() drops the thumbnails of images no longer in the document; they are rebuilt
+        from the spill file if the images come back (e.g. via undo)
+    - With display_size=None, no thumbnails are kept (PlainTextEditor only draws placeholders)
+
+    Known Issue: Spilled PNG bytes are kept until clean-up, so that undo can always bring an image back
+    """
+    def __init__(self, document, display_size=64):
+        self.document = document
+        self.display_size = display_size  # Thumbnail size, or None for no thumbnails
+        self.spill = None          # Created with the first image
+        self.locations = {}        # hash -> (offset, length) in the spill file
+        self.resident = {}         # hash -> thumbnail bytes, for thumbnails that are currently document resources
+
+    @staticmethod
+    def url_for(digest):
+        return URL_PREFIX + digest
+
+    @staticmethod
+    def hash_for(image_url):
+        if not image_url.startswith(URL_PREFIX):
+            raise Exception(f"Unexpected image URL: {image_url}")
+        return image_url[len(URL_PREFIX):]
+
+    def __contains__(self, digest):
+        return digest in self.locations
+
+    def add(self, png_data, image=None):
+        """Register PNG bytes (and the decoded image, if at hand) and return the resource URL"""
+        digest = blob_hash(png_data)
+        if digest not in self.locations:
+            if self.spill is None:
+                self.spill = SpillFile()
+            self.locations[digest] = (self.spill.append(png_data), len(png_data))
+        if self.display_size is not None and digest not in self.resident:
+            self._add_thumbnail(digest, image, png_data)
+        return self.url_for(digest)
+
+    def share_from(self, other):
+        """
+        Start with the images of another manager (see Session.fork): the spill file is shared and
+        thumbnails are added as implicitly shared QImages, so nothing is copied or decoded
+        Note: Both managers keep appending to the shared spill file; each one only knows its own locations
+        """
+        if other.spill is None:
+            return
+        other.spill.share()
+        self.spill = other.spill
+        self.locations = dict(other.locations)
+        if self.display_size is None:
+            return
+        for digest, size in other.resident.items():
+            url = QUrl(self.url_for(digest))
+            self.document.addResource(QTextDocument.ImageResource, url,
+                                      other.document.resource(QTextDocument.ImageResource, url))
+            self.resident[digest] = size
+
+    def png_data(self, digest):
+        offset, length = self.locations[digest]
+        return self.spill.read(offset, length)
+
+    def resident_bytes(self):
+        return sum(self.resident.values())
+
+    def ensure_resident(self, image_hashes):
+        """Rebuild the thumbnails of images that came back into the document"""
+        if self.display_size is None:
+            return
+        for digest in image_hashes:
+            if digest not in self.resident:
+                logger.debug(f"Restoring thumbnail for image {digest}")
+                self._add_thumbnail(digest, None, self.png_data(digest))
+
+    def collect_garbage(self, referenced):
+        """Drop the thumbnails of images that are not referenced by the document"""
+        for digest in self.resident.keys() - set(referenced):
+            # Note: QTextDocument cannot remove a resource; an empty image releases the pixels
+            self.document.addResource(QTextDocument.ImageResource, QUrl(self.url_for(digest)), QImage())
+            del self.resident[digest]
+        logger.debug(f"Image thumbnails resident: {len(self.resident)}, spilled images: {len(self.locations)}")
+
+    def _add_thumbnail(self, digest, image, png_data):
+        size = QSize(self.display_size, self.display_size)
+        if image is None:
+            # Decode straight to the display size
+            byte_array = QByteArray(png_data)
+            buffer = QBuffer(byte_array)
+            buffer.open(QBuffer.ReadOnly)
+            reader = QImageReader(buffer, b"PNG")
+            reader.setScaledSize(size)
+            thumbnail = reader.read()
+            buffer.close()
+        else:
+            thumbnail = image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        self.document.addResource(QTextDocument.ImageResource, QUrl(self.url_for(digest)), thumbnail)
+        self.resident[digest] = thumbnail.sizeInBytes()
+
+    def clean_up_resources(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
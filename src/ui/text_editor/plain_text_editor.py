@@ -0,0 +1,74 @@
+import logging
+from PySide6.QtWidgets import QPlainTextEdit
+from PySide6.QtCore import QSizeF, QRectF, Qt
+from PySide6.QtGui import QColor, QFontMetricsF, QTextCharFormat, QTextFormat, QPyTextObject
+from ui.text_editor.editor_base import EditorBase
+
+logger = logging.getLogger(__name__)
+
+# Char format of an image placeholder: a custom inline object carrying the image's content hash
+PLACEHOLDER_OBJECT = int(QTextFormat.UserObject) + 1
+DIGEST_PROPERTY = int(QTextFormat.UserProperty) + 1
+
+
+class PlaceholderRenderer(QPyTextObject):
+    """Draws an image placeholder as an inline token, e.g. [image 8442d621]"""
+    # Note: QPyTextObject, not (QObject, QTextObjectInterface); registerHandler() silently ignores the latter
+    def __init__(self, font, parent):
+        super().__init__(parent)
+        self.font = font
+        self.metrics = QFontMetricsF(font)
+
+    @staticmethod
+    def label(text_format):
+        digest = text_format.property(DIGEST_PROPERTY) or "?"
+        return f"image {digest[:8]}"
+
+    def intrinsicSize(self, doc, position, text_format):
+        # Note: As tall as the font's ascent, so the line height does not change
+        return QSizeF(self.metrics.horizontalAdvance(self.label(text_format)) + 8, self.metrics.ascent())
+
+    def drawObject(self, painter, rect, doc, position, text_format):
+        painter.save()
+        painter.setPen(QColor(120, 140, 160))
+        painter.setBrush(QColor(64, 74, 86))
+        painter.drawRoundedRect(QRectF(rect).adjusted(0.5, 0.5, -0.5, -0.5), 3, 3)
+        painter.setFont(self.font)
+        painter.setPen(QColor(160, 175, 190))
+        painter.drawText(rect, Qt.AlignCenter, self.label(text_format))
+        painter.restore()
+
+
+class PlainTextEditor(EditorBase, QPlainTextEdit):
+    """
+    TextEditor on the plain-text layout path (opt-in: WORKBENCH_EDITOR=plain), for large transcripts.
+
+    QPlainTextEdit lays out and scrolls line by line instead of laying out the whole document; it
+    cannot show images, so an image is shown as a placeholder token. The U+FFFC of an image carries
+    its content hash (DIGEST_PROPERTY), and the PNG bytes stay in the side store (ImageResourceManager,
+    without thumbnails).
+
+    Known Issue: Like in TextEditor, copying and pasting text turns images into plain U+FFFC
+    """
+    def __init__(self):
+        # Note: PlainTextEditor relies on the self-deletion pattern for clean-up
+        super().__init__(parent=None)
+        # Font, colors, managers, image and undo bookkeeping (see EditorBase)
+        self.set_up_editor(display_size=None)
+        # Draw placeholders (the layout asks the handler of a char format's object type)
+        self.placeholder_renderer = PlaceholderRenderer(self.font(), self)
+        self.document().documentLayout().registerHandler(PLACEHOLDER_OBJECT, self.placeholder_renderer)
+        # Logger: Initialization completion
+        logger.debug("PlainTextEditor initialized")
+
+    def _image_format(self, image_url):
+        placeholder_format = QTextCharFormat()
+        placeholder_format.setObjectType(PLACEHOLDER_OBJECT)
+        placeholder_format.setProperty(DIGEST_PROPERTY, self.image_resources.hash_for(image_url))
+        return placeholder_format
+
+    def _image_hash(self, char_format):
+        # Note: Text typed after a placeholder inherits its properties, but not its object type
+        if char_format.objectType() != PLACEHOLDER_OBJECT:
+            return None
+        return char_format.property(DIGEST_PROPERTY)
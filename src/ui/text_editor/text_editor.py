@@ -1,139 +1,39 @@
-import base64
-import uuid
 import logging
-from typing import Callable
-from PySide6.QtWidgets import QTextEdit, QApplication
-from PySide6.QtCore import Qt, QUrl, QByteArray, QBuffer, QTimer
-from PySide6.QtGui import QFont, QFontDatabase, QImage, QTextDocument, QTextImageFormat
-from PySide6.QtGui import QColor, QPalette
-from ui.text_editor.syntax_highlighter import SyntaxHighlighter
-from ui.text_editor.animated_insertion_manager import AnimatedInsertionManager
+from PySide6.QtWidgets import QTextEdit
+from PySide6.QtGui import QTextImageFormat
+from ui.text_editor.editor_base import EditorBase
 
 logger = logging.getLogger(__name__)
 
 
-class TextEditor(QTextEdit):
+class TextEditor(EditorBase, QTextEdit):
     def __init__(self):
         # Note: TextEditor relies on the self-deletion pattern for clean-up
         super().__init__(parent=None)
         # Disable rich text support, per the requirements
         self.setAcceptRichText(False)
-        # Always show the vertical scrollbar
-        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        # Set custom font
-        db_families = QFontDatabase().families()
-        if "Sarasa Mono SC" in db_families:
-            # Known Issue: "Sarasa Fixed SC" seems to have more jagged edges
-            # Workaround: Use "Sarasa Mono SC" but disable calt (contextual alternates)
-            font = QFont("Sarasa Mono SC", 12)
-            font.setFeature(QFont.Tag("calt"), 0)
-        elif "SF Mono" in db_families:
-            font = QFont("SF Mono", 12)
-        elif "Consolas" in db_families:
-            font = QFont("Consolas", 12)
-        elif "Courier New" in db_families:
-            font = QFont("Courier New", 12)
-        else:
-            font = QApplication.font()
-            font.setPointSize(12)
-        self.setFont(font)
-        # Set color
-        pal = self.palette()
-        pal.setColor(QPalette.Text, QColor(216, 222, 233))  # Text
-        pal.setColor(QPalette.Base, QColor(48, 56, 65))     # Background
-        self.setPalette(pal)
-        # Initialize external modules
-        self.highlighter = SyntaxHighlighter(self.document())
-        self.animation_manager = AnimatedInsertionManager(self)
+        # Font, colors, managers, image and undo bookkeeping (see EditorBase)
+        self.set_up_editor(display_size=64)
         # Logger: Initialization completion
         logger.debug("TextEditor initialized")
 
-    def insertFromMimeData(self, source):
-        """Override to handle pasted image content."""
-        if source.hasImage():
-            # Get image from source
-            image = source.imageData()
-            image = QImage(image)
-            # Create a unique URL with UUID for the image
-            image_url = QUrl("image://{}".format(str(uuid.uuid4())))
-            # Add the image to the document's resources
-            # Note: Images are not being garbage collected before session clean-up
-            self.document().addResource(QTextDocument.ImageResource, image_url, image)
-            # Create an image format and set its name to our URL
-            imageFormat = QTextImageFormat()
-            imageFormat.setName(image_url.toString())
-            # Resize the image (only for display)
-            imageFormat.setWidth(64)
-            imageFormat.setHeight(64)
-            # Insert the image at the cursor position using the format
-            self.textCursor().insertImage(imageFormat)
-        else:
-            super().insertFromMimeData(source)
-
-    def get_text(self):
-        """
-        Retrieve the text content with embedded images converted to base64 tags.
-        Images are converted to tags like:
-          <8442d621>base64-data</8442d621>
-        """
-        document = self.document()
-        result_text = ""
-        block = document.begin()
-        while block.isValid():
-            it = block.begin()
-            while not it.atEnd():
-                fragment = it.fragment()
-                if fragment.isValid():
-                    char_format = fragment.charFormat()
-                    if char_format.isImageFormat():
-                        image_format = char_format.toImageFormat()
-                        image_url = image_format.name()
-                        # Get the image resource from the document
-                        image = document.resource(QTextDocument.ImageResource, QUrl(image_url))
-                        if image is not None:
-                            base64_data = self._image_to_base64(image)
-                            result_text += f"<8442d621>{base64_data}</8442d621>"
-                            logger.debug(f"Converted image with URL {image_url} to base64 tag")
-                        else:
-                            logger.error(f"Image resource not found: {image_url}")
-                            raise Exception("unexpected error: image resource not found")
-                    else:
-                        # Append normal text fragments
-                        result_text += fragment.text()
-                it += 1
-            block = block.next()
-            # Add a newline between blocks (except after the final block)
-            if block.isValid():
-                result_text += "\n"
-        return result_text
-
-    def _image_to_base64(self, image):
-        """Convert QImage to a base64 encoded PNG data string."""
-        # Create a byte array to store the image data
-        byte_array = QByteArray()
-        # Create a buffer using the byte array
-        buffer = QBuffer(byte_array)
-        buffer.open(QBuffer.WriteOnly)
-        # Save the image to the buffer in PNG format
-        success = image.save(buffer, "PNG")
-        if not success:
-            logger.error("Failed to save image to buffer")
-        # Make sure to close the buffer
-        buffer.close()
-        base64_data = base64.b64encode(byte_array.data()).decode('utf-8')
-        return base64_data
-
-    def insert_at_end(self, text, number_of_trailing_newline_characters=0):
-        self.animation_manager.insert_at_end(text, number_of_trailing_newline_characters)
-
-    def flush_animation(self, callback: Callable):
-        # Workaround: The current implementation is based on polling (every 10 ms)
-        if self.animation_manager.is_animating:
-            # Schedule to call itself 10 ms later
-            QTimer.singleShot(10, lambda: self.flush_animation(callback))
-        else:
-            callback()
-
-    def clean_up_resources(self):
-        # Self-Deletion
-        self.deleteLater()
+    def _image_format(self, image_url):
+        # Create an image format and set its name to our URL
+        imageFormat = QTextImageFormat()
+        imageFormat.setName(image_url)
+        # Resize the image (only for display)
+        imageFormat.setWidth(self.image_resources.display_size)
+        imageFormat.setHeight(self.image_resources.display_size)
+        return imageFormat
+
+    def _image_hash(self, char_format):
+        if not char_format.isImageFormat():
+            return None
+        return self.image_resources.hash_for(char_format.toImageFormat().name())
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        super().on_contents_change(position, chars_removed, chars_added)
+        # Images may come back into the document (e.g. undo) after their thumbnails were reclaimed
+        image_resources = self.image_resources
+        if chars_added and len(image_resources.resident) < len(image_resources.locations):
+            image_resources.ensure_resident(self.get_image_hashes(position, position + chars_added))
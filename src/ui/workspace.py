@@ -1,7 +1,13 @@
+import os
 import logging
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QTabWidget
 from PySide6.QtGui import QShortcut, QKeySequence
-from ui.session import Session
+from ui.session import Session, SessionState
+from api.process_worker import get_pool
+from ui.search_dialog import SearchDialog
+from utils.record_store import StoredRecordRef
+from utils.workspace_reader import RecordRef, scan_workspace
 
 logger = logging.getLogger(__name__)
 
@@ -13,8 +19,18 @@ class Workspace(QTabWidget):
         super().__init__(parent=None)
         # Define attributes
         self.main_window = parent
-        self.closed_sessions = []  # Store recently closed sessions
+        self.journal = parent.journal  # Crash recovery journal (may be None)
+        self.closed_sessions = parent.closed_session_history  # Closed sessions (see ClosedSessionHistory)
+        self.search_index = parent.search_index  # Full-text search (see SearchIndex)
+        self.indexed_revisions = {}  # session uid -> revision last sent to the search index
+        self.saved_session_uids = []  # Session uid of each record in the current workspace file, as last loaded or saved
         self.backend = "openai"    # Default backend
+        # Worker mode: "thread" (default) or "process" (see ProcessWorker); F9 toggles
+        self.worker_mode = os.environ.get("WORKBENCH_WORKER_MODE", "thread")
+        if self.worker_mode not in ("thread", "process"):
+            raise Exception(f"Unexpected worker mode: {self.worker_mode}")
+        if self.worker_mode == "process":
+            get_pool()  # Warm up child processes
         # Configuration
         self.setTabsClosable(True)  # Enable close buttons
         self.setMovable(True)       # Allow tabs to be reordered
@@ -22,8 +38,13 @@ class Workspace(QTabWidget):
         # Signal
         self.tabCloseRequested.connect(self.close_session)  # Session close button is clicked
         self.currentChanged.connect(self.focus)  # The current session index changes
+        self.tabBar().tabMoved.connect(self.record_order)  # Sessions are reordered
         # Create the first session
         self.new_session()
+        # Index edited open tabs periodically (only sessions whose revision changed)
+        self.index_timer = QTimer(self)
+        self.index_timer.timeout.connect(self.index_open_sessions)
+        self.index_timer.start(10000)
         # Register keyboard shortcuts
         QShortcut(QKeySequence("Ctrl+T"), self).activated.connect(self.new_session)
         QShortcut(QKeySequence("Ctrl+N"), self).activated.connect(self.new_session)
@@ -31,15 +52,33 @@ class Workspace(QTabWidget):
         QShortcut(QKeySequence("Ctrl+Tab"), self).activated.connect(self.next_session)
         QShortcut(QKeySequence("Ctrl+Shift+Tab"), self).activated.connect(self.prev_session)
         QShortcut(QKeySequence("Ctrl+Shift+T"), self).activated.connect(self.reopen_closed_session)
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self).activated.connect(self.fork_current_session)
         QShortcut(QKeySequence("Ctrl+R"), self).activated.connect(self.reset_current_session)
         QShortcut(QKeySequence("F5"), self).activated.connect(self.reset_current_session)
         QShortcut(QKeySequence("F10"), self).activated.connect(self.change_api_backend)
+        QShortcut(QKeySequence("F9"), self).activated.connect(self.change_worker_mode)
+        QShortcut(QKeySequence("Ctrl+Shift+F"), self).activated.connect(self.show_search_all_dialog)
     
     def new_session(self, tab_index=None):
         if tab_index is None:
             tab_index = self.count()
         session = Session(self)
+        session.start_journaling()
         self.insertTab(tab_index, session, "Session")
+        self.record_order()
+        self.setCurrentIndex(tab_index)
+    
+    def fork_current_session(self):
+        """Open a fork of the current session in a tab next to it (see Session.fork)"""
+        source = self.currentWidget()
+        if not source.can_fork():
+            self.main_window.global_status_bar.show_info("Cannot fork a session while it is generating")
+            return
+        session = source.fork()
+        session.start_journaling()
+        tab_index = self.currentIndex() + 1
+        self.insertTab(tab_index, session, "Session")
+        self.record_order()
         self.setCurrentIndex(tab_index)
     
     def close_session(self, index, open_new=True, store_session=True):
@@ -47,14 +86,20 @@ class Workspace(QTabWidget):
         session = self.widget(index)
         # Store session before closing
         if store_session:
-            self.closed_sessions.append(session.get_data())
-            if len(self.closed_sessions) > 20:  # Keep the last 20 sessions
-                self.closed_sessions.pop(0)
+            session_data = session.get_data()
+            record_id = self.closed_sessions.push(session_data, session.get_blobs())
+            self.search_index.index_document(f"history:{record_id}", "history", "Closed session",
+                                             session_data["text_content"])
             logger.debug(f"Stored closed tab. Stack size: {len(self.closed_sessions)}")
         # Clean up resources in the session before removing
         session.clean_up_resources()
         # Remove the session from the UI
         self.removeTab(index)
+        self.search_index.remove_document(f"open:{session.session_uid}")
+        self.indexed_revisions.pop(session.session_uid, None)
+        if self.journal is not None:
+            self.journal.record_close(session.session_uid)
+            self.record_order()
         # Open a new session if none left
         if open_new:
             if self.count() == 0:
@@ -82,27 +127,114 @@ class Workspace(QTabWidget):
             # Move to the previous session
             self.setCurrentIndex(prev_index)
     
+    def update_rendering(self):
+        """Only the current session of a visible window renders streamed text as it arrives"""
+        window_visible = not self.main_window.is_in_tray and not self.main_window.isMinimized()
+        current = self.currentWidget()
+        for idx in range(self.count()):
+            session = self.widget(idx)
+            session.set_deferred_rendering(not (window_visible and session is current))
+
     def focus(self):
+        self.update_rendering()
         # Focus on the current text editor
         session = self.currentWidget()
         # session could be None because after removing the last session
         #   focus() is called (Cf currentChanged), current session is None in this case
         if session is not None:
             session.focus()
+            self.main_window.update_preview(session)
 
     def reopen_closed_session(self):
-        if not self.closed_sessions:
+        record_id = self.closed_sessions.latest_id()
+        if record_id is None:
             logger.debug("No closed sessions to reopen.")
             return
-        # Get session_data
-        session_data = self.closed_sessions.pop()
+        self.reopen_history_entry(record_id)
         logger.debug(f"Reopening tab. Stack size: {len(self.closed_sessions)}")
+
+    def reopen_history_entry(self, record_id):
+        # Get session_data
+        session_data, blobs = self.closed_sessions.take(record_id)
+        self.search_index.remove_document(f"history:{record_id}")
         # Create the session
         session = Session(self)
-        session.set_data(session_data)
+        session.set_data(session_data, blobs.get)
+        session.start_journaling()
         # Add to the end
         tab_index = self.addTab(session, "Session")
+        self.record_order()
         self.setCurrentIndex(tab_index)
+        return session
+
+    def index_open_sessions(self):
+        for idx in range(self.count()):
+            session = self.widget(idx)
+            # Note: Stubs are covered by the index of their workspace file
+            if not session.is_materialized():
+                continue
+            # Note: A streaming response changes the revision constantly; the session is indexed once it is idle
+            if session.session_state != SessionState.IDLE:
+                continue
+            if self.indexed_revisions.get(session.session_uid) != session.revision:
+                self.indexed_revisions[session.session_uid] = session.revision
+                self.search_index.index_document(f"open:{session.session_uid}", "open", "Open tab",
+                                                 session.get_data()["text_content"])
+
+    def show_search_all_dialog(self):
+        self.index_open_sessions()
+        SearchDialog(self, self.search_index, self.open_search_hit).exec()
+
+    def open_search_hit(self, hit, query):
+        """Show the session of a search hit, with the cursor at the first match"""
+        kind, _, identifier = hit["doc_id"].partition(":")
+        session = None
+        if kind == "open":
+            session = self.find_session(identifier)
+            if session is not None:
+                self.setCurrentWidget(session)
+        elif kind == "history":
+            if int(identifier) in self.closed_sessions:
+                session = self.reopen_history_entry(int(identifier))
+        elif kind == "file":
+            path, _, idx = identifier.rpartition("#")
+            # Note: The sessions of the current workspace file are open already; a stub would duplicate them
+            save_path = self.main_window.save_path
+            if save_path is not None and path == os.path.abspath(save_path):
+                if int(idx) < len(self.saved_session_uids):
+                    session = self.find_session(self.saved_session_uids[int(idx)])
+                    if session is not None:
+                        self.setCurrentWidget(session)
+            else:
+                session = self.open_file_record(path, int(idx))
+        else:
+            raise Exception(f"Unexpected search hit: {hit['doc_id']}")
+        if session is None:
+            logger.debug(f"Search hit is no longer available: {hit['doc_id']}")
+            return
+        session.reveal_text(query)
+
+    def find_session(self, session_uid):
+        for idx in range(self.count()):
+            if self.widget(idx).session_uid == session_uid:
+                return self.widget(idx)
+        return None
+
+    def open_file_record(self, path, idx):
+        """Open a session of another workspace file in a new tab (a stub; loaded when shown)"""
+        try:
+            refs = scan_workspace(path)
+        except Exception as e:
+            logger.error(f"Cannot open search hit in {path}: {e}")
+            return None
+        if idx >= len(refs):
+            return None
+        session = Session(self, record_ref=refs[idx])
+        session.start_journaling()
+        tab_index = self.addTab(session, "Session")
+        self.record_order()
+        self.setCurrentIndex(tab_index)
+        return session
     
     def get_data(self):
         session_data_all = []
@@ -110,19 +242,55 @@ class Workspace(QTabWidget):
             session = self.widget(idx)
             session_data_all.append(session.get_data())
         return {"session_data_all": session_data_all}
+
+    def get_save_snapshot(self):
+        """Return (entries, blobs) for SaveEngine.request_save; cheap for unchanged sessions"""
+        entries, blobs = [], {}
+        for idx in range(self.count()):
+            session = self.widget(idx)
+            # Note: Hibernated sessions are read here, on the UI thread, since their record is discarded
+            #   when they are materialized again; the save engine may still hit its encoding cache
+            if not session.is_materialized() and not isinstance(session.record_ref, StoredRecordRef):
+                # Note: Stubs are copied from their source file by the save engine
+                entries.append({"key": session.session_uid, "source": session.record_ref})
+                continue
+            entries.append({"key": session.session_uid, "revision": session.revision, "record": session.get_data()})
+            blobs.update(session.get_blobs())
+        return entries, blobs
+
+    def update_record_refs(self, path, records, container):
+        """After a save, point stubs at their records in the new file"""
+        for idx in range(self.count()):
+            session = self.widget(idx)
+            if not session.is_materialized() and session.session_uid in records:
+                offset, length, crc = records[session.session_uid]
+                if isinstance(session.record_ref, StoredRecordRef):
+                    session.record_ref.discard()
+                session.record_ref = RecordRef(path, offset, length, crc, container)
     
-    def set_data(self, data):
+    def set_data(self, data, load_blob=None, store_sessions=False):
+        # Note: Entries are either session data or RecordRef (a stub, materialized when first shown)
         session_data_all = data["session_data_all"]
-        # Clear existing tabs without storing them
+        # Clear existing tabs (store_sessions: into the closed-session history)
         for idx in reversed(range(self.count())):
-            self.close_session(idx, open_new=False, store_session=False)
-        # Clean up closed sessions
-        self.closed_sessions = []
+            session = self.widget(idx)
+            # Note: A stub of a workspace file holds nothing that is not in that file
+            store = store_sessions and (session.is_materialized() or isinstance(session.record_ref, StoredRecordRef))
+            self.close_session(idx, open_new=False, store_session=store)
         # Recreate sessions
         for session_data in session_data_all:
-            session = Session(self)
-            session.set_data(session_data)
+            if isinstance(session_data, RecordRef):
+                session = Session(self, record_ref=session_data)
+            else:
+                session = Session(self)
+                session.set_data(session_data, load_blob)
+            session.start_journaling()
             self.addTab(session, "Session")
+        self.record_order()
+
+    def record_order(self):
+        if self.journal is not None:
+            self.journal.record_order([self.widget(idx).session_uid for idx in range(self.count())])
     
     def change_api_backend(self):
         """Change API backend for all sessions"""
@@ -136,16 +304,29 @@ class Workspace(QTabWidget):
         else:
             raise Exception(f"Unexpected backend: {self.backend}")
         # Update the global status bar
-        self.main_window.global_status_bar.update_backend_status(self.backend)
+        self.main_window.global_status_bar.update_backend_status(self.backend, self.worker_mode)
         # Update logger
         logger.debug(f"Backend changed to: {self.backend}")
     
+    def change_worker_mode(self):
+        """Switch between worker threads and worker processes (applies to new requests)"""
+        if self.worker_mode == "thread":
+            self.worker_mode = "process"
+            get_pool()  # Warm up child processes
+        elif self.worker_mode == "process":
+            self.worker_mode = "thread"
+        else:
+            raise Exception(f"Unexpected worker mode: {self.worker_mode}")
+        # Update the global status bar
+        self.main_window.global_status_bar.update_backend_status(self.backend, self.worker_mode)
+        # Update logger
+        logger.debug(f"Worker mode changed to: {self.worker_mode}")
+    
     def clean_up_resources(self):
         logger.debug(f"Cleaning up resources for {self.count()} sessions")
+        self.index_timer.stop()
         # Clear existing tabs
         for idx in reversed(range(self.count())):
             self.close_session(idx, open_new=False, store_session=False)
-        # Clear closed_sessions
-        self.closed_sessions = []
         # Self-Deletion
         self.deleteLater()
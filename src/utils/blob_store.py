@@ -0,0 +1,92 @@
+"""
+Content-addressed blob container (used for images saved alongside workspaces)
+
+File layout: a sequence of records, each being
+    MAGIC (4 bytes) | SHA-256 of the data (32 bytes) | data length (8 bytes, little endian) | data
+Records are only ever appended, so a crash can at worst leave a truncated last record,
+which is ignored (and overwritten) the next time the container is opened.
+
+Known Issue: Blobs that are no longer referenced by the workspace are never pruned
+"""
+import os
+import struct
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WBB1"
+HEADER = struct.Struct("<4s32sQ")
+
+
+def blob_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def container_path_for(workspace_path):
+    """The blob container that belongs to a workspace file"""
+    return os.path.splitext(workspace_path)[0] + ".blobs"
+
+
+class BlobContainer:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.index = {}  # hash -> (data offset, length)
+        self.end_offset = 0
+        self._scan()
+
+    def _scan(self):
+        if not os.path.exists(self.path):
+            return
+        file_size = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            offset = 0
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                magic, digest, length = HEADER.unpack(header)
+                data_offset = offset + HEADER.size
+                if magic != MAGIC or f.seek(length, os.SEEK_CUR) > file_size:
+                    logger.warning(f"Ignoring truncated or corrupt tail of {self.path} at offset {offset}")
+                    break
+                self.index[digest.hex()] = (data_offset, length)
+                offset = data_offset + length
+            self.end_offset = offset
+
+    def has(self, digest):
+        with self.lock:
+            return digest in self.index
+
+    def read(self, digest):
+        with self.lock:
+            data_offset, length = self.index[digest]
+            with open(self.path, "rb") as f:
+                f.seek(data_offset)
+                return f.read(length)
+
+    def write_many(self, blobs):
+        """Append the blobs that are not stored yet, and make them durable; return the number written"""
+        with self.lock:
+            missing = {digest: data for digest, data in blobs.items() if digest not in self.index}
+            if not missing:
+                return 0
+            mode = "r+b" if os.path.exists(self.path) else "wb"
+            with open(self.path, mode) as f:
+                # Note: Start at the end of the last valid record, dropping any truncated tail
+                f.seek(self.end_offset)
+                f.truncate()
+                offset = self.end_offset
+                written = {}
+                for digest, data in missing.items():
+                    f.write(HEADER.pack(MAGIC, bytes.fromhex(digest), len(data)))
+                    f.write(data)
+                    written[digest] = (offset + HEADER.size, len(data))
+                    offset += HEADER.size + len(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self.index.update(written)
+            self.end_offset = offset
+            return len(missing)
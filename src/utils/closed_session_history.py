@@ -0,0 +1,64 @@
+"""
+Unlimited history of closed sessions (for Ctrl+Shift+T)
+
+Every closed session goes to a compressed on-disk RecordStore; only the most recently
+closed ones are also kept in memory, so reopening them is instant while memory stays flat
+however long the history grows. The history persists across restarts.
+
+Note: This module must not import Qt
+"""
+import logging
+from collections import OrderedDict
+from utils.record_store import RecordStore
+
+logger = logging.getLogger(__name__)
+
+
+class ClosedSessionHistory:
+    def __init__(self, path, cache_size=4, cache_bytes=16 * 1024 * 1024):
+        self.store = RecordStore(path)
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self.cache = OrderedDict()  # record ID -> ((session_data, blobs), size), oldest first
+        self.cached_bytes = 0
+
+    def __len__(self):
+        return len(self.store.record_ids)
+
+    def __contains__(self, record_id):
+        return record_id in self.store.record_ids
+
+    def latest_id(self):
+        return self.store.record_ids[-1] if self.store.record_ids else None
+
+    def push(self, session_data, blobs):
+        record_id = self.store.put(session_data, blobs)
+        size = len(session_data["text_content"]) + sum(len(blob) for blob in blobs.values())
+        self.cache[record_id] = ((session_data, blobs), size)
+        self.cached_bytes += size
+        # Evict the oldest entries, always keeping the latest one
+        while len(self.cache) > 1 and (len(self.cache) > self.cache_size or self.cached_bytes > self.cache_bytes):
+            _, (_, evicted_size) = self.cache.popitem(last=False)
+            self.cached_bytes -= evicted_size
+        return record_id
+
+    def pop(self):
+        """Remove and return (session_data, blobs) of the most recently closed session, or None"""
+        record_id = self.latest_id()
+        if record_id is None:
+            return None
+        return self.take(record_id)
+
+    def take(self, record_id):
+        """Remove and return (session_data, blobs) of a specific entry"""
+        cached = self.cache.pop(record_id, None)
+        if cached is not None:
+            entry, size = cached
+            self.cached_bytes -= size
+        else:
+            entry = self.store.get(record_id)
+        self.store.delete(record_id)
+        return entry
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,302 @@
+"""
+Crash-safe, append-only workspace journal
+
+Every change to the workspace is appended as one JSON line:
+  {"op": "snapshot", "sid": ..., "text": ..., "images": [...]}   full content of a session
+  {"op": "ref", "sid": ..., "path": ..., "offset": ..., ...}     session not loaded yet (see RecordRef)
+  {"op": "edit", "sid": ..., "pos": ..., "del": ..., "ins": ..., "images": [...]}   user edit
+  {"op": "append", "sid": ..., "offset": ..., "text": ...}       streamed response delta
+  {"op": "close", "sid": ...}
+  {"op": "order", "sids": [...]}                                 tab order
+  {"op": "meta", "save_path": ...}
+Positions and lengths are in UTF-16 code units, exactly as reported by QTextDocument.
+An "append" inserts its text "offset" characters before the end of the session (the
+trailing newlines that allow scrolling past the last line), mirroring insert_at_end().
+Images are referenced by content hash and stored in the journal's blob container.
+
+The UI thread only enqueues operations; a background thread coalesces them, writes
+them, and fsyncs at most every fsync_interval seconds. The journal is compacted (replayed
+and rewritten as snapshots) when it grows large, and removed on a clean exit. A journal
+found at startup therefore means the previous run did not exit cleanly.
+
+Note: This module must not import Qt
+"""
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from utils.blob_store import BlobContainer, container_path_for
+from utils.workspace_reader import RecordRef
+
+logger = logging.getLogger(__name__)
+
+
+def utf16_length(text):
+    return len(text.encode("utf-16-le", "surrogatepass")) // 2
+
+
+class Journal:
+    def __init__(self, path, fsync_interval=0.5, compaction_threshold=8 * 1024 * 1024):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.compaction_threshold = compaction_threshold
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.blob_container = BlobContainer(container_path_for(path))
+        # Note: Any previous journal must have been replayed by now; start a fresh one
+        self.file = open(path, "w", encoding="utf-8")
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._background_task)
+        self.thread.daemon = True
+        self.thread.start()
+
+    # Recording (called on the UI thread; only enqueues)
+    def record_snapshot(self, sid, data, blobs, load_blob=None):
+        """blobs: {hash: bytes}; images missing from it are read with load_blob(hash) on the journal thread"""
+        if blobs:
+            self.queue.put({"op": "blobs", "blobs": blobs})
+        missing = [digest for digest in data.get("image_hashes", []) if digest not in blobs]
+        if missing and load_blob is not None:
+            self.queue.put({"op": "load_blobs", "digests": missing, "load_blob": load_blob})
+        self.queue.put({"op": "snapshot", "sid": sid, "text": data["text_content"],
+                        "images": data.get("image_hashes", [])})
+
+    def record_ref(self, sid, ref):
+        self.queue.put({"op": "ref", "sid": sid, **ref.to_dict()})
+
+    def record_edit(self, sid, position, chars_removed, inserted, image_hashes, blobs):
+        if blobs:
+            self.queue.put({"op": "blobs", "blobs": blobs})
+        self.queue.put({"op": "edit", "sid": sid, "pos": position, "del": chars_removed,
+                        "ins": inserted, "images": image_hashes})
+
+    def record_append(self, sid, text, offset):
+        self.queue.put({"op": "append", "sid": sid, "offset": offset, "text": text})
+
+    def record_close(self, sid):
+        self.queue.put({"op": "close", "sid": sid})
+
+    def record_order(self, sids):
+        self.queue.put({"op": "order", "sids": sids})
+
+    def record_meta(self, save_path):
+        self.queue.put({"op": "meta", "save_path": save_path})
+
+    # Writing (background thread)
+    def _background_task(self):
+        last_fsync = time.monotonic()
+        unsynced = False
+        written_since_compaction = 0
+        running = True
+        while running:
+            try:
+                batch = [self.queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            while not self.queue.empty():
+                batch.append(self.queue.get())
+            if None in batch:
+                batch = batch[:batch.index(None)]
+                running = False
+            try:
+                if batch:
+                    written_since_compaction += self._write_batch(batch)
+                    unsynced = True
+                now = time.monotonic()
+                # Note: fsync is batched; at most fsync_interval seconds of edits are at risk
+                if unsynced and (not running or now - last_fsync >= self.fsync_interval):
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                    last_fsync, unsynced = now, False
+                    if written_since_compaction >= self.compaction_threshold:
+                        self._compact()
+                        written_since_compaction = 0
+            except Exception as e:
+                logger.error(f"Journal write failed: {e}")
+        self.file.close()
+        logger.debug("Exiting the journal thread")
+
+    def _write_batch(self, batch):
+        blobs = {}
+        lines = []
+        for op in coalesce(batch):
+            if op["op"] == "blobs":
+                blobs.update(op["blobs"])
+            elif op["op"] == "load_blobs":
+                for digest in op["digests"]:
+                    if digest not in blobs and not self.blob_container.has(digest):
+                        try:
+                            blobs[digest] = op["load_blob"](digest)
+                        except Exception as e:
+                            logger.warning(f"Cannot copy image {digest[:8]} into the journal: {e}")
+            else:
+                lines.append(json.dumps(op, ensure_ascii=False))
+        # Note: Blobs are made durable before any line that refers to them
+        if blobs:
+            self.blob_container.write_many(blobs)
+        data = "".join(line + "\n" for line in lines)
+        self.file.write(data)
+        return len(data)
+
+    def _compact(self):
+        """Rewrite the journal as one snapshot per session"""
+        start_time = time.perf_counter()
+        state = replay_journal(self.path)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for op in state_to_ops(state):
+                f.write(json.dumps(op, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        logger.info(f"Compacted journal in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+    def close(self, remove=True):
+        """Flush and stop; on a clean exit the journal is removed"""
+        self.queue.put(None)
+        self.thread.join(timeout=10)
+        if remove:
+            for path in (self.path, self.blob_container.path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def coalesce(ops):
+    """Merge runs of contiguous typing, deletions and streamed deltas into single operations"""
+    merged = []
+    for op in ops:
+        prev = merged[-1] if merged else None
+        if prev is not None and prev["op"] == op["op"] and prev.get("sid") == op.get("sid"):
+            if op["op"] == "append" and prev["offset"] == op["offset"]:
+                prev["text"] += op["text"]
+                continue
+            if op["op"] == "edit" and not prev["images"] and not op["images"]:
+                # Typing: insertion right after the previous insertion
+                if op["del"] == 0 and prev["pos"] + utf16_length(prev["ins"]) == op["pos"]:
+                    prev["ins"] += op["ins"]
+                    continue
+                # Backspace: deletion right before the previous deletion
+                if not prev["ins"] and not op["ins"] and op["pos"] + op["del"] == prev["pos"]:
+                    prev["pos"] = op["pos"]
+                    prev["del"] += op["del"]
+                    continue
+        merged.append(dict(op))
+    return merged
+
+
+class _SessionState:
+    def __init__(self, text="", images=(), ref=None):
+        # Note: A session that was never loaded stays a reference until it is edited
+        self.ref = ref
+        self.buffer = None if ref is not None else bytearray(text.encode("utf-16-le", "surrogatepass"))
+        self.images = list(images)
+
+    def load(self):
+        if self.ref is not None:
+            data = self.ref.load()
+            self.buffer = bytearray(data["text_content"].encode("utf-16-le", "surrogatepass"))
+            self.images = list(data.get("image_hashes", []))
+            self.ref = None
+
+    def count_images(self, start, end):
+        if not self.images:
+            return 0
+        return self.buffer[start * 2:end * 2].decode("utf-16-le", "surrogatepass").count("\ufffc")
+
+    def replace(self, position, chars_removed, inserted, images):
+        self.load()
+        position = min(position, len(self.buffer) // 2)
+        end = min(position + chars_removed, len(self.buffer) // 2)
+        image_index = self.count_images(0, position)
+        del self.images[image_index:image_index + self.count_images(position, end)]
+        self.images[image_index:image_index] = images
+        self.buffer[position * 2:end * 2] = inserted.encode("utf-16-le", "surrogatepass")
+
+    def text(self):
+        # Note: A lone surrogate cannot be stored as UTF-8; it is replaced rather than failing recovery
+        return self.buffer.decode("utf-16-le", "replace")
+
+
+def replay_journal(path):
+    """
+    Rebuild the workspace state recorded in a journal
+    Returns {"save_path": ..., "sids": [...], "session_data_all": [...]} or None if there is nothing
+    to recover; entries of session_data_all are session data or RecordRef (a session never loaded)
+    """
+    if not os.path.exists(path):
+        return None
+    sessions, order, save_path = {}, [], None
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            try:
+                op = json.loads(line)
+            except json.JSONDecodeError:
+                # Note: Only the last line can be torn by a crash
+                logger.warning(f"Ignoring unreadable journal line {line_number + 1}")
+                continue
+            kind = op["op"]
+            if kind == "snapshot":
+                sessions[op["sid"]] = _SessionState(op["text"], op["images"])
+            elif kind == "ref":
+                sessions[op["sid"]] = _SessionState(ref=RecordRef.from_dict(op))
+            elif kind in ("edit", "append"):
+                state = sessions.get(op["sid"])
+                if state is None:
+                    logger.warning(f"Ignoring journal op for unknown session {op['sid']}")
+                    continue
+                try:
+                    state.load()
+                except Exception as e:
+                    # Note: The record of a session that was never loaded may be gone (e.g. the file was
+                    #   deleted); only that session is lost
+                    logger.error(f"Cannot recover session {op['sid']}: {e}")
+                    sessions.pop(op["sid"])
+                    continue
+                if kind == "edit":
+                    state.replace(op["pos"], op["del"], op["ins"], op["images"])
+                else:
+                    position = max(0, len(state.buffer) // 2 - op["offset"])
+                    state.replace(position, 0, op["text"], [])
+            elif kind == "close":
+                sessions.pop(op["sid"], None)
+            elif kind == "order":
+                order = op["sids"]
+            elif kind == "meta":
+                save_path = op["save_path"]
+            else:
+                raise Exception(f"Unexpected journal op: {kind}")
+    # Sessions in tab order (any unordered ones at the end)
+    sids = [sid for sid in order if sid in sessions] + [sid for sid in sessions if sid not in order]
+    session_data_all = []
+    for sid in sids:
+        if sessions[sid].ref is not None:
+            session_data_all.append(sessions[sid].ref)
+            continue
+        session_data = {"text_content": sessions[sid].text()}
+        if sessions[sid].images:
+            session_data["image_hashes"] = sessions[sid].images
+        session_data_all.append(session_data)
+    if not session_data_all:
+        return None
+    return {"save_path": save_path, "sids": sids, "session_data_all": session_data_all}
+
+
+def state_to_ops(state):
+    ops = []
+    if state is None:
+        return ops
+    for sid, session_data in zip(state["sids"], state["session_data_all"]):
+        if isinstance(session_data, RecordRef):
+            ops.append({"op": "ref", "sid": sid, **session_data.to_dict()})
+        else:
+            ops.append({"op": "snapshot", "sid": sid, "text": session_data["text_content"],
+                        "images": session_data.get("image_hashes", [])})
+    ops.append({"op": "order", "sids": state["sids"]})
+    if state["save_path"] is not None:
+        ops.append({"op": "meta", "save_path": state["save_path"]})
+    return ops
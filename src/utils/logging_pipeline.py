@@ -0,0 +1,154 @@
+"""
+Non-blocking logging pipeline
+
+Log calls only filter the record and put it on a bounded queue; a dedicated writer thread
+formats it and does the file I/O (including rotation). Records in the file are JSON lines that
+carry the session and request IDs bound in request_context at the time of the call.
+
+- Hot paths: DEBUG records are rate-limited per call site (see SamplingFilter)
+- Slow disk: the queue is bounded; once full, records below WARNING are dropped (and counted)
+    while WARNING and above wait briefly for space
+
+Note: This module must not import Qt
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from utils import request_context
+
+_listener = None
+
+
+class ContextFilter(logging.Filter):
+    """Attach the IDs of the current request (evaluated on the emitting thread)"""
+    def filter(self, record):
+        record.context_ids = request_context.current()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Allow at most `limits[level]` records per second from each call site; the number of records
+    suppressed is reported with the next record that passes
+    """
+    def __init__(self, limits=None):
+        super().__init__()
+        self.limits = limits if limits is not None else {logging.DEBUG: 20}
+        self.windows = {}  # (pathname, lineno) -> [window start, count, suppressed]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        limit = self.limits.get(record.levelno)
+        if limit is None:
+            return True
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= 1.0:
+                suppressed = window[2] if window is not None else 0
+                self.windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler that never blocks for low-priority records"""
+    def __init__(self, log_queue, block_level=logging.WARNING, block_timeout=0.5):
+        super().__init__(log_queue)
+        self.block_level = block_level
+        self.block_timeout = block_timeout
+        # Note: Records are logged from any thread
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            if record.levelno >= self.block_level:
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            # Note: The record may carry earlier drops (see prepare); they are reported with the next one
+            with self.dropped_lock:
+                self.dropped += 1 + getattr(record, "dropped", 0)
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        # Note: Drops are reported with the next record that gets through (prepare() runs on the logging thread)
+        with self.dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            record.dropped = dropped
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            # Note: Tracebacks are already part of the message (see QueueHandler.prepare)
+            "msg": record.getMessage(),
+        }
+        data.update(getattr(record, "context_ids", {}))
+        if getattr(record, "suppressed", 0):
+            data["suppressed_before"] = record.suppressed
+        if getattr(record, "dropped", 0):
+            data["dropped_before"] = record.dropped
+        return json.dumps(data, ensure_ascii=False)
+
+
+def setup_logging(log_dir, level=logging.DEBUG, max_queue_size=10000):
+    """Route the root logger through a queue to a JSON log file (app.jsonl) and the console"""
+    global _listener
+    os.makedirs(log_dir, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, "app.jsonl"),
+        maxBytes=5 * 1024 * 1024,  # max log file size (5 MB)
+        backupCount=5,  # keep last 5 backup log files
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    log_queue = queue.Queue(maxsize=max_queue_size)
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Write the records still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            # Note: The writer thread cannot be signalled; records still queued are lost
+            pass
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
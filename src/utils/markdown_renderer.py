@@ -0,0 +1,179 @@
+"""
+Incremental Markdown rendering for the preview pane (see MarkdownPreview)
+
+A background thread keeps a mirror of the previewed session text, updated with the same edits as
+the document (positions in UTF-16 code units, like the journal). After each batch of edits, the
+text from the first changed segment on is split again into segments:
+  - a role line ("User:" or "Assistant:")
+  - a Markdown block: the lines up to the next blank line (blank lines inside a fenced code block do not count)
+Segments are rendered to HTML by QTextDocument's Markdown reader and cached by content hash, so
+unchanged turns are never rendered again; while a response streams, only its last, still-growing
+block is. Batches are rendered at most every RENDER_INTERVAL seconds.
+
+Updates are reported as (generation, index, removed, htmls): segments [index, index + removed) of
+the preview are replaced by the rendered htmls. Unchanged segments after an edit are kept.
+
+Known Issue: A Markdown block containing blank lines (e.g. a loose list) is rendered in several pieces
+"""
+import time
+import queue
+import bisect
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QTextDocument
+from utils.journal import utf16_length
+
+logger = logging.getLogger(__name__)
+
+RENDER_INTERVAL = 0.05    # Seconds
+CACHE_SIZE = 8192         # Rendered segments
+CHUNK_SIZE = 50           # Segments per update, so a large transcript is shown piece by piece
+ROLE_COLORS = {"User:": "#73e673", "Assistant:": "#e67373"}  # As in SyntaxHighlighter
+
+
+def split_segments(text, start):
+    """Split text (starting at UTF-16 position start, at the start of a line) into [(position, text)]"""
+    segments = []
+    block_lines, block_start = [], start
+    in_fence = False
+    position = start
+    for line in text.split("\n"):
+        # Note: Like parse_text, a role line always starts a new turn (it also ends an unclosed fence)
+        if line in ROLE_COLORS:
+            if block_lines:
+                segments.append((block_start, "\n".join(block_lines)))
+                block_lines = []
+            segments.append((position, line))
+            in_fence = False
+        elif not in_fence and not line.strip():
+            if block_lines:
+                segments.append((block_start, "\n".join(block_lines)))
+                block_lines = []
+        else:
+            if not block_lines:
+                block_start = position
+            block_lines.append(line)
+            if line.lstrip().startswith(("```", "~~~")):
+                in_fence = not in_fence
+        position += utf16_length(line) + 1
+    if block_lines:
+        segments.append((block_start, "\n".join(block_lines)))
+    return segments
+
+
+class MarkdownRenderer(QObject):
+    # Note: Emitted from the background thread; Qt delivers it to the UI thread (queued connection)
+    updated = Signal(int, int, int, list)
+
+    def __init__(self):
+        super().__init__(parent=None)
+        self.queue = queue.Queue()
+        # Background thread state
+        self.generation = 0
+        self.buffer = bytearray()  # Mirror of the text, UTF-16-LE
+        self.dirty = None          # Lowest changed position since the last render
+        self.positions = []        # Start position of each segment
+        self.keys = []             # Content hash of each segment, as shown by the preview
+        self.cache = OrderedDict() # Content hash -> HTML (LRU)
+        self.thread = threading.Thread(target=self._background_task)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def reset(self, generation, text):
+        """Start over with a new text; updates of earlier generations are to be ignored"""
+        self.queue.put(("reset", generation, text))
+
+    def edit(self, position, chars_removed, inserted):
+        self.queue.put(("edit", position, chars_removed, inserted))
+
+    def _background_task(self):
+        # Note: QTextDocument is reentrant; this one is only used on this thread
+        self.document = QTextDocument()
+        while True:
+            batch = [self.queue.get()]
+            # Coalesce everything that arrived in the meantime
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                break
+            for op in batch:
+                if op[0] == "reset":
+                    _, self.generation, text = op
+                    self.buffer = bytearray(text.encode("utf-16-le", "surrogatepass"))
+                    self.positions, self.keys = [], []
+                    self.dirty = 0
+                else:
+                    self._apply_edit(*op[1:])
+            if self.dirty is not None:
+                try:
+                    self._render()
+                except Exception as e:
+                    logger.error(f"Markdown rendering failed: {e}")
+                self.dirty = None
+            time.sleep(RENDER_INTERVAL)
+        logger.debug("Exiting the Markdown renderer thread")
+
+    def _apply_edit(self, position, chars_removed, inserted):
+        length = len(self.buffer) // 2
+        position = min(position, length)
+        end = min(position + chars_removed, length)
+        self.buffer[position * 2:end * 2] = inserted.encode("utf-16-le", "surrogatepass")
+        self.dirty = position if self.dirty is None else min(self.dirty, position)
+
+    def _render(self):
+        # Split again from the segment before the one containing the change (an edit may join two blocks)
+        index = max(0, bisect.bisect_right(self.positions, self.dirty) - 2)
+        start = self.positions[index] if index > 0 else 0
+        text = self.buffer[start * 2:].decode("utf-16-le", "replace")
+        segments = split_segments(text, start)
+        positions = self.positions[:index] + [position for position, _ in segments]
+        keys = self.keys[:index] + [self._key(segment_text) for _, segment_text in segments]
+        texts = dict(zip(keys[index:], (segment_text for _, segment_text in segments)))
+        # Unchanged segments at both ends are kept by the preview
+        first = index
+        while first < min(len(keys), len(self.keys)) and keys[first] == self.keys[first]:
+            first += 1
+        suffix = 0
+        while (suffix < min(len(keys), len(self.keys)) - first
+               and keys[len(keys) - 1 - suffix] == self.keys[len(self.keys) - 1 - suffix]):
+            suffix += 1
+        removed = len(self.keys) - first - suffix
+        changed = keys[first:len(keys) - suffix]
+        self.positions = positions
+        self.keys = keys
+        if not removed and not changed:
+            return
+        # Note: Large updates are sent in chunks, so the UI thread stays responsive between them
+        for offset in range(0, max(len(changed), 1), CHUNK_SIZE):
+            htmls = [self._html(key, texts[key]) for key in changed[offset:offset + CHUNK_SIZE]]
+            self.updated.emit(self.generation, first + offset, removed if offset == 0 else 0, htmls)
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _html(self, key, text):
+        html = self.cache.get(key)
+        if html is not None:
+            self.cache.move_to_end(key)
+            return html
+        if text in ROLE_COLORS:
+            html = f'<p style="color:{ROLE_COLORS[text]}; font-weight:700;">{text}</p>'
+        else:
+            # Note: Images are U+FFFC in the text
+            self.document.setMarkdown(text.replace("\ufffc", "[image]"))
+            html = self.document.toHtml()
+            html = html[html.find(">", html.find("<body")) + 1:html.rfind("</body>")]
+        self.cache[key] = html
+        if len(self.cache) > CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return html
+
+    def close(self):
+        self.queue.put(None)
@@ -0,0 +1,159 @@
+"""
+Compressed on-disk store for session records (SQLite, zlib-compressed JSON)
+
+Records are session data dicts plus their image blobs; blobs are stored once per content
+hash and shared between records. All database access happens on one background thread:
+deletes are queued and return immediately; put() and reads wait for the queue to reach them
+(so a read always sees every earlier write).
+
+Note: Record IDs are assigned by SQLite, so instances sharing the directory (see
+    WORKBENCH_SINGLE_INSTANCE) never pick the same ID
+
+Note: This module must not import Qt
+"""
+import os
+import json
+import zlib
+import queue
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY, data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS record_blobs (record_id INTEGER NOT NULL, hash TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS record_blobs_record ON record_blobs (record_id);
+CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, data BLOB NOT NULL);
+"""
+
+
+class RecordStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._background_task)
+        self.thread.daemon = True
+        self.thread.start()
+        self.record_ids = self._call(self._list_ids)
+
+    # Public API (any thread)
+    def put(self, data, blobs):
+        """Store a record and return its ID"""
+        record_id = self._call(self._put, data, blobs)
+        self.record_ids.append(record_id)
+        return record_id
+
+    def get(self, record_id, with_blobs=True):
+        """Return (data, blobs) of a record (blobs is None without with_blobs)"""
+        return self._call(self._get, record_id, with_blobs)
+
+    def get_blob(self, digest):
+        return self._call(self._get_blob, digest)
+
+    def delete(self, record_id):
+        self.record_ids.remove(record_id)
+        self.queue.put((self._delete, (record_id,), None))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=10)
+
+    def clear(self):
+        """Delete every record (e.g. leftovers of a previous run)"""
+        for record_id in list(self.record_ids):
+            self.delete(record_id)
+
+    def _call(self, function, *args):
+        future = Future()
+        self.queue.put((function, args, future))
+        return future.result()
+
+    # Background thread
+    def _background_task(self):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            function, args, future = item
+            try:
+                result = function(*args)
+                self.connection.commit()
+                if future is not None:
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Record store operation failed: {e}")
+                self.connection.rollback()
+                if future is not None:
+                    future.set_exception(e)
+        self.connection.close()
+        logger.debug("Exiting the record store thread")
+
+    def _list_ids(self):
+        return [row[0] for row in self.connection.execute("SELECT id FROM records ORDER BY id")]
+
+    def _put(self, data, blobs):
+        compressed = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        record_id = self.connection.execute("INSERT INTO records (data) VALUES (?)", (compressed,)).lastrowid
+        for digest, blob in blobs.items():
+            # Note: Blobs are PNG data, which does not compress further
+            self.connection.execute("INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)", (digest, blob))
+            self.connection.execute("INSERT INTO record_blobs (record_id, hash) VALUES (?, ?)", (record_id, digest))
+        return record_id
+
+    def _get(self, record_id, with_blobs):
+        row = self.connection.execute("SELECT data FROM records WHERE id = ?", (record_id,)).fetchone()
+        if row is None:
+            raise KeyError(record_id)
+        data = json.loads(zlib.decompress(row[0]))
+        if not with_blobs:
+            return data, None
+        blobs = dict(self.connection.execute(
+            "SELECT blobs.hash, blobs.data FROM record_blobs JOIN blobs ON blobs.hash = record_blobs.hash "
+            "WHERE record_blobs.record_id = ?", (record_id,)))
+        return data, blobs
+
+    def _get_blob(self, digest):
+        row = self.connection.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return row[0]
+
+    def _delete(self, record_id):
+        hashes = [row[0] for row in self.connection.execute(
+            "SELECT hash FROM record_blobs WHERE record_id = ?", (record_id,))]
+        self.connection.execute("DELETE FROM records WHERE id = ?", (record_id,))
+        self.connection.execute("DELETE FROM record_blobs WHERE record_id = ?", (record_id,))
+        # Drop blobs that no other record refers to
+        for digest in hashes:
+            if self.connection.execute("SELECT 1 FROM record_blobs WHERE hash = ? LIMIT 1", (digest,)).fetchone() is None:
+                self.connection.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+
+
+class StoredRecordRef:
+    """
+    A record in a RecordStore, usable where a RecordRef is expected (see Session.record_ref)
+    Note: read_bytes() and path make it a valid save source; blobs are copied via load_blob()
+    """
+    def __init__(self, store, record_id):
+        self.store = store
+        self.record_id = record_id
+        self.path = store.path
+
+    def load(self):
+        return self.store.get(self.record_id, with_blobs=False)[0]
+
+    def load_blob(self, digest):
+        return self.store.get_blob(digest)
+
+    def read_bytes(self):
+        return json.dumps(self.load(), ensure_ascii=False).encode("utf-8")
+
+    def discard(self):
+        """Delete the record; the reference must not be used afterwards"""
+        self.store.delete(self.record_id)
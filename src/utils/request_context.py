@@ -0,0 +1,24 @@
+"""
+Session and request IDs of the work in progress on the current thread
+
+Bound by Session.generate_response on the UI thread and re-bound by the worker on its own thread,
+so that traces (and log records) can be attributed to a request.
+
+Note: This module must not import Qt
+"""
+import contextvars
+
+_ids = contextvars.ContextVar("request_ids", default={})
+
+
+def bind(**ids):
+    """Add IDs (e.g. session_id, request_id) to the current context; returns a token for reset()"""
+    return _ids.set({**_ids.get(), **ids})
+
+
+def reset(token):
+    _ids.reset(token)
+
+
+def current():
+    return _ids.get()
@@ -0,0 +1,144 @@
+"""
+Background workspace saving
+
+The UI thread only takes a snapshot (see Workspace.get_save_snapshot); serialization, blob
+writes and the atomic file replace happen on a dedicated thread. Encoded session records
+are cached by (session key, revision), so unchanged sessions are never re-serialized.
+Sessions that were never materialized (see Session.record_ref) are copied byte for byte
+from their source file. The location of every written record is reported back, so those
+sessions can keep reading lazily from the new file.
+"""
+import os
+import json
+import time
+import zlib
+import queue
+import logging
+import threading
+from PySide6.QtCore import QObject, Signal
+from utils.blob_store import BlobContainer, container_path_for
+
+logger = logging.getLogger(__name__)
+
+
+class SaveEngine(QObject):
+    # Note: Emitted from the background thread; Qt delivers it to the UI thread (queued connection)
+    finished = Signal(dict)
+
+    def __init__(self):
+        super().__init__(parent=None)
+        self.queue = queue.Queue()
+        self.encoded_cache = {}  # session key -> (revision, encoded record)
+        self.containers = {}     # container path -> BlobContainer
+        self.containers_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._background_task)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def request_save(self, path, entries, blobs):
+        """
+        Queue a save of the workspace
+          entries: list of {"key": ..., "revision": ..., "record": dict}, in tab order
+            (or {"key": ..., "source": RecordRef} for a session that was never materialized)
+          blobs: {hash: bytes} for every blob referenced by the records (except those of sources)
+        """
+        self.queue.put({"path": path, "entries": entries, "blobs": blobs})
+
+    def get_container(self, path):
+        """Return the (shared) blob container of a workspace file"""
+        container_path = container_path_for(path)
+        with self.containers_lock:
+            if container_path not in self.containers:
+                self.containers[container_path] = BlobContainer(container_path)
+            return self.containers[container_path]
+
+    def _background_task(self):
+        while True:
+            request = self.queue.get()
+            if request is None:
+                break
+            # Note: Rapid repeated saves to the same path coalesce; only the latest snapshot per path is written
+            requests = {request["path"]: request}
+            while not self.queue.empty():
+                newer = self.queue.get()
+                if newer is None:
+                    self.queue.put(None)
+                    break
+                requests[newer["path"]] = newer
+            for request in requests.values():
+                self._save(request)
+        logger.debug("Exiting the save thread")
+
+    def _save(self, request):
+        start_time = time.perf_counter()
+        try:
+            records = self._write(request)
+            elapsed = time.perf_counter() - start_time
+            logger.info(f"Saved {request['path']} in {elapsed * 1000:.1f} ms")
+            self.finished.emit({"path": request["path"], "error": None, "records": records})
+        except Exception as e:
+            logger.error(f"Error during save: {e}")
+            self.finished.emit({"path": request["path"], "error": str(e), "records": {}})
+
+    def _write(self, request):
+        """Write the workspace; return {session key: (offset, length, crc)} of the written records"""
+        path = request["path"]
+        container = self.get_container(path)
+        # Step 1: Make referenced blobs durable before the workspace file can point to them
+        blobs = request["blobs"]
+        if blobs:
+            count = container.write_many(blobs)
+            if count:
+                logger.debug(f"Wrote {count} new blobs for {path}")
+        # Step 2: Encode sessions, reusing cached encodings of unchanged sessions
+        encoded_all = []
+        live_keys = set()
+        for entry in request["entries"]:
+            key = entry["key"]
+            if "source" in entry:
+                encoded = self._copy_source(entry["source"], container)
+            else:
+                cached = self.encoded_cache.get(key)
+                if cached is not None and cached[0] == entry["revision"]:
+                    encoded = cached[1]
+                else:
+                    encoded = json.dumps(entry["record"], ensure_ascii=False).encode("utf-8")
+                    self.encoded_cache[key] = (entry["revision"], encoded)
+                live_keys.add(key)
+            encoded_all.append((key, encoded))
+        for key in list(self.encoded_cache):
+            if key not in live_keys:
+                del self.encoded_cache[key]
+        # Step 3: Write to a temporary file and atomically replace the target
+        records = {}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b'{"session_data_all": [\n')
+            for idx, (key, encoded) in enumerate(encoded_all):
+                if idx > 0:
+                    f.write(b",\n")
+                records[key] = (f.tell(), len(encoded), zlib.crc32(encoded))
+                f.write(encoded)
+            f.write(b"\n]}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return records
+
+    def _copy_source(self, ref, container):
+        """Raw bytes of a record that was never materialized; its blobs are copied if needed"""
+        encoded = ref.read_bytes()
+        if container_path_for(ref.path) != container.path:
+            image_hashes = json.loads(encoded).get("image_hashes", [])
+            missing = [digest for digest in set(image_hashes) if not container.has(digest)]
+            if missing:
+                container.write_many({digest: ref.load_blob(digest) for digest in missing})
+        return encoded
+
+    def clean_up_resources(self):
+        """Finish pending saves and stop the thread"""
+        logger.debug("Waiting for pending saves")
+        self.queue.put(None)
+        self.thread.join(timeout=10)
+        # Self-Deletion
+        self.deleteLater()
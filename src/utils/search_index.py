@@ -0,0 +1,160 @@
+"""
+Full-text search index over saved workspaces, closed-session history and open tabs
+
+The index is an SQLite FTS5 table (an on-disk inverted index, ranked with BM25). Documents
+are sessions, identified by:
+  "file:<path>#<index>"   a session of a saved workspace (re-indexed when the file's mtime changes)
+  "history:<record id>"   an entry of ClosedSessionHistory
+  "open:<session uid>"    an open tab
+Writes happen on a background thread; queries use their own read connection and only
+read the index, so they return in milliseconds.
+
+Note: This module must not import Qt
+"""
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future
+from utils.workspace_reader import scan_workspace
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, row INTEGER NOT NULL, kind TEXT NOT NULL, title TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(body, tokenize = 'unicode61');
+"""
+
+
+def to_fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    words = [word.replace('"', '""') for word in text.split()]
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._background_task)
+        self.thread.daemon = True
+        self.thread.start()
+        # Note: The schema must exist before the read connection is used
+        self._call(self._remove_prefix, "open:")  # Open tabs of a previous run are gone
+        self.reader = sqlite3.connect(path, check_same_thread=False)
+
+    # Public API (writes are queued)
+    def add_source(self, path):
+        """Index a workspace file now, and re-index it whenever it changes"""
+        self.queue.put((self._index_file, (os.path.abspath(path),), None))
+
+    def refresh_sources(self):
+        """Re-index known workspace files whose mtime or size changed"""
+        self.queue.put((self._refresh_sources, (), None))
+
+    def index_document(self, doc_id, kind, title, text):
+        self.queue.put((self._index_document, (doc_id, kind, title, text), None))
+
+    def remove_document(self, doc_id):
+        self.queue.put((self._remove_prefix, (doc_id,), None))
+
+    def search(self, text, limit=50):
+        """Return ranked hits: [{"doc_id", "kind", "title", "snippet"}]"""
+        fts_query = to_fts_query(text)
+        if fts_query is None:
+            return []
+        try:
+            rows = self.reader.execute(
+                "SELECT docs.doc_id, docs.kind, docs.title, snippet(documents, 0, '[', ']', '…', 16) "
+                "FROM documents JOIN docs ON docs.row = documents.rowid "
+                "WHERE documents MATCH ? ORDER BY bm25(documents) LIMIT ?", (fts_query, limit)).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Search failed for {fts_query!r}: {e}")
+            return []
+        return [{"doc_id": doc_id, "kind": kind, "title": title, "snippet": snippet.replace("\n", " ")}
+                for doc_id, kind, title, snippet in rows]
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=10)
+        self.reader.close()
+
+    def _call(self, function, *args):
+        future = Future()
+        self.queue.put((function, args, future))
+        return future.result()
+
+    # Background thread
+    def _background_task(self):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            function, args, future = item
+            try:
+                result = function(*args)
+                self.connection.commit()
+                if future is not None:
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Search index operation failed: {e}")
+                self.connection.rollback()
+                if future is not None:
+                    future.set_exception(e)
+        self.connection.close()
+        logger.debug("Exiting the search index thread")
+
+    def _index_document(self, doc_id, kind, title, text):
+        self._remove_prefix(doc_id)
+        # Note: Images (U+FFFC) carry no searchable text
+        cursor = self.connection.execute("INSERT INTO documents (body) VALUES (?)", (text.replace("\ufffc", " "),))
+        self.connection.execute("INSERT INTO docs (doc_id, row, kind, title) VALUES (?, ?, ?, ?)",
+                                (doc_id, cursor.lastrowid, kind, title))
+
+    def _remove_prefix(self, prefix):
+        """Remove a document, or (for a prefix such as "file:<path>#") all matching documents"""
+        if prefix.endswith((":", "#")):
+            rows = self.connection.execute("SELECT doc_id, row FROM docs WHERE substr(doc_id, 1, ?) = ?",
+                                           (len(prefix), prefix)).fetchall()
+        else:
+            rows = self.connection.execute("SELECT doc_id, row FROM docs WHERE doc_id = ?", (prefix,)).fetchall()
+        for doc_id, row in rows:
+            self.connection.execute("DELETE FROM documents WHERE rowid = ?", (row,))
+            self.connection.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+
+    def _index_file(self, path, stat=None):
+        try:
+            stat = stat or os.stat(path)
+            refs = scan_workspace(path)
+        except Exception as e:
+            logger.warning(f"Cannot index {path}: {e}")
+            return
+        self._remove_prefix(f"file:{path}#")
+        title = os.path.basename(path)
+        for idx, ref in enumerate(refs):
+            self._index_document(f"file:{path}#{idx}", "file", f"{title} — session {idx + 1}",
+                                 ref.load()["text_content"])
+        self.connection.execute("INSERT OR REPLACE INTO sources (path, mtime_ns, size) VALUES (?, ?, ?)",
+                                (path, stat.st_mtime_ns, stat.st_size))
+        logger.debug(f"Indexed {len(refs)} sessions of {path}")
+
+    def _refresh_sources(self):
+        for path, mtime_ns, size in self.connection.execute("SELECT path, mtime_ns, size FROM sources").fetchall():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self._remove_prefix(f"file:{path}#")
+                self.connection.execute("DELETE FROM sources WHERE path = ?", (path,))
+                continue
+            if stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+                self._index_file(path, stat)
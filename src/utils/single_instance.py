@@ -0,0 +1,90 @@
+"""
+Single-instance hand-off
+
+The running instance listens on a loopback TCP port; the port and a random token are published in
+<state_dir>/instance.json. A second launch checks this file before importing Qt or any SDK, forwards
+its arguments (and working directory) to the running instance and exits.
+
+Protocol: one JSON line per connection, {"token", "args", "cwd"}, answered with "ok\n"
+
+Note: This module must not import Qt; it runs before the heavy imports of main.pyw
+Known Issue: Two instances started at the same moment may both start; the later one takes over instance.json
+"""
+import os
+import json
+import socket
+import logging
+import secrets
+import threading
+
+logger = logging.getLogger(__name__)
+
+INFO_FILE = "instance.json"
+
+
+def forward_to_running_instance(state_dir, args, timeout=0.5):
+    """Send args to a running instance; returns False if there is none (or it does not answer)"""
+    try:
+        with open(os.path.join(state_dir, INFO_FILE), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        with socket.create_connection(("127.0.0.1", info["port"]), timeout=timeout) as connection:
+            message = {"token": info["token"], "args": list(args), "cwd": os.getcwd()}
+            connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            return connection.makefile("rb").readline() == b"ok\n"
+    except (OSError, ValueError, KeyError):
+        # Note: No instance.json, a stale one (port closed), or a garbled answer
+        return False
+
+
+class InstanceServer:
+    def __init__(self, state_dir, on_message):
+        """on_message(args, cwd) is called on the server thread"""
+        self.path = os.path.join(state_dir, INFO_FILE)
+        self.on_message = on_message
+        self.token = secrets.token_hex(16)
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        # Publish atomically, so a launching instance never reads a partial file
+        os.makedirs(state_dir, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"port": self.port, "token": self.token, "pid": os.getpid()}, f)
+        os.replace(temp_path, self.path)
+        self.thread = threading.Thread(target=self._background_task)
+        self.thread.daemon = True
+        self.thread.start()
+        logger.debug(f"Instance server listening on port {self.port}")
+
+    def _background_task(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                break  # Closed
+            with connection:
+                try:
+                    connection.settimeout(2)
+                    message = json.loads(connection.makefile("rb").readline())
+                    if message.get("token") != self.token:
+                        logger.warning("Rejected a hand-off with a wrong token")
+                        continue
+                    connection.sendall(b"ok\n")
+                    self.on_message(message.get("args", []), message.get("cwd"))
+                except (OSError, ValueError) as e:
+                    logger.debug(f"Hand-off failed: {e}")
+        logger.debug("Exiting the instance server thread")
+
+    def close(self):
+        # Note: shutdown() wakes up accept() on Linux; close() alone does not
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        # Note: Only remove the file if it still describes this instance
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                if json.load(f).get("token") == self.token:
+                    os.remove(self.path)
+        except (OSError, ValueError):
+            pass
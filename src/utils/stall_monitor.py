@@ -0,0 +1,141 @@
+"""
+Event-loop stall detector
+
+A 20 ms heartbeat timer on the UI thread records when the event loop last ran. A watchdog thread
+checks the heartbeat; once it is late by more than the threshold (a stall), the watchdog samples
+the UI thread's Python stack (sys._current_frames) until the heartbeat resumes. Each stall is
+appended to a JSONL report with its duration and the most frequent stacks.
+
+Cost while nothing stalls: one timer callback per 20 ms and one watchdog wake-up per 10 ms
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from PySide6.QtCore import Qt, QObject, QTimer
+
+logger = logging.getLogger(__name__)
+
+
+class StallMonitor(QObject):
+    def __init__(self, report_path, threshold_ms=50, heartbeat_ms=20, sample_ms=5, max_depth=40):
+        # Note: Must be created on the UI thread
+        super().__init__(parent=None)
+        self.report_path = report_path
+        self.threshold = threshold_ms / 1000
+        self.heartbeat_interval = heartbeat_ms / 1000
+        self.sample_interval = sample_ms / 1000
+        self.max_depth = max_depth
+        self.ui_thread_id = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        self.latencies = deque(maxlen=3000)  # Event-loop latency (heartbeat lateness) in seconds
+        self.stall_count = 0
+        self.enabled = False
+        self.stop_event = threading.Event()
+        self.thread = None
+        # Heartbeat
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._beat)
+
+    def start(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.last_beat = time.perf_counter()
+        self.timer.start(int(self.heartbeat_interval * 1000))
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._watchdog_task)
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Stall monitor started (threshold: {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.timer.stop()
+        self.stop_event.set()
+        self.thread.join(timeout=1)
+        self.thread = None
+        logger.info(f"Stall monitor stopped ({self.stall_count} stalls recorded)")
+
+    def toggle(self):
+        if self.enabled:
+            self.stop()
+        else:
+            self.start()
+        return self.enabled
+
+    def latency_percentiles(self):
+        """(p50, p99, max) of recent event-loop latency, in milliseconds"""
+        if not self.latencies:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(self.latencies)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+        return pick(0.5), pick(0.99), ordered[-1] * 1000
+
+    def _beat(self):
+        now = time.perf_counter()
+        self.latencies.append(max(0.0, now - self.last_beat - self.heartbeat_interval))
+        self.last_beat = now
+
+    # Watchdog thread
+    def _watchdog_task(self):
+        while not self.stop_event.wait(0.01):
+            beat = self.last_beat
+            if time.perf_counter() - beat - self.heartbeat_interval < self.threshold:
+                continue
+            # Stall: sample the UI thread until the heartbeat resumes
+            stacks = Counter()
+            samples = 0
+            while self.last_beat == beat and not self.stop_event.is_set():
+                stack = self._sample_stack()
+                if stack:
+                    stacks[stack] += 1
+                    samples += 1
+                time.sleep(self.sample_interval)
+            if self.stop_event.is_set():
+                break
+            duration = self.last_beat - beat - self.heartbeat_interval
+            # Note: No samples means the watchdog did not run either (e.g. the system was suspended)
+            if samples:
+                self._report(duration, samples, stacks)
+        logger.debug("Exiting the stall monitor thread")
+
+    def _sample_stack(self):
+        frame = sys._current_frames().get(self.ui_thread_id)
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+            frame = frame.f_back
+        # Note: Innermost frame last, like a traceback
+        return tuple(reversed(stack))
+
+    def _report(self, duration, samples, stacks):
+        self.stall_count += 1
+        top = stacks.most_common(5)
+        innermost = top[0][0][-1] if top else "no Python frames (native code)"
+        logger.warning(f"UI stall of {duration * 1000:.0f} ms in {innermost}")
+        record = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "duration_ms": round(duration * 1000, 1),
+            "samples": samples,
+            "stacks": [{"count": count, "stack": list(stack)} for stack, count in top],
+        }
+        try:
+            os.makedirs(os.path.dirname(self.report_path), exist_ok=True)
+            with open(self.report_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.error(f"Failed to write stall report: {e}")
+
+    def clean_up_resources(self):
+        self.stop()
+        # Self-Deletion
+        self.deleteLater()
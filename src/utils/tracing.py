@@ -0,0 +1,159 @@
+"""
+Request tracing in Chrome trace format (load in chrome://tracing or ui.perfetto.dev)
+
+Spans are recorded with their thread, the IDs bound in request_context and optional arguments
+(e.g. byte counts). Tracing is off unless started (WORKBENCH_TRACE=1, or Ctrl+F12); while off,
+span() returns a shared no-op object, so instrumented code pays one global lookup per span.
+
+Note: This module must not import Qt
+"""
+import os
+import json
+import time
+import logging
+import threading
+from utils import request_context
+
+logger = logging.getLogger(__name__)
+
+_tracer = None
+
+
+def now_us():
+    return time.perf_counter_ns() // 1000
+
+
+class Tracer:
+    def __init__(self, max_events=1_000_000):
+        self.events = []
+        self.max_events = max_events
+        self.dropped = 0
+        self.thread_names = {}  # Thread ID -> name, written as metadata events
+        self.pid = os.getpid()
+
+    def add(self, event):
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        event["pid"] = self.pid
+        event["tid"] = tid
+        ids = request_context.current()
+        if ids:
+            event["args"] = {**ids, **event.get("args", {})}
+        # Note: list.append is atomic, so no lock is needed on the hot path
+        self.events.append(event)
+
+    def write(self, path):
+        metadata = [{"ph": "M", "name": "thread_name", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in self.thread_names.items()]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f)
+        if self.dropped:
+            logger.warning(f"Trace buffer was full; {self.dropped} events were dropped")
+
+
+class _Span:
+    __slots__ = ("name", "args", "start", "deltas", "delta_bytes")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.deltas = 0
+        self.delta_bytes = 0
+
+    def __enter__(self):
+        self.start = now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.deltas:
+            self.args["deltas"] = self.deltas
+            self.args["delta_bytes"] = self.delta_bytes
+        if exc_type is not None:
+            self.args["error"] = str(exc)
+        complete(self.name, self.start, now_us(), **self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def add_delta(self, text):
+        """Count a streamed delta; the first one is also marked as an instant event"""
+        if not self.deltas:
+            instant("first_delta")
+        self.deltas += 1
+        self.delta_bytes += len(text.encode("utf-8"))
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+    def add_delta(self, text):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def is_enabled():
+    return _tracer is not None
+
+
+def span(name, **args):
+    """Context manager recording a complete event (a no-op while tracing is off)"""
+    if _tracer is None:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def complete(name, start_us, end_us, **args):
+    """Record a span measured elsewhere (e.g. across threads), attributed to the current thread"""
+    if _tracer is not None:
+        _tracer.add({"ph": "X", "name": name, "ts": start_us, "dur": max(0, end_us - start_us), "args": args})
+
+
+def instant(name, **args):
+    if _tracer is not None:
+        _tracer.add({"ph": "i", "s": "t", "name": name, "ts": now_us(), "args": args})
+
+
+def async_begin(name, async_id, **args):
+    """Start a span that may end on another thread (e.g. a whole request)"""
+    if _tracer is not None:
+        _tracer.add({"ph": "b", "cat": name, "name": name, "id": str(async_id), "ts": now_us(), "args": args})
+
+
+def async_end(name, async_id, **args):
+    if _tracer is not None:
+        _tracer.add({"ph": "e", "cat": name, "name": name, "id": str(async_id), "ts": now_us(), "args": args})
+
+
+def start():
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+        logger.info("Tracing started")
+
+
+def stop(path):
+    """Stop tracing and write the trace file; returns the number of events written"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return 0
+    tracer.write(path)
+    logger.info(f"Trace with {len(tracer.events)} events written to {path}")
+    return len(tracer.events)
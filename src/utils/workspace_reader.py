@@ -0,0 +1,105 @@
+"""
+Streaming reader for workspace files
+
+scan_workspace() locates every session record of a workspace without decoding it: the file
+is memory-mapped and tokenized (strings and brackets only), so the cost is one pass over the
+bytes and memory does not grow with the file. Each record is returned as a RecordRef that
+reads and decodes it on demand.
+
+Note: This module must not import Qt
+"""
+import os
+import re
+import json
+import mmap
+import zlib
+import logging
+from utils.blob_store import BlobContainer, container_path_for
+
+logger = logging.getLogger(__name__)
+
+# A JSON string (escapes included) or a bracket; everything else is irrelevant for locating records
+TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]')
+SESSIONS_KEY = b'"session_data_all"'
+
+
+class RecordRef:
+    """Location of one session record inside a workspace file"""
+    def __init__(self, path, offset, length, crc, container=None):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.crc = crc
+        self.container = container
+
+    def read_bytes(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(self.length)
+        if zlib.crc32(data) != self.crc:
+            # Note: The file was rewritten since it was scanned; the record may have moved
+            data = self._relocate()
+        return data
+
+    def _relocate(self):
+        logger.debug(f"Relocating session record in {self.path}")
+        for ref in scan_workspace(self.path):
+            if ref.length == self.length and ref.crc == self.crc:
+                self.offset = ref.offset
+                return ref.read_bytes()
+        raise Exception(f"Session record no longer present in {self.path}")
+
+    def load(self):
+        return json.loads(self.read_bytes())
+
+    def load_blob(self, digest):
+        if self.container is None:
+            self.container = BlobContainer(container_path_for(self.path))
+        return self.container.read(digest)
+
+    def to_dict(self):
+        return {"path": self.path, "offset": self.offset, "length": self.length, "crc": self.crc}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["path"], data["offset"], data["length"], data["crc"])
+
+
+def scan_workspace(path, container=None):
+    """Return a RecordRef for every entry of "session_data_all", in order"""
+    refs = []
+    if os.path.getsize(path) == 0:
+        raise Exception(f"Empty workspace file: {path}")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Depth 1: top-level object; depth 2: the sessions array; depth 3: a session record
+        depth = 0
+        last_key = None
+        in_sessions = False
+        record_start = None
+        for match in TOKEN.finditer(mm):
+            first = mm[match.start()]
+            if first == ord('"'):
+                # Note: Only top-level keys are materialized; long text values are never copied
+                if depth == 1:
+                    last_key = match.group()
+            elif first == ord("{"):
+                depth += 1
+                if in_sessions and depth == 3:
+                    record_start = match.start()
+            elif first == ord("}"):
+                if in_sessions and depth == 3:
+                    length = match.end() - record_start
+                    crc = zlib.crc32(mm[record_start:match.end()])
+                    refs.append(RecordRef(path, record_start, length, crc, container))
+                depth -= 1
+            elif first == ord("["):
+                depth += 1
+                if depth == 2 and last_key == SESSIONS_KEY:
+                    in_sessions = True
+            else:
+                if in_sessions and depth == 2:
+                    in_sessions = False
+                depth -= 1
+    if last_key is None:
+        raise Exception(f"Not a workspace file: {path}")
+    return refs